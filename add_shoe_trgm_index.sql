@@ -0,0 +1,8 @@
+-- シューズのモデル名あいまい検索用（pg_trgm）
+-- collector の SHOE_FUZZY_BACKEND=pg_trgm で使用
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- LOWER("modelName") % ... / similarity() を索引で処理する
+CREATE INDEX IF NOT EXISTS "shoes_modelName_trgm_idx"
+ON "shoes" USING GIN (LOWER("modelName") gin_trgm_ops);
@@ -0,0 +1,85 @@
+"""
+字幕の解析・選択の確認（ネットワーク・Gemini・Whisper を使わない）
+fixtures/video.info.json と captions/ のローカル字幕ファイルで、次を確かめる
+
+- 手動字幕を自動生成字幕より優先する（優先言語 ja の自動生成があっても手動の en を選ぶ）
+- 自動生成字幕のうち機械翻訳（URL に tlang=）のトラックは使わない
+- json3 → vtt の順で形式を選び、json3 の改行だけのイベントや本文のないイベントは捨てる
+- 自動生成 VTT の流れる行（前のキューの行の繰り返し）と空白だけの行を重複させない
+
+使用方法:
+    python fixtures/check_captions.py
+"""
+
+import copy
+import os
+import sys
+
+FIXTURES_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(FIXTURES_DIR))
+
+from youtube_summarizer import (  # noqa: E402
+    fetch_caption_transcript,
+    load_info_json,
+    parse_json3,
+    parse_vtt,
+    read_caption,
+    select_caption_track,
+)
+
+
+def check(name: str, actual, expected) -> bool:
+    if actual == expected:
+        print(f'✅ {name}')
+        return True
+    print(f'❌ {name}\n   期待: {expected!r}\n   結果: {actual!r}')
+    return False
+
+
+def main() -> int:
+    info = load_info_json(os.path.join(FIXTURES_DIR, 'video.info.json'))
+    results = []
+
+    track = select_caption_track(info, ['ja', 'en'])
+    results.append(check('手動字幕を優先', (track['kind'], track['language'], track['ext']), ('manual', 'en', 'vtt')))
+
+    auto_only = copy.deepcopy(info)
+    auto_only['subtitles'] = {}
+    track = select_caption_track(auto_only, ['ja', 'en'])
+    results.append(check('機械翻訳の自動字幕を除外', (track['kind'], track['language'], track['ext']), ('auto', 'en', 'json3')))
+    results.append(check('ja の機械翻訳しかなければ字幕なし', select_caption_track(auto_only, ['ja']), None))
+
+    manual = parse_vtt(read_caption(select_caption_track(info, ['en'])['url']))
+    results.append(check('手動 VTT の本文（タグ・文字参照を除去）', [s['text'] for s in manual], [
+        "Today I'm reviewing the Pegasus 41.",
+        'The ReactX foam feels softer than the last version.',
+        'Overall, a great daily trainer.',
+    ]))
+    results.append(check('手動 VTT の時刻', [(s['start'], s['end']) for s in manual], [(0.0, 3.2), (3.2, 7.5), (62.0, 65.0)]))
+
+    rolling = parse_vtt(read_caption(os.path.join(FIXTURES_DIR, 'captions', 'en.auto.vtt')))
+    results.append(check('流れる自動字幕の重複除去', [s['text'] for s in rolling], [
+        'so this is the pegasus 41',
+        'and the fit is true to size',
+        'with a roomy toe box',
+    ]))
+
+    auto = parse_json3(read_caption(os.path.join(FIXTURES_DIR, 'captions', 'en.auto.json3')))
+    results.append(check('json3 の本文と時刻', [(s['start'], s['end'], s['text']) for s in auto], [
+        (0.0, 2.0, 'so this is the pegasus 41'),
+        (2.0, 4.0, 'and the fit is true to size'),
+        (4.0, 6.5, 'with a roomy toe box'),
+    ]))
+
+    transcription = fetch_caption_transcript(auto_only, ['en'])
+    results.append(check('字幕から文字起こし結果を作成', (
+        transcription['source'], transcription['caption_kind'], transcription['text'],
+    ), ('captions', 'auto', 'so this is the pegasus 41 and the fit is true to size with a roomy toe box')))
+
+    failed = results.count(False)
+    print(f'\n{len(results) - failed} / {len(results)} 件成功')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
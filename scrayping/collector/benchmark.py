@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+収集処理のベンチマーク
+合成カタログ（1k/10k/100k足）と合成検索結果で、ホットパスのスループットを計測する
+
+計測対象:
+    extract        extract_shoe_names_from_text（シューズ名抽出）
+    extract_many   extract_many（一括抽出、サイズはテキスト数。逐次とプロセスプールを比較）
+    social_filter  web_collector の検索結果フィルタ（parse_*_results）
+    dedup          web_collector の重複除去（merge_unique_posts / RunRegistry.fuse）
+    near_dup       near_duplicates のほぼ重複判定（SimHash の索引への check_and_add）
+    records        レコード型（YouTubeVideo）の生成と書き出し。slots 化前の dataclass・asdict と比較し、
+                   1件あたりのメモリと確保ブロック数も表示する（サイズはレコード数）
+    db_writes      db_handler の書き込み（ローカルPostgresが必要）
+
+使用方法:
+    python benchmark.py                          # 計測してベースラインと比較
+    python benchmark.py --sizes 1k,10k --only extract
+    python benchmark.py --sizes 10k,100k,1m --only extract_many --workers 8
+    python benchmark.py --sizes 1m --only records
+    python benchmark.py --save-baseline          # 現在の結果をベースラインとして保存
+    python benchmark.py --check                  # 回帰があれば終了コード1
+    python benchmark.py --database-url postgresql://localhost/shoereview_bench --only db_writes
+
+ホットパスを変更したら --check で回帰がないことを確認し、
+改善した場合は --save-baseline でベースラインを更新してコミットする
+（extract_many の workers >= 2 のケースはCPU数に依存するため、ベースラインには保存・比較しない）
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict, fields, make_dataclass
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from config import POPULAR_BRANDS, POPULAR_MODELS
+from fixture_server import synthetic_serper
+from shoe_finder import extract_shoe_names_from_text, extract_many, get_japanese_brand
+from shoe_matcher import build_matcher
+from near_duplicates import NearDuplicateIndex
+from records import to_rows
+from youtube_collector import YouTubeVideo
+from web_collector import (
+    SocialPost,
+    parse_twitter_results,
+    parse_reddit_results,
+    parse_note_results,
+    merge_unique_posts,
+    RunRegistry,
+)
+
+BASELINE_PATH = Path(__file__).parent / 'benchmark_baseline.json'
+# ベースラインからこの割合以上遅くなったら回帰とみなす
+DEFAULT_THRESHOLD = 0.20
+
+SIZES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+ALL_CASES = ('extract', 'extract_many', 'social_filter', 'dedup', 'near_dup', 'records', 'db_writes')
+# extract_many で使うカタログの件数
+BATCH_CATALOG_SIZE = 1_000
+
+_MODEL_WORDS = [
+    'Pegasus', 'Vomero', 'Kayano', 'Nimbus', 'Novablast', 'Clifton', 'Bondi', 'Mach',
+    'Endorphin', 'Kinvara', 'Ghost', 'Glycerin', 'Rebellion', 'Rider', 'Boston', 'Adios',
+    'Cloud', 'Surfer', 'Monster', 'Rebel', 'Fresh', 'Foam', 'Speed', 'Tempo', 'Trail',
+    'Sky', 'Edge', 'Blast', 'Wave', 'Gel', 'Zoom', 'Fly', 'Streak', 'Magic', 'Deviate',
+]
+_TEMPLATES = [
+    '{brand} {model} レビュー｜{km}km走って分かった良い点・悪い点',
+    '【比較】{brand} {model} と {brand2} {model2} を履き比べ',
+    '{jbrand} {model} を買ったのでサブ{sub}を目指して練習中',
+    'Is the {brand} {model} worth it? Long run review after {km} miles',
+    '{brand} {model} vs {brand2} {model2}: which daily trainer wins?',
+    '今日は{km}km ジョグ。{jbrand}のシューズは足当たりが良い',
+]
+
+
+@dataclass
+class BenchResult:
+    name: str
+    items: int
+    seconds: float
+    ops_per_sec: float
+
+
+# ===== 合成データ =====
+
+def synthetic_catalog(size: int, seed: int = 42) -> List[tuple]:
+    """(brand, model_name) のリストを生成（既知モデルを先頭に含む）"""
+    rng = random.Random(seed)
+    catalog = list(POPULAR_MODELS)
+    seen = set(catalog)
+    brands = list(POPULAR_BRANDS)
+    while len(catalog) < size:
+        words = rng.sample(_MODEL_WORDS, rng.choice([1, 2, 2, 3]))
+        version = rng.choice(['', f' {rng.randint(1, 30)}', f' v{rng.randint(1, 15)}', f'+'])
+        entry = (rng.choice(brands), ' '.join(words) + version)
+        if entry not in seen:
+            seen.add(entry)
+            catalog.append(entry)
+    return catalog[:size]
+
+
+def synthetic_texts(catalog: List[tuple], count: int, seed: int = 7) -> List[str]:
+    """検索結果のタイトル+スニペット相当のテキストを生成"""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        brand, model = rng.choice(catalog)
+        brand2, model2 = rng.choice(catalog)
+        texts.append(rng.choice(_TEMPLATES).format(
+            brand=brand, model=model, brand2=brand2, model2=model2,
+            jbrand=get_japanese_brand(brand), km=rng.randint(3, 42), sub=rng.randint(3, 5),
+        ))
+    return texts
+
+
+def synthetic_search_results(count: int, seed: int = 11) -> List[Dict]:
+    """ソーシャル向け site: クエリの検索結果（Serper organic 相当）を生成"""
+    results = []
+    page = 0
+    sites = '(site:twitter.com OR site:x.com OR site:reddit.com OR site:note.com)'
+    while len(results) < count:
+        body = {'q': f'shoe {seed}-{page} {sites}', 'num': 100}
+        results.extend(synthetic_serper(body)['organic'])
+        page += 1
+    rng = random.Random(seed)
+    # 実際の検索結果と同様に対象外ドメインや重複も混ぜる
+    for i in range(0, count, 7):
+        results[i] = dict(results[i], link=rng.choice([
+            'https://www.netflix.com/title/8000',
+            'https://box.com/s/abc',
+            'https://www.reddit.com/r/running/',
+            'https://note.com/search?q=shoe',
+        ]))
+    return results[:count]
+
+
+# ===== 計測 =====
+
+def measure(func: Callable[[], object], items: int, repeat: int = 3) -> BenchResult:
+    """repeat 回実行して最速の時間を採用"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return BenchResult(name='', items=items, seconds=best, ops_per_sec=items / best if best else 0.0)
+
+
+def bench_extract(label: str, size: int, args) -> List[BenchResult]:
+    catalog = synthetic_catalog(size)
+    texts = synthetic_texts(catalog, args.texts)
+    start = time.perf_counter()
+    matcher = build_matcher(catalog)
+    print(f'   マッチャー構築: {time.perf_counter() - start:.2f}s', file=sys.stderr)
+
+    def run():
+        for text in texts:
+            extract_shoe_names_from_text(text, 'benchmark', matcher=matcher)
+
+    result = measure(run, len(texts), args.repeat)
+    result.name = f'extract/catalog={label}'
+    return [result]
+
+
+def bench_extract_many(label: str, size: int, args) -> List[BenchResult]:
+    catalog = synthetic_catalog(BATCH_CATALOG_SIZE)
+    texts = synthetic_texts(catalog, size)
+    matcher = build_matcher(catalog)
+    workers = args.workers or os.cpu_count() or 1
+
+    results = []
+    for count in sorted({1, workers}):
+        result = measure(lambda: extract_many(texts, 'benchmark', matcher=matcher, workers=count), size, args.repeat)
+        result.name = f'extract_many/texts={label}/workers={count}'
+        results.append(result)
+    return results
+
+
+def bench_social_filter(label: str, size: int, args) -> List[BenchResult]:
+    results = synthetic_search_results(size)
+    # 実際の呼び出しと同様に20件ずつのページに分けて処理
+    pages = [results[i:i + 20] for i in range(0, len(results), 20)]
+
+    def run():
+        for page in pages:
+            parse_twitter_results(page, 20)
+            parse_reddit_results(page, 20)
+            parse_note_results(page, 20)
+
+    result = measure(run, len(results), args.repeat)
+    result.name = f'social_filter/results={label}'
+    return [result]
+
+
+def bench_dedup(label: str, size: int, args) -> List[BenchResult]:
+    rng = random.Random(3)
+    # 約30%が他クエリと重複する投稿
+    unique = max(1, int(size * 0.7))
+    posts = [
+        SocialPost(platform='twitter', title=f'post {i}', url=f'https://x.com/u{i % 997}/status/{i}', snippet='')
+        for i in range(unique)
+    ]
+    stream = posts + [rng.choice(posts) for _ in range(size - unique)]
+    rng.shuffle(stream)
+    batches = [stream[i:i + 20] for i in range(0, len(stream), 20)]
+
+    result = measure(lambda: merge_unique_posts(batches), size, args.repeat)
+    result.name = f'dedup/posts={label}'
+    # 実行ごとにレジストリを作り直す（収集実行1回分の統合コスト）
+    fused = measure(lambda: RunRegistry().fuse(batches), size, args.repeat)
+    fused.name = f'dedup_fuse/posts={label}'
+    return [result, fused]
+
+
+def bench_near_dup(label: str, size: int, args) -> List[BenchResult]:
+    catalog = synthetic_catalog(BATCH_CATALOG_SIZE)
+    rng = random.Random(5)
+    # 約20%はリポスト・URL違いの再掲（メンション・URL・末尾の付加を変えた同じ本文）
+    originals = [
+        (rng.choice(catalog)[1], f'{text} {rng.randint(1, 10 ** 6)} 本目の投稿です。' * 2)
+        for text in synthetic_texts(catalog, max(1, int(size * 0.8)))
+    ]
+    posts = originals + [
+        (shoe, f'RT @runner{i}: {text} https://t.co/{i}')
+        for i, (shoe, text) in enumerate(rng.choice(originals) for _ in range(size - len(originals)))
+    ]
+    rng.shuffle(posts)
+
+    def run():
+        index = NearDuplicateIndex(scope='shoe')
+        for i, (shoe, text) in enumerate(posts):
+            index.check_and_add(shoe, text, '', f'https://example.com/{i}')
+
+    result = measure(run, size, args.repeat)
+    result.name = f'near_dup/posts={label}'
+    return [result]
+
+
+def _memory_per_item(build: Callable[[], list], size: int):
+    """生成したオブジェクトが保持するメモリと確保ブロック数（1件あたり）、生成中のピーク"""
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    items = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    held_blocks = sys.getallocatedblocks() - blocks
+    del items
+    return current / size, held_blocks / size, peak / size
+
+
+def bench_records(label: str, size: int, args) -> List[BenchResult]:
+    # slots 化前と同じ定義（インスタンスごとに __dict__ を持つ dataclass）
+    LegacyVideo = make_dataclass('LegacyVideo', [(f.name, f.type) for f in fields(YouTubeVideo)])
+    # 文字列は使い回し、レコード自体のコストだけを比べる
+    titles = synthetic_texts(synthetic_catalog(BATCH_CATALOG_SIZE), 1000)
+    values = [
+        (f'v{i % 1000:010d}', titles[i % 1000], 'channel', 'UC0000', '', '2024-01-01T00:00:00Z', '', i % 256, 0, 0)
+        for i in range(size)
+    ]
+    variants = {'dataclass': LegacyVideo, 'slots': YouTubeVideo}
+
+    results = []
+    records = {}
+    for name, cls in variants.items():
+        build = lambda: [cls(*row) for row in values]
+        held, blocks, peak = _memory_per_item(build, size)
+        print(f'   {name}: {held:,.0f} B/件, {blocks:.2f} ブロック/件', file=sys.stderr)
+        result = measure(build, size, args.repeat)
+        result.name = f'records_build/{name}/n={label}'
+        results.append(result)
+        records[name] = build()
+
+    exports = {
+        'asdict': lambda: [asdict(record) for record in records['dataclass']],
+        'rows': lambda: list(to_rows(records['slots'])),
+    }
+    for name, export in exports.items():
+        _, _, peak = _memory_per_item(export, size)
+        print(f'   {name}: 書き出し中のピーク {peak:,.0f} B/件', file=sys.stderr)
+        result = measure(export, size, args.repeat)
+        result.name = f'records_export/{name}/n={label}'
+        results.append(result)
+    return results
+
+
+def bench_db_writes(label: str, size: int, args) -> List[BenchResult]:
+    if not args.database_url:
+        return []
+    import db_handler
+
+    # ベンチマーク用DBに向ける（本番DBを汚さないよう明示指定のみ）
+    db_handler.DATABASE_URL = args.database_url
+    rows = min(size, args.db_rows)
+    shoe_id = db_handler.create_shoe('BenchBrand', f'Bench {time.time_ns()}')
+    if not shoe_id:
+        print('⚠️ ベンチマーク用シューズを作成できませんでした')
+        return []
+
+    counter = iter(range(10 ** 9))
+
+    def run():
+        for _ in range(rows):
+            i = next(counter)
+            db_handler.create_curated_source(
+                shoe_id=shoe_id,
+                source_type='SNS',
+                platform='twitter.com',
+                title=f'bench {i}',
+                url=f'https://x.com/bench/status/{i}',
+                reliability=0.65,
+            )
+
+    try:
+        result = measure(run, rows, args.repeat)
+    finally:
+        conn = db_handler.get_db_connection()
+        if conn:
+            with conn, conn.cursor() as cur:
+                cur.execute('DELETE FROM shoes WHERE id = %s', (shoe_id,))
+            conn.close()
+
+    result.name = f'db_writes/rows={rows}'
+    return [result]
+
+
+CASES = {
+    'extract': bench_extract,
+    'extract_many': bench_extract_many,
+    'social_filter': bench_social_filter,
+    'dedup': bench_dedup,
+    'near_dup': bench_near_dup,
+    'records': bench_records,
+    'db_writes': bench_db_writes,
+}
+
+
+# ===== ベースライン =====
+
+def _host_dependent(name: str) -> bool:
+    """並列ケース（workers >= 2）はCPU数で結果が変わるため、ベースラインに保存・比較しない"""
+    _, _, workers = name.partition('/workers=')
+    return bool(workers) and workers != '1'
+
+
+def load_baseline(path: Path) -> Dict[str, Dict]:
+    if not path.exists():
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f).get('results', {})
+
+
+def save_baseline(path: Path, results: List[BenchResult], merge: bool = True):
+    existing = load_baseline(path) if merge else {}
+    existing.update({r.name: asdict(r) for r in results if not _host_dependent(r.name)})
+    data = {
+        'machine': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+        },
+        'results': dict(sorted(existing.items())),
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+
+
+def compare(results: List[BenchResult], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """結果を表示し、回帰したケース名を返す"""
+    regressions = []
+    print(f'{"case":<36} {"items":>8} {"seconds":>10} {"ops/s":>14} {"baseline":>14} {"change":>8}')
+    for r in results:
+        base = None if _host_dependent(r.name) else baseline.get(r.name)
+        if base and base.get('ops_per_sec'):
+            change = r.ops_per_sec / base['ops_per_sec'] - 1
+            mark = ''
+            if change < -threshold:
+                mark = ' ❌'
+                regressions.append(r.name)
+            base_text = f'{base["ops_per_sec"]:>14,.0f}'
+            change_text = f'{change * 100:>+7.1f}%{mark}'
+        else:
+            base_text = f'{"-":>14}'
+            change_text = f'{"n/a" if _host_dependent(r.name) else "new":>8}'
+        print(f'{r.name:<36} {r.items:>8} {r.seconds:>10.4f} {r.ops_per_sec:>14,.0f} {base_text} {change_text}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='収集処理のベンチマーク')
+    parser.add_argument('--sizes', default='1k,10k', help=f'カタログ/件数のサイズ ({",".join(SIZES)})')
+    parser.add_argument('--only', help=f'実行するケース（カンマ区切り: {",".join(ALL_CASES)}）')
+    parser.add_argument('--texts', type=int, default=2000, help='抽出ベンチマークのテキスト数')
+    parser.add_argument('--workers', type=int, help='extract_many のワーカー数（省略時はCPU数）')
+    parser.add_argument('--repeat', type=int, default=3, help='各ケースの繰り返し回数（最速値を採用）')
+    parser.add_argument('--database-url', help='db_writes 用のローカルPostgres（未指定ならスキップ）')
+    parser.add_argument('--db-rows', type=int, default=1000, help='db_writes の最大行数')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help='ベースラインファイル')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='回帰とみなす低下率')
+    parser.add_argument('--save-baseline', action='store_true', help='結果をベースラインに保存')
+    parser.add_argument('--check', action='store_true', help='回帰があれば終了コード1で終了')
+    parser.add_argument('--json', help='結果をJSONで保存')
+    args = parser.parse_args()
+
+    cases = args.only.split(',') if args.only else list(ALL_CASES)
+    sizes = [s.strip() for s in args.sizes.split(',') if s.strip()]
+    unknown = [c for c in cases if c not in CASES] + [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f'不明な指定: {", ".join(unknown)}')
+
+    results: List[BenchResult] = []
+    for case in cases:
+        for label in sizes:
+            print(f'⏱️ {case} ({label})...', file=sys.stderr)
+            results.extend(CASES[case](label, SIZES[label], args))
+
+    print()
+    baseline_path = Path(args.baseline)
+    regressions = compare(results, load_baseline(baseline_path), args.threshold)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([asdict(r) for r in results], f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        save_baseline(baseline_path, results)
+        print(f'\n💾 ベースラインを保存しました: {baseline_path}')
+    if regressions:
+        print(f'\n❌ 回帰: {", ".join(regressions)}（閾値 {args.threshold:.0%}）')
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
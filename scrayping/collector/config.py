@@ -45,10 +45,78 @@ TWITTER_ACCESS_TOKEN = os.getenv('TWITTER_ACCESS_TOKEN', '')
 TWITTER_ACCESS_TOKEN_SECRET = os.getenv('TWITTER_ACCESS_TOKEN_SECRET', '')
 TWITTER_BEARER_TOKEN = os.getenv('TWITTER_BEARER_TOKEN', '')
 
+# APIエンドポイント
+# COLLECTOR_API_BASE を設定すると全プロバイダをスタンドインサーバー（fixture_server.py）に向ける
+_API_BASE_OVERRIDE = os.getenv('COLLECTOR_API_BASE', '').rstrip('/')
+SERPER_API_BASE = os.getenv('SERPER_API_BASE') or _API_BASE_OVERRIDE or 'https://google.serper.dev'
+GOOGLE_SEARCH_API_BASE = os.getenv('GOOGLE_SEARCH_API_BASE') or (
+    f'{_API_BASE_OVERRIDE}/customsearch' if _API_BASE_OVERRIDE else 'https://www.googleapis.com/customsearch'
+)
+YOUTUBE_API_BASE = os.getenv('YOUTUBE_API_BASE') or (
+    f'{_API_BASE_OVERRIDE}/youtube/v3' if _API_BASE_OVERRIDE else 'https://www.googleapis.com/youtube/v3'
+)
+if _API_BASE_OVERRIDE:
+    # スタンドインサーバーはキーを検証しないため、未設定ならダミー値で動かす
+    SERPER_API_KEY = SERPER_API_KEY or 'offline'
+    GOOGLE_SEARCH_API_KEY = GOOGLE_SEARCH_API_KEY or 'offline'
+    GOOGLE_SEARCH_ENGINE_ID = GOOGLE_SEARCH_ENGINE_ID or 'offline'
+    YOUTUBE_API_KEY = YOUTUBE_API_KEY or 'offline'
+
 # 楽天API
 RAKUTEN_APPLICATION_ID = os.getenv('RAKUTEN_APPLICATION_ID', '')
 RAKUTEN_AFFILIATE_ID = os.getenv('RAKUTEN_AFFILIATE_ID', '')
 
+# APIクォータ（メトリクスのクォータ使用率算出用）
+YOUTUBE_DAILY_QUOTA = int(os.getenv('YOUTUBE_DAILY_QUOTA', '10000'))
+GOOGLE_SEARCH_DAILY_QUOTA = int(os.getenv('GOOGLE_SEARCH_DAILY_QUOTA', '100'))
+SERPER_MONTHLY_QUOTA = int(os.getenv('SERPER_MONTHLY_QUOTA', '2500'))
+
+# トレンド検出（trending.py）: 日別 Count-Min スケッチの保存先とサイズ
+TRENDING_STATE_PATH = os.getenv('TRENDING_STATE_PATH', str(Path(__file__).parent / 'data' / 'trending.bin'))
+TRENDING_RETENTION_DAYS = int(os.getenv('TRENDING_RETENTION_DAYS', '56'))
+TRENDING_SKETCH_WIDTH = int(os.getenv('TRENDING_SKETCH_WIDTH', '2048'))
+TRENDING_SKETCH_DEPTH = int(os.getenv('TRENDING_SKETCH_DEPTH', '4'))
+TRENDING_MAX_CANDIDATES = int(os.getenv('TRENDING_MAX_CANDIDATES', '1000'))
+
+# 検索結果のページ送り（pagination.py）: 1回の検索で取得する最大ページ数
+SEARCH_MAX_PAGES = int(os.getenv('SEARCH_MAX_PAGES', '5'))
+
+# ソーシャル検索のクエリプランナー（query_planner.py）
+# 未充足件数に対して要求する件数の倍率（ドメイン外・投稿ページ以外の結果を見込む）
+QUERY_PLANNER_OVERFETCH = float(os.getenv('QUERY_PLANNER_OVERFETCH', '1.5'))
+# 前回0件だった言語のクエリを連続でスキップする回数
+QUERY_LANGUAGE_SKIP_RUNS = int(os.getenv('QUERY_LANGUAGE_SKIP_RUNS', '3'))
+QUERY_STATS_PATH = os.getenv('QUERY_STATS_PATH', str(Path(__file__).parent / 'data' / 'query_stats.json'))
+
+# レビューチャンネルの巡回（youtube_channels.py）
+YOUTUBE_CHANNELS_PATH = os.getenv('YOUTUBE_CHANNELS_PATH', str(Path(__file__).parent / 'data' / 'youtube_channels.json'))
+# 初回から巡回対象にするチャンネルID（カンマ区切り）
+YOUTUBE_REVIEWER_CHANNELS = [c.strip() for c in os.getenv('YOUTUBE_REVIEWER_CHANNELS', '').split(',') if c.strip()]
+# search.list の結果でレビュー動画がこの回数見つかったチャンネルを巡回対象にする
+YOUTUBE_CHANNEL_DISCOVERY_HITS = int(os.getenv('YOUTUBE_CHANNEL_DISCOVERY_HITS', '2'))
+# 初回の巡回で遡るページ数（1ページ50本）
+YOUTUBE_CHANNEL_FIRST_POLL_PAGES = int(os.getenv('YOUTUBE_CHANNEL_FIRST_POLL_PAGES', '2'))
+
+# 動画統計のキャッシュ（video_stats_cache.py）
+YOUTUBE_STATS_CACHE_PATH = os.getenv('YOUTUBE_STATS_CACHE_PATH', str(Path(__file__).parent / 'data' / 'youtube_stats_cache.json'))
+# 取得からこの秒数以内の統計はリクエストせずキャッシュを使う（0 なら毎回条件付きリクエスト）
+YOUTUBE_STATS_FRESH_SECONDS = int(os.getenv('YOUTUBE_STATS_FRESH_SECONDS', str(6 * 3600)))
+YOUTUBE_STATS_CACHE_MAX = int(os.getenv('YOUTUBE_STATS_CACHE_MAX', '100000'))
+
+# 保存済み動画の統計更新（refresh_stats.py）
+# 同時に実行する videos.list の数
+REFRESH_STATS_CONCURRENCY = int(os.getenv('REFRESH_STATS_CONCURRENCY', '4'))
+# 1回の実行で使う videos.list の上限（1回1ユニット・50本）。0 なら上限なし
+REFRESH_STATS_MAX_UNITS = int(os.getenv('REFRESH_STATS_MAX_UNITS', '2000'))
+
+# ほぼ重複の検出（near_duplicates.py）
+# SimHash（64ビット）のハミング距離がこの値以下なら同じ投稿とみなす
+NEAR_DUP_MAX_DISTANCE = int(os.getenv('NEAR_DUP_MAX_DISTANCE', '3'))
+# 正規化後にこの文字数未満のテキストは比較しない（短いタイトルだけの投稿の誤検出を防ぐ）
+NEAR_DUP_MIN_CHARS = int(os.getenv('NEAR_DUP_MIN_CHARS', '40'))
+# shoe: 同じシューズのレビュー内で比較 / table: ExternalReview テーブル全体で比較
+NEAR_DUP_SCOPE = os.getenv('NEAR_DUP_SCOPE', 'shoe')
+
 # 競合サイト（参照用）
 COMPETITOR_SITES = [
     {
@@ -84,6 +152,86 @@ POPULAR_BRANDS = [
     'Reebok',
 ]
 
+# ブランドの日本語表記
+JAPANESE_BRAND_NAMES = {
+    'Nike': 'ナイキ',
+    'Adidas': 'アディダス',
+    'ASICS': 'アシックス',
+    'New Balance': 'ニューバランス',
+    'Hoka': 'ホカ',
+    'On': 'オン',
+    'Saucony': 'サッカニー',
+    'Brooks': 'ブルックス',
+    'Mizuno': 'ミズノ',
+    'Puma': 'プーマ',
+    'Under Armour': 'アンダーアーマー',
+    'Reebok': 'リーボック',
+}
+
+# ブランドの別表記（正規化後の表記 → 英語ブランド名、shoe_identity.py で使用）
+BRAND_ALIASES = {
+    'asics': 'ASICS',
+    'アシックス': 'ASICS',
+    'hoka one one': 'Hoka',
+    'ホカオネオネ': 'Hoka',
+    'ホカ オネオネ': 'Hoka',
+    'newbalance': 'New Balance',
+    'nb': 'New Balance',
+    'on running': 'On',
+    'オンランニング': 'On',
+    'underarmour': 'Under Armour',
+}
+
+# カタログのあいまい検索（shoe_fuzzy_index.py）: memory または pg_trgm
+SHOE_FUZZY_BACKEND = os.getenv('SHOE_FUZZY_BACKEND', 'memory')
+SHOE_FUZZY_MIN_SCORE = float(os.getenv('SHOE_FUZZY_MIN_SCORE', '0.3'))
+
+# モデル名のカタカナ表記 → 英語表記（shoe_identity.py で使用）
+MODEL_NAME_ALIASES = {
+    'ペガサス': 'pegasus',
+    'ヴェイパーフライ': 'vaporfly',
+    'ベイパーフライ': 'vaporfly',
+    'アルファフライ': 'alphafly',
+    'ボメロ': 'vomero',
+    'ヴォメロ': 'vomero',
+    'インヴィンシブル': 'invincible',
+    'インビンシブル': 'invincible',
+    'アディゼロ': 'adizero',
+    'アディオス': 'adios',
+    'プロ': 'pro',
+    'ボストン': 'boston',
+    'ウルトラブースト': 'ultraboost',
+    'ライト': 'light',
+    'ゲル': 'gel',
+    'カヤノ': 'kayano',
+    'ゲルカヤノ': 'gel kayano',
+    'ニンバス': 'nimbus',
+    'ゲルニンバス': 'gel nimbus',
+    'ノヴァブラスト': 'novablast',
+    'ノバブラスト': 'novablast',
+    'メタスピード': 'metaspeed',
+    'スカイ': 'sky',
+    'スーパーブラスト': 'superblast',
+    'フューエルセル': 'fuelcell',
+    'フレッシュフォーム': 'fresh foam',
+    'レベル': 'rebel',
+    'クリフトン': 'clifton',
+    'ボンダイ': 'bondi',
+    'マッハ': 'mach',
+    'ロケット': 'rocket',
+    'クラウドモンスター': 'cloudmonster',
+    'クラウドサーファー': 'cloudsurfer',
+    'クラウドストラトス': 'cloudstratus',
+    'エンドルフィン': 'endorphin',
+    'キンバラ': 'kinvara',
+    'ゴースト': 'ghost',
+    'グリセリン': 'glycerin',
+    'ウエーブ': 'wave',
+    'ウェーブ': 'wave',
+    'リベリオン': 'rebellion',
+    'ライダー': 'rider',
+}
+
 # 人気モデル（検索用）
 POPULAR_MODELS = [
     ('Nike', 'Pegasus 41'),
@@ -4,12 +4,13 @@
 """
 
 import json
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Iterator, Optional, Any
 from datetime import datetime
 from dataclasses import dataclass
 import psycopg2
-from psycopg2.extras import RealDictCursor, Json
+from psycopg2.extras import RealDictCursor, Json, execute_values
 from config import DATABASE_URL
+from instrumentation import timed, record_error, increment
 
 
 def get_db_connection():
@@ -37,6 +38,7 @@ def test_connection() -> bool:
 
 # ===== シューズ操作 =====
 
+@timed('db.get_all_shoes')
 def get_all_shoes() -> List[Dict]:
     """全シューズを取得"""
     conn = get_db_connection()
@@ -54,12 +56,14 @@ def get_all_shoes() -> List[Dict]:
             ''')
             return [dict(row) for row in cur.fetchall()]
     except Exception as e:
+        record_error('db.get_all_shoes')
         print(f'❌ シューズ取得エラー: {e}')
         return []
     finally:
         conn.close()
 
 
+@timed('db.get_shoe_by_brand_model')
 def get_shoe_by_brand_model(brand: str, model_name: str) -> Optional[Dict]:
     """ブランドとモデル名でシューズを検索"""
     conn = get_db_connection()
@@ -77,12 +81,76 @@ def get_shoe_by_brand_model(brand: str, model_name: str) -> Optional[Dict]:
             row = cur.fetchone()
             return dict(row) if row else None
     except Exception as e:
+        record_error('db.get_shoe_by_brand_model')
         print(f'❌ シューズ検索エラー: {e}')
         return None
     finally:
         conn.close()
 
 
+@timed('db.get_shoes_updated_since')
+def get_shoes_updated_since(since: Optional[datetime] = None) -> List[Dict]:
+    """指定時刻以降に更新されたシューズを取得（None なら全件）"""
+    conn = get_db_connection()
+    if not conn:
+        return []
+
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute('''
+                SELECT id, brand, "modelName", "updatedAt"
+                FROM shoes
+                WHERE %s::timestamp IS NULL OR "updatedAt" >= %s
+                ORDER BY "updatedAt"
+            ''', (since, since))
+            return [dict(row) for row in cur.fetchall()]
+    except Exception as e:
+        record_error('db.get_shoes_updated_since')
+        print(f'❌ シューズ取得エラー: {e}')
+        return []
+    finally:
+        conn.close()
+
+
+@timed('db.search_shoes_by_similarity')
+def search_shoes_by_similarity(
+    brand: str,
+    model_name: str,
+    limit: int = 5,
+    min_similarity: float = 0.3,
+) -> List[Dict]:
+    """
+    pg_trgm でモデル名の類似度が高いシューズを検索
+
+    事前に add_shoe_trgm_index.sql で拡張と GIN 索引を作成しておくこと。
+    スコアは生のモデル名での値のため、shoe_fuzzy_index が正規化した表記で採点し直す
+    """
+    conn = get_db_connection()
+    if not conn:
+        return []
+
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute('SELECT set_limit(%s)', (min_similarity,))
+            cur.execute('''
+                SELECT id, brand, "modelName",
+                       similarity(LOWER("modelName"), LOWER(%s)) AS score
+                FROM shoes
+                WHERE LOWER("modelName") %% LOWER(%s)
+                  AND (%s = '' OR LOWER(brand) = LOWER(%s))
+                ORDER BY score DESC
+                LIMIT %s
+            ''', (model_name, model_name, brand, brand, limit))
+            return [dict(row) for row in cur.fetchall()]
+    except Exception as e:
+        record_error('db.search_shoes_by_similarity')
+        print(f'❌ シューズ類似検索エラー: {e}')
+        return []
+    finally:
+        conn.close()
+
+
+@timed('db.create_shoe')
 def create_shoe(
     brand: str,
     model_name: str,
@@ -117,12 +185,14 @@ def create_shoe(
             ))
             shoe_id = cur.fetchone()[0]
             conn.commit()
+            increment('db_rows_written_total', table='shoes')
             return shoe_id
     except psycopg2.errors.UniqueViolation:
         conn.rollback()
         print(f'⚠️ シューズは既に存在します: {brand} {model_name}')
         return None
     except Exception as e:
+        record_error('db.create_shoe')
         conn.rollback()
         print(f'❌ シューズ作成エラー: {e}')
         return None
@@ -145,6 +215,7 @@ def ensure_shoe_exists(
 
 # ===== キュレーションソース操作 =====
 
+@timed('db.create_curated_source')
 def create_curated_source(
     shoe_id: str,
     source_type: str,  # OFFICIAL, MARKETPLACE, SNS, VIDEO, ARTICLE, COMMUNITY
@@ -158,10 +229,18 @@ def create_curated_source(
     country: str = 'JP',
     reliability: float = 0.7,
     metadata: Optional[Dict] = None,
+    raise_on_error: bool = False,
 ) -> Optional[str]:
-    """キュレーションソースを作成"""
+    """
+    キュレーションソースを作成
+
+    Args:
+        raise_on_error: 接続・書き込みの失敗を例外で返す（登録済みの場合は従来どおり None）
+    """
     conn = get_db_connection()
     if not conn:
+        if raise_on_error:
+            raise Exception('DBに接続できません')
         return None
 
     try:
@@ -203,15 +282,20 @@ def create_curated_source(
             ))
             source_id = cur.fetchone()[0]
             conn.commit()
+            increment('db_rows_written_total', table='curatedSources')
             return source_id
     except Exception as e:
+        record_error('db.create_curated_source')
         conn.rollback()
         print(f'❌ ソース作成エラー: {e}')
+        if raise_on_error:
+            raise
         return None
     finally:
         conn.close()
 
 
+@timed('db.get_curated_sources_for_shoe')
 def get_curated_sources_for_shoe(shoe_id: str) -> List[Dict]:
     """シューズのキュレーションソースを取得"""
     conn = get_db_connection()
@@ -229,14 +313,88 @@ def get_curated_sources_for_shoe(shoe_id: str) -> List[Dict]:
             ''', (shoe_id,))
             return [dict(row) for row in cur.fetchall()]
     except Exception as e:
+        record_error('db.get_curated_sources_for_shoe')
         print(f'❌ ソース取得エラー: {e}')
         return []
     finally:
         conn.close()
 
 
+def iter_youtube_video_sources(batch_size: int = 5000) -> Iterator[Dict]:
+    """
+    YouTube動画のキュレーションソースを video_id 順に1行ずつ返す
+
+    同じ動画が複数のシューズに登録されている場合は連続して返る。
+    行数が多くてもメモリに載せきらないよう、サーバーサイドカーソルで batch_size 行ずつ取得する
+    """
+    conn = get_db_connection()
+    if not conn:
+        return
+
+    try:
+        with conn.cursor(name='youtube_video_sources', cursor_factory=RealDictCursor) as cur:
+            cur.itersize = batch_size
+            cur.execute('''
+                SELECT id,
+                       metadata->>'video_id' AS video_id,
+                       metadata->'view_count' AS view_count,
+                       metadata->'like_count' AS like_count,
+                       metadata->'comment_count' AS comment_count
+                FROM "curatedSources"
+                WHERE type = 'VIDEO' AND platform = 'youtube.com' AND metadata ? 'video_id'
+                ORDER BY metadata->>'video_id'
+            ''')
+            for row in cur:
+                yield dict(row)
+    except Exception as e:
+        record_error('db.iter_youtube_video_sources')
+        print(f'❌ YouTubeソース取得エラー: {e}')
+    finally:
+        conn.close()
+
+
+@timed('db.bulk_update_video_stats')
+def bulk_update_video_stats(updates: List[tuple]) -> int:
+    """
+    キュレーションソースの metadata の統計値を1回の UPDATE でまとめて更新
+
+    Args:
+        updates: (ソースID, {'view_count': .., 'like_count': .., 'comment_count': ..}) のリスト
+
+    Returns:
+        更新した行数
+    """
+    if not updates:
+        return 0
+    conn = get_db_connection()
+    if not conn:
+        return 0
+
+    try:
+        with conn.cursor() as cur:
+            execute_values(cur, '''
+                UPDATE "curatedSources" AS c
+                SET metadata = COALESCE(c.metadata, '{}'::jsonb) || v.stats::jsonb,
+                    "updatedAt" = NOW()
+                FROM (VALUES %s) AS v(id, stats)
+                WHERE c.id = v.id
+            ''', [(source_id, Json(stats)) for source_id, stats in updates], page_size=len(updates))
+            updated = cur.rowcount
+            conn.commit()
+            increment('db_rows_written_total', updated, table='curatedSources')
+            return updated
+    except Exception as e:
+        record_error('db.bulk_update_video_stats')
+        conn.rollback()
+        print(f'❌ 統計の一括更新エラー: {e}')
+        return 0
+    finally:
+        conn.close()
+
+
 # ===== 外部レビュー操作 =====
 
+@timed('db.create_external_review')
 def create_external_review(
     shoe_id: str,
     platform: str,
@@ -294,8 +452,10 @@ def create_external_review(
             ))
             review_id = cur.fetchone()[0]
             conn.commit()
+            increment('db_rows_written_total', table='ExternalReview')
             return review_id
     except Exception as e:
+        record_error('db.create_external_review')
         conn.rollback()
         print(f'❌ ExternalReview作成エラー: {e}')
         return None
@@ -303,8 +463,37 @@ def create_external_review(
         conn.close()
 
 
+def iter_external_reviews_since(since: Optional[datetime] = None, batch_size: int = 5000) -> Iterator[Dict]:
+    """
+    指定時刻以降に収集された ExternalReview を1行ずつ返す（None なら全件）
+
+    行数が多くてもメモリに載せきらないよう、サーバーサイドカーソルで batch_size 行ずつ取得する
+    """
+    conn = get_db_connection()
+    if not conn:
+        return
+
+    try:
+        with conn.cursor(name='external_reviews_since', cursor_factory=RealDictCursor) as cur:
+            cur.itersize = batch_size
+            cur.execute('''
+                SELECT "shoeId", "sourceUrl", "sourceTitle", snippet, "collectedAt"
+                FROM "ExternalReview"
+                WHERE %s::timestamp IS NULL OR "collectedAt" >= %s
+                ORDER BY "collectedAt"
+            ''', (since, since))
+            for row in cur:
+                yield dict(row)
+    except Exception as e:
+        record_error('db.iter_external_reviews_since')
+        print(f'❌ ExternalReview取得エラー: {e}')
+    finally:
+        conn.close()
+
+
 # ===== AIソース操作 =====
 
+@timed('db.create_ai_source')
 def create_ai_source(
     review_id: str,
     source_type: str,  # WEB_ARTICLE, YOUTUBE_VIDEO
@@ -348,8 +537,10 @@ def create_ai_source(
             ))
             source_id = cur.fetchone()[0]
             conn.commit()
+            increment('db_rows_written_total', table='ai_sources')
             return source_id
     except Exception as e:
+        record_error('db.create_ai_source')
         conn.rollback()
         print(f'❌ AIソース作成エラー: {e}')
         return None
@@ -357,8 +548,157 @@ def create_ai_source(
         conn.close()
 
 
+@timed('db.get_or_create_ai_review')
+def get_or_create_ai_review(shoe_id: str, brand: str, model_name: str) -> Optional[str]:
+    """
+    シューズのAI要約レビュー（type=AI_SUMMARY）のIDを返す（なければ収集中のレビューを作成）
+
+    管理画面のレビュー収集（/api/admin/reviews/collect）と同じく、AIソースはシューズごとに
+    1件のAI要約レビューにぶら下げる
+    """
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute('''
+                SELECT id FROM reviews
+                WHERE "shoeId" = %s AND type = 'AI_SUMMARY'
+                ORDER BY "postedAt"
+                LIMIT 1
+            ''', (shoe_id,))
+            row = cur.fetchone()
+            if row:
+                return row[0]
+
+            cur.execute('''
+                INSERT INTO reviews (
+                    id, "shoeId", type, "overallRating", title, content,
+                    "imageUrls", "usageScene", pros, cons, "sourceCount", "postedAt"
+                )
+                VALUES (
+                    gen_random_uuid()::text, %s, 'AI_SUMMARY', 5.0, %s, %s,
+                    %s, %s, %s, %s, 0, NOW()
+                )
+                RETURNING id
+            ''', (
+                shoe_id,
+                f'{brand} {model_name} レビュー要約（収集中）',
+                'レビューを収集中です。統合レビューを生成してください。',
+                [], [], [], [],
+            ))
+            review_id = cur.fetchone()[0]
+            conn.commit()
+            increment('db_rows_written_total', table='reviews')
+            return review_id
+    except Exception as e:
+        record_error('db.get_or_create_ai_review')
+        conn.rollback()
+        print(f'❌ AI要約レビュー作成エラー: {e}')
+        return None
+    finally:
+        conn.close()
+
+
+@timed('db.create_ai_sources')
+def create_ai_sources(sources: List[Dict]) -> int:
+    """
+    AIソースをまとめて作成（1トランザクション・1回の INSERT）し、レビューのソース数を更新
+
+    Args:
+        sources: create_ai_source の引数と同じキーの辞書のリスト
+
+    Returns:
+        作成した件数
+    """
+    if not sources:
+        return 0
+    conn = get_db_connection()
+    if not conn:
+        return 0
+
+    try:
+        with conn.cursor() as cur:
+            execute_values(cur, '''
+                INSERT INTO ai_sources (
+                    id, "reviewId", "sourceType", "sourceUrl", "sourceTitle",
+                    "sourceAuthor", "youtubeVideoId", summary, "rawData",
+                    reliability, "scrapedAt"
+                )
+                VALUES %s
+            ''', [
+                (
+                    source['review_id'],
+                    source['source_type'],
+                    source['source_url'],
+                    source.get('source_title'),
+                    source.get('source_author'),
+                    source.get('youtube_video_id'),
+                    source.get('summary'),
+                    Json(source['raw_data']) if source.get('raw_data') else None,
+                    source.get('reliability', 0.5),
+                )
+                for source in sources
+            ], template='(gen_random_uuid()::text, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())', page_size=len(sources))
+            created = cur.rowcount
+            cur.execute('''
+                UPDATE reviews AS r
+                SET "sourceCount" = (SELECT COUNT(*) FROM ai_sources a WHERE a."reviewId" = r.id)
+                WHERE r.id = ANY(%s)
+            ''', (list({source['review_id'] for source in sources}),))
+            conn.commit()
+            increment('db_rows_written_total', created, table='ai_sources')
+            return created
+    except Exception as e:
+        record_error('db.create_ai_sources')
+        conn.rollback()
+        print(f'❌ AIソース一括作成エラー: {e}')
+        return 0
+    finally:
+        conn.close()
+
+
+@timed('db.get_unsummarized_video_sources')
+def get_unsummarized_video_sources(limit: Optional[int] = None) -> List[Dict]:
+    """
+    AIソース（要約）がまだないYouTube動画のキュレーションソースを新しい順に取得
+
+    同じシューズのAI要約レビューに同じ動画（video_id または URL）のAIソースがあれば要約済みとみなす
+    """
+    conn = get_db_connection()
+    if not conn:
+        return []
+
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute('''
+                SELECT c.id, c."shoeId", s.brand, s."modelName", c.url, c.title,
+                       c.metadata->>'video_id' AS video_id
+                FROM "curatedSources" c
+                JOIN shoes s ON s.id = c."shoeId"
+                WHERE c.type = 'VIDEO' AND c.platform = 'youtube.com' AND c.status = 'PUBLISHED'
+                  AND NOT EXISTS (
+                      SELECT 1 FROM ai_sources a
+                      JOIN reviews r ON r.id = a."reviewId"
+                      WHERE r."shoeId" = c."shoeId"
+                        AND (a."youtubeVideoId" = c.metadata->>'video_id' OR a."sourceUrl" = c.url)
+                  )
+                ORDER BY c."createdAt" DESC
+                LIMIT %s
+            ''', (limit,))
+            return [dict(row) for row in cur.fetchall()]
+    except Exception as e:
+        record_error('db.get_unsummarized_video_sources')
+        print(f'❌ 未要約の動画取得エラー: {e}')
+        return []
+    finally:
+        conn.close()
+
+
 # ===== 統計 =====
 
+@timed('db.get_stats')
 def get_stats() -> Dict:
     """データベースの統計情報を取得"""
     conn = get_db_connection()
@@ -383,6 +723,7 @@ def get_stats() -> Dict:
             
             return stats
     except Exception as e:
+        record_error('db.get_stats')
         print(f'❌ 統計取得エラー: {e}')
         return {}
     finally:
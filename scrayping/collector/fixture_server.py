@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+APIスタンドインサーバー
+記録アーカイブ（http_client の記録モードで作成）を再生し、
+Serper / Google Custom Search / YouTube Data API のエンドポイントを模倣する
+
+使用方法:
+    # 1. 実APIのレスポンスを記録
+    python main.py --record fixtures/run.jsonl.gz collect-all --limit 5 --sources youtube,social
+
+    # 2. スタンドインサーバーを起動（レイテンシ50ms、5%でエラー注入）
+    python fixture_server.py --archive fixtures/run.jsonl.gz --latency-ms 50 --error-rate 0.05
+
+    # 3. 収集処理をスタンドインに向けて実行（APIキー不要）
+    COLLECTOR_API_BASE=http://127.0.0.1:8765 python main.py collect-all --limit 5
+
+アーカイブに無いリクエストは --fallback synthetic で合成レスポンスを返す（既定は404）
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qsl
+
+from http_client import request_key, load_archive
+
+DEFAULT_PORT = 8765
+
+# パス → プロバイダ名
+ROUTES = {
+    ('POST', '/search'): 'serper',
+    ('GET', '/customsearch/v1'): 'google_cse',
+    ('GET', '/youtube/v3/search'): 'youtube.search',
+    ('GET', '/youtube/v3/videos'): 'youtube.videos',
+    ('GET', '/youtube/v3/playlistItems'): 'youtube.playlistItems',
+}
+
+
+# ===== 合成レスポンス =====
+
+def _rng_for(key: str) -> random.Random:
+    """リクエストキーから決定的な乱数生成器を作る"""
+    seed = int(hashlib.sha1(key.encode('utf-8')).hexdigest()[:16], 16)
+    return random.Random(seed)
+
+
+def _synthetic_link(rng: random.Random, query: str, index: int) -> str:
+    """クエリの site: 指定に合わせたURLを生成"""
+    post_id = rng.randrange(10 ** 17, 10 ** 18)
+    candidates = []
+    if 'twitter.com' in query or 'x.com' in query:
+        candidates += [
+            f'https://x.com/runner{rng.randrange(1000)}/status/{post_id}',
+            f'https://twitter.com/runner{rng.randrange(1000)}/status/{post_id}',
+        ]
+    if 'reddit.com' in query:
+        subreddit = rng.choice(['running', 'RunningShoeGeeks', 'AdvancedRunning'])
+        candidates.append(f'https://www.reddit.com/r/{subreddit}/comments/{post_id % 10 ** 7:x}/review_{index}/')
+    if 'note.com' in query:
+        candidates.append(f'https://note.com/runner{rng.randrange(1000)}/n/n{post_id % 10 ** 12:x}')
+    if not candidates:
+        candidates.append(f'https://example.com/shoes/review-{post_id}')
+    return rng.choice(candidates)
+
+
+def synthetic_serper(body: Dict) -> Dict:
+    query = body.get('q', '')
+    rng = _rng_for(request_key('POST', '/search', body=body))
+    num = int(body.get('num', 10))
+    organic = []
+    for i in range(num):
+        organic.append({
+            'title': f'{query.split("(")[0].strip()} 感想 #{i + 1}',
+            'link': _synthetic_link(rng, query, i),
+            'snippet': f'{query.split("(")[0].strip()} を履いて {rng.randint(5, 42)}km 走ってみた。クッション性と反発が良い。',
+            'position': i + 1,
+        })
+    return {'searchParameters': {'q': query, 'num': num}, 'organic': organic}
+
+
+def synthetic_google_cse(params: Dict) -> Dict:
+    query = params.get('q', '')
+    rng = _rng_for(request_key('GET', '/customsearch/v1', params))
+    num = int(params.get('num', 10))
+    start = int(params.get('start', 1))
+    return {
+        'items': [
+            {
+                'title': f'{query} レビュー #{i + 1}',
+                'link': _synthetic_link(rng, query, i),
+                'snippet': f'{query} の実走レビュー。',
+            }
+            for i in range(num)
+        ],
+        # 実際の Custom Search API と同様に100件目までページ送りできる
+        'queries': {'nextPage': [{'startIndex': start + num}]} if start + num <= 91 else {},
+    }
+
+
+def synthetic_youtube_search(params: Dict) -> Dict:
+    query = params.get('q', '')
+    rng = _rng_for(request_key('GET', '/youtube/v3/search', params))
+    num = int(params.get('maxResults', 5))
+    items = []
+    for i in range(num):
+        video_id = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_') for _ in range(11))
+        channel = rng.randrange(50)
+        items.append({
+            'id': {'kind': 'youtube#video', 'videoId': video_id},
+            'snippet': {
+                'title': f'{query} #{i + 1}',
+                'channelTitle': f'Runner Channel {channel}',
+                'channelId': f'UC{channel:022d}',
+                'description': f'{query} を徹底レビュー',
+                'publishedAt': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00Z',
+                'thumbnails': {'high': {'url': f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg'}},
+            },
+        })
+    # ページトークンは連番（5ページまで）
+    page = int(params.get('pageToken') or 0)
+    response = {'items': items}
+    if page < 4:
+        response['nextPageToken'] = str(page + 1)
+    return response
+
+
+def synthetic_youtube_videos(params: Dict) -> Dict:
+    items = []
+    for video_id in filter(None, params.get('id', '').split(',')):
+        rng = _rng_for(video_id)
+        items.append({
+            'id': video_id,
+            'statistics': {
+                'viewCount': str(rng.randrange(100, 2_000_000)),
+                'likeCount': str(rng.randrange(0, 50_000)),
+                'commentCount': str(rng.randrange(0, 2_000)),
+            },
+        })
+    return {'items': items}
+
+
+def synthetic_youtube_playlist_items(params: Dict) -> Dict:
+    """アップロード再生リスト（1再生リスト200本、新しい順、ページトークンは先頭からの位置）"""
+    from config import POPULAR_MODELS
+
+    playlist_id = params.get('playlistId', '')
+    num = int(params.get('maxResults', 5))
+    offset = int(params.get('pageToken') or 0)
+    total = 200
+    items = []
+    for position in range(offset, min(offset + num, total)):
+        rng = _rng_for(f'{playlist_id}:{position}')
+        video_id = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_') for _ in range(11))
+        brand, model = rng.choice(POPULAR_MODELS)
+        published = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(1_730_000_000 - position * 86_400))
+        title = rng.choice([
+            f'{brand} {model} レビュー｜100km走った感想',
+            f'{brand} {model} review after 50 miles',
+            'ランニングフォーム改善のドリル',
+        ])
+        items.append({
+            'snippet': {
+                'title': title,
+                'description': f'{title}\n\n#ランニング',
+                'channelTitle': f'Runner Channel {playlist_id[-2:]}',
+                'videoOwnerChannelTitle': f'Runner Channel {playlist_id[-2:]}',
+                'videoOwnerChannelId': 'UC' + playlist_id[2:],
+                'publishedAt': published,
+                'resourceId': {'kind': 'youtube#video', 'videoId': video_id},
+                'thumbnails': {'high': {'url': f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg'}},
+            },
+            'contentDetails': {'videoId': video_id, 'videoPublishedAt': published},
+        })
+    response = {'items': items}
+    if offset + num < total:
+        response['nextPageToken'] = str(offset + num)
+    return response
+
+
+SYNTHETIC_HANDLERS = {
+    'serper': lambda params, body: synthetic_serper(body or {}),
+    'google_cse': lambda params, body: synthetic_google_cse(params),
+    'youtube.search': lambda params, body: synthetic_youtube_search(params),
+    'youtube.videos': lambda params, body: synthetic_youtube_videos(params),
+    'youtube.playlistItems': lambda params, body: synthetic_youtube_playlist_items(params),
+}
+
+
+# ===== アーカイブ再生 =====
+
+class ReplayStore:
+    """リクエストキー → 記録済みレスポンス（同一キーは記録順に巡回）"""
+
+    def __init__(self):
+        self._entries: Dict[str, List[Dict]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def load(self, path: str) -> int:
+        count = 0
+        for entry in load_archive(path):
+            self._entries.setdefault(entry['key'], []).append(entry)
+            count += 1
+        return count
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            return entries[index % len(entries)]
+
+
+class ServerConfig:
+    def __init__(
+        self,
+        store: ReplayStore,
+        fallback: str = '404',
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        error_rate: float = 0,
+        error_statuses: Tuple[int, ...] = (500,),
+        seed: int = 0,
+    ):
+        self.store = store
+        self.fallback = fallback
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.stats = {'replayed': 0, 'synthetic': 0, 'not_found': 0, 'injected_errors': 0, 'not_modified': 0}
+        self.stats_lock = threading.Lock()
+
+    def count(self, name: str):
+        with self.stats_lock:
+            self.stats[name] += 1
+
+
+def make_handler(config: ServerConfig):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status: int, body: str, headers: Optional[Dict] = None):
+            payload = body.encode('utf-8')
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            if 'content-type' not in {k.lower() for k in (headers or {})}:
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _handle(self, method: str):
+            parts = urlsplit(self.path)
+            path = parts.path.rstrip('/')
+            params = dict(parse_qsl(parts.query, keep_blank_values=True))
+            body = None
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                raw = self.rfile.read(length)
+                try:
+                    body = json.loads(raw)
+                except ValueError:
+                    body = None
+
+            # レイテンシとエラーの注入
+            with config.rng_lock:
+                delay = config.latency_ms + config.rng.uniform(-config.jitter_ms, config.jitter_ms)
+                inject_error = config.rng.random() < config.error_rate
+                error_status = config.rng.choice(config.error_statuses)
+            if delay > 0:
+                time.sleep(delay / 1000)
+            if inject_error:
+                config.count('injected_errors')
+                self._send(error_status, json.dumps({'error': {'code': error_status, 'message': 'injected error'}}))
+                return
+
+            key = request_key(method, path, params, body)
+            entry = config.store.lookup(key)
+            if entry is not None:
+                config.count('replayed')
+                status, headers, payload = entry['status'], dict(entry.get('headers', {})), entry['body']
+            else:
+                provider = ROUTES.get((method, path))
+                if config.fallback != 'synthetic' or provider not in SYNTHETIC_HANDLERS:
+                    config.count('not_found')
+                    self._send(404, json.dumps({'error': {'code': 404, 'message': f'no fixture for {key}'}}, ensure_ascii=False))
+                    return
+                config.count('synthetic')
+                payload = json.dumps(SYNTHETIC_HANDLERS[provider](params, body), ensure_ascii=False)
+                status = 200
+                headers = {'etag': '"' + hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16] + '"'}
+
+            # 条件付きリクエスト
+            etag = headers.get('etag')
+            if etag and self.headers.get('If-None-Match') == etag:
+                config.count('not_modified')
+                self._send(304, '', {'etag': etag})
+                return
+            self._send(status, payload, headers)
+
+        def do_GET(self):
+            self._handle('GET')
+
+        def do_POST(self):
+            self._handle('POST')
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+def start_server(config: ServerConfig, port: int = DEFAULT_PORT, addr: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """バックグラウンドスレッドでスタンドインサーバーを起動（ベンチマークから利用）"""
+    server = ThreadingHTTPServer((addr, port), make_handler(config))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='fixture-server', daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='APIスタンドインサーバー（記録アーカイブの再生）')
+    parser.add_argument('--archive', '-a', action='append', default=[], help='記録アーカイブ (.jsonl.gz)、複数指定可')
+    parser.add_argument('--port', '-p', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--addr', default='127.0.0.1')
+    parser.add_argument('--fallback', choices=['404', 'synthetic'], default='404', help='未記録リクエストの扱い')
+    parser.add_argument('--latency-ms', type=float, default=0, help='応答ごとの遅延（ミリ秒）')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='遅延の揺らぎ（±ミリ秒）')
+    parser.add_argument('--error-rate', type=float, default=0, help='エラー応答を返す確率 (0〜1)')
+    parser.add_argument('--error-statuses', default='500', help='注入するHTTPステータス（カンマ区切り）')
+    parser.add_argument('--seed', type=int, default=0, help='遅延・エラー注入の乱数シード')
+    args = parser.parse_args()
+
+    store = ReplayStore()
+    for path in args.archive:
+        count = store.load(path)
+        print(f'📼 {path}: {count} 件のレスポンスを読み込み')
+
+    config = ServerConfig(
+        store,
+        fallback=args.fallback,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_statuses=tuple(int(s) for s in args.error_statuses.split(',') if s),
+        seed=args.seed,
+    )
+    server = ThreadingHTTPServer((args.addr, args.port), make_handler(config))
+    server.daemon_threads = True
+    print(f'🧪 スタンドインサーバー起動: http://{args.addr}:{args.port}')
+    print(f'   COLLECTOR_API_BASE=http://{args.addr}:{args.port} を設定して収集処理を実行してください')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f'\n📊 {json.dumps(config.stats, ensure_ascii=False)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+HTTP通信モジュール
+外部API（Serper / Google CSE / YouTube Data API）への呼び出しを一元化
+
+- 転送バイト数と API クォータ消費を instrumentation に記録
+- 記録モード: レスポンスを gzip 圧縮の JSON Lines アーカイブに保存
+  （fixture_server.py で再生し、APIキーやネットワークなしで収集処理を実行できる）
+
+記録の有効化:
+    HTTP_RECORD_PATH=fixtures/run.jsonl.gz python main.py collect-all
+    python main.py --record fixtures/run.jsonl.gz collect-all
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from instrumentation import charge_quota, record_bytes
+
+# アーカイブに保存しない認証系パラメータ・ヘッダ
+SECRET_PARAMS = {'key', 'api_key', 'access_token'}
+SECRET_HEADERS = {'x-api-key', 'authorization'}
+# 記録するレスポンスヘッダ
+RECORDED_HEADERS = ('content-type', 'etag')
+
+_record_path: Optional[str] = os.getenv('HTTP_RECORD_PATH') or None
+_record_lock = threading.Lock()
+_session = requests.Session()
+
+
+def start_recording(path: str):
+    """以降のレスポンスを path に追記保存する"""
+    global _record_path
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    _record_path = path
+    print(f'📼 HTTPレスポンスを記録中: {path}')
+
+
+def stop_recording():
+    global _record_path
+    _record_path = None
+
+
+def request_key(method: str, path: str, params: Optional[Dict] = None, body: Optional[Dict] = None) -> str:
+    """
+    リクエストを同一視するためのキー（記録・再生で共通）
+
+    認証パラメータを除き、パラメータとJSONボディを正規化して連結する
+    """
+    clean_params = {
+        k: str(v) for k, v in (params or {}).items()
+        if k not in SECRET_PARAMS and v is not None
+    }
+    return json.dumps(
+        [method.upper(), path.rstrip('/'), clean_params, body or {}],
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(',', ':'),
+    )
+
+
+def _record(method: str, url: str, params: Optional[Dict], body: Optional[Dict], response: requests.Response):
+    headers = {
+        name: response.headers[name]
+        for name in RECORDED_HEADERS
+        if name in response.headers
+    }
+    entry = {
+        'key': request_key(method, urlsplit(url).path, params, body),
+        'url': url,
+        'status': response.status_code,
+        'headers': headers,
+        'body': response.text,
+        'recorded_at': time.time(),
+    }
+    line = json.dumps(entry, ensure_ascii=False) + '\n'
+    # gzip の追記はメンバーの連結になり、gzip.open でそのまま読み出せる
+    with _record_lock:
+        with gzip.open(_record_path, 'at', encoding='utf-8') as f:
+            f.write(line)
+
+
+def request(
+    stage: str,
+    method: str,
+    url: str,
+    params: Optional[Dict] = None,
+    json_body: Optional[Dict] = None,
+    headers: Optional[Dict] = None,
+    timeout: float = 30,
+) -> requests.Response:
+    """
+    外部APIを呼び出してレスポンスを返す（ステータスの検査は呼び出し側で行う）
+
+    Args:
+        stage: 計測用のステージ名（instrumentation の転送バイト数・クォータ消費に加算）
+    """
+    response = _session.request(
+        method,
+        url,
+        params=params,
+        json=json_body,
+        headers=headers,
+        timeout=timeout,
+    )
+    charge_quota(stage)
+    record_bytes(stage, len(response.content))
+    # 304 は条件付きリクエストへの応答で、再生時はスタンドインサーバーが ETag から返すため記録しない
+    if _record_path and response.status_code != 304:
+        try:
+            _record(method, url, params, json_body, response)
+        except Exception as e:
+            print(f'⚠️ HTTPレスポンスの記録に失敗: {e}')
+    return response
+
+
+def get(stage: str, url: str, **kwargs) -> requests.Response:
+    return request(stage, 'GET', url, **kwargs)
+
+
+def post(stage: str, url: str, **kwargs) -> requests.Response:
+    return request(stage, 'POST', url, **kwargs)
+
+
+def load_archive(path: str):
+    """記録アーカイブのエントリを順に返す"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
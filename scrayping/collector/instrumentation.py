@@ -0,0 +1,350 @@
+"""
+計測モジュール
+収集処理のステージ別レイテンシ・呼び出し回数・転送量・エラー数を記録
+
+使用方法:
+    from instrumentation import timed, stage, record_bytes, record_error
+
+    @timed('serper')
+    def search_serper(...): ...
+
+    with stage('dedup'):
+        ...
+
+    # ラベル付きカウンタ（Prometheus出力用）
+    increment('db_rows_written_total', table='curatedSources')
+
+無効時（デフォルト）はフラグ判定だけで本体を呼び出すため、
+計測のオーバーヘッドはほぼゼロ
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+# ヒストグラムのバケット上限（秒）: 10µs 〜 約84秒を √2 刻み
+BUCKET_BOUNDS = tuple(0.00001 * (2 ** (i / 2)) for i in range(47))
+
+_enabled = False
+_lock = threading.Lock()
+_NULL_CONTEXT = nullcontext()
+
+
+class Histogram:
+    """固定バケットのレイテンシヒストグラム（パーセンタイルはバケット内で線形補間）"""
+
+    __slots__ = ('bucket_counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        # 最後の要素は上限超え（+Inf）バケット
+        self.bucket_counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect_left(BUCKET_BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """q (0〜1) 分位点の推定値を返す"""
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.bucket_counts):
+            if bucket_count == 0:
+                continue
+            if cumulative + bucket_count >= rank:
+                lower = BUCKET_BOUNDS[i - 1] if i > 0 else 0.0
+                upper = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                fraction = (rank - cumulative) / bucket_count
+                estimate = lower + (upper - lower) * fraction
+                return min(max(estimate, self.min), self.max)
+            cumulative += bucket_count
+        return self.max
+
+
+class StageStats:
+    """1ステージ分の集計値"""
+
+    __slots__ = ('calls', 'errors', 'bytes', 'latency')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latency = Histogram()
+
+    def to_dict(self) -> Dict:
+        latency = self.latency
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'bytes': self.bytes,
+            'total_seconds': round(latency.total, 6),
+            'latency_ms': {
+                'p50': round(latency.quantile(0.50) * 1000, 3),
+                'p95': round(latency.quantile(0.95) * 1000, 3),
+                'p99': round(latency.quantile(0.99) * 1000, 3),
+                'min': round(latency.min * 1000, 3) if latency.count else 0.0,
+                'max': round(latency.max * 1000, 3),
+            },
+        }
+
+
+_stages: Dict[str, StageStats] = {}
+# ステージ名 → APIプロバイダ名 / 1呼び出しあたりのクォータ消費（timed() で登録）
+_stage_providers: Dict[str, str] = {}
+_stage_quota_costs: Dict[str, int] = {}
+# プロバイダ名 → 実際に送ったリクエストのクォータ消費（charge_quota() で加算）
+_quota_units: Dict[str, int] = {}
+# (メトリクス名, ラベル) → 値
+_counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+
+def enable():
+    """計測を有効化"""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """計測を無効化"""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    """集計値をクリア"""
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _quota_units.clear()
+
+
+def _get_stage(name: str) -> StageStats:
+    stats = _stages.get(name)
+    if stats is None:
+        stats = _stages.setdefault(name, StageStats())
+    return stats
+
+
+def observe(name: str, seconds: float, error: bool = False):
+    """1回分の呼び出しを記録"""
+    with _lock:
+        stats = _get_stage(name)
+        stats.calls += 1
+        if error:
+            stats.errors += 1
+        stats.latency.observe(seconds)
+
+
+def record_bytes(name: str, num_bytes: int):
+    """転送バイト数を加算"""
+    if not _enabled:
+        return
+    with _lock:
+        _get_stage(name).bytes += num_bytes
+
+
+def record_error(name: str):
+    """例外を握りつぶす関数内で発生したエラーを記録"""
+    if not _enabled:
+        return
+    with _lock:
+        _get_stage(name).errors += 1
+
+
+def increment(name: str, value: float = 1, **labels):
+    """ラベル付きカウンタを加算"""
+    if not _enabled:
+        return
+    key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def charge_quota(name: str):
+    """
+    ステージ name のリクエストを1回送ったものとしてクォータ消費を加算
+
+    APIキー未設定などでリクエストを送らずに戻った呼び出しは数えないよう、
+    呼び出し回数ではなく http_client がリクエストを送るたびに加算する
+    """
+    if not _enabled:
+        return
+    cost = _stage_quota_costs.get(name)
+    if not cost:
+        return
+    provider = _stage_providers.get(name, name)
+    with _lock:
+        _quota_units[provider] = _quota_units.get(provider, 0) + cost
+
+
+def record_cache(cache: str, hit: bool):
+    """キャッシュのヒット/ミスを記録"""
+    increment('cache_hits_total' if hit else 'cache_misses_total', cache=cache)
+
+
+@contextmanager
+def _timed_block(name: str):
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        observe(name, time.perf_counter() - start, error=failed)
+
+
+def stage(name: str):
+    """with文でブロックの処理時間を計測"""
+    if not _enabled:
+        return _NULL_CONTEXT
+    return _timed_block(name)
+
+
+def timed(name: str, provider: Optional[str] = None, quota_cost: int = 0):
+    """
+    関数の処理時間を計測するデコレータ
+
+    Args:
+        name: ステージ名
+        provider: 外部APIを呼ぶステージの場合はプロバイダ名（serper, youtube 等）
+        quota_cost: 1リクエストあたりのAPIクォータ消費量（charge_quota() で加算）
+    """
+    if provider:
+        _stage_providers[name] = provider
+    if quota_cost:
+        _stage_quota_costs[name] = quota_cost
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            failed = False
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                observe(name, time.perf_counter() - start, error=failed)
+        return wrapper
+    return decorator
+
+
+def snapshot() -> Dict[str, Dict]:
+    """ステージ別の集計結果を辞書で返す"""
+    with _lock:
+        return {name: _stages[name].to_dict() for name in sorted(_stages)}
+
+
+def stage_items() -> List[Tuple[str, Optional[str], StageStats]]:
+    """(ステージ名, プロバイダ名, 集計値) の一覧を返す（エクスポータ用）"""
+    with _lock:
+        return [
+            (name, _stage_providers.get(name), _stages[name])
+            for name in sorted(_stages)
+        ]
+
+
+def quota_units_used() -> Dict[str, int]:
+    """プロバイダ別のクォータ消費量（プロセス起動後の累計）"""
+    with _lock:
+        return dict(_quota_units)
+
+
+def counter_items() -> List[Tuple[str, Dict[str, str], float]]:
+    """(メトリクス名, ラベル, 値) の一覧を返す"""
+    with _lock:
+        return [
+            (name, dict(labels), value)
+            for (name, labels), value in sorted(_counters.items())
+        ]
+
+
+def build_report(started_at: Optional[float] = None) -> Dict:
+    """実行レポートを作成"""
+    report = {'stages': snapshot()}
+    counters = counter_items()
+    if counters:
+        report['counters'] = [
+            {'name': name, 'labels': labels, 'value': value}
+            for name, labels, value in counters
+        ]
+    if started_at is not None:
+        report['wall_seconds'] = round(time.perf_counter() - started_at, 6)
+    return report
+
+
+def format_report(report: Dict, fmt: str = 'json') -> str:
+    """レポートを指定形式の文字列に変換"""
+    if fmt == 'json':
+        return json.dumps(report, ensure_ascii=False, indent=2)
+
+    lines: List[str] = ['=== 計測レポート ===']
+    if 'wall_seconds' in report:
+        lines.append(f'実行時間: {report["wall_seconds"]:.3f}s')
+    lines.append(
+        f'{"stage":<32} {"calls":>7} {"errors":>6} {"bytes":>12} '
+        f'{"p50ms":>9} {"p95ms":>9} {"p99ms":>9}'
+    )
+    for name, stats in report['stages'].items():
+        latency = stats['latency_ms']
+        lines.append(
+            f'{name:<32} {stats["calls"]:>7} {stats["errors"]:>6} {stats["bytes"]:>12} '
+            f'{latency["p50"]:>9.3f} {latency["p95"]:>9.3f} {latency["p99"]:>9.3f}'
+        )
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    # 無効時と有効時のオーバーヘッドを比較
+    def _noop():
+        return None
+
+    wrapped = timed('noop')(_noop)
+    iterations = 1_000_000
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        _noop()
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        wrapped()
+    disabled_cost = time.perf_counter() - start
+
+    enable()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        wrapped()
+    enabled_cost = time.perf_counter() - start
+
+    print('=== 計測オーバーヘッド（1呼び出しあたり） ===')
+    print(f'   素の呼び出し: {baseline / iterations * 1e9:.0f} ns')
+    print(f'   無効時:       {disabled_cost / iterations * 1e9:.0f} ns')
+    print(f'   有効時:       {enabled_cost / iterations * 1e9:.0f} ns')
+    print(format_report(build_report(), 'text'))
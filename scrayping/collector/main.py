@@ -7,26 +7,48 @@
     python main.py --help
     python main.py shoes --list
     python main.py shoes --add "Nike" "Pegasus 41"
+    python main.py shoes trending --window 7d
     python main.py collect --shoe-id <id> --source youtube
     python main.py collect-all --limit 10
+    python main.py channels poll
+    python main.py refresh-stats --concurrency 4
+    python main.py --report json collect-all --limit 10
+    python main.py --metrics-port 9464 collect-all --interval 60
+    python main.py --profile --profile-mode sampling collect-all --limit 10
 """
 
 import argparse
 import json
 import sys
+import time
 from datetime import datetime
 from typing import List, Optional
 
 # 同一ディレクトリのモジュールをインポート
-from config import check_config, POPULAR_MODELS, SERPER_API_KEY
+import http_client
+import instrumentation
+import metrics_exporter
+import profiling
+import trending
+from config import check_config, POPULAR_MODELS, SERPER_API_KEY, REFRESH_STATS_CONCURRENCY, REFRESH_STATS_MAX_UNITS
 from shoe_finder import find_trending_shoes, get_shoes_from_predefined_list, ShoeInfo
-from youtube_collector import search_shoe_reviews, search_running_shoe_reviews, YouTubeVideo
-from web_collector import search_shoe_reviews_social, SocialPost  # Web検索ベース（API不要）
+from shoe_identity import load_shoe_index_from_db
+from shoe_matcher import load_catalog_from_db
+from shoe_fuzzy_index import find_shoe_candidates
+from near_duplicates import get_near_duplicate_index
+from youtube_collector import (
+    search_shoe_reviews,
+    search_running_shoe_reviews,
+    enrich_video_stats,
+    YouTubeVideo,
+)
+from youtube_channels import ChannelRegistry, poll_channels
+from refresh_stats import refresh_video_stats
+from web_collector import search_shoe_reviews_social, start_run, SocialPost  # Web検索ベース（API不要）
 from db_handler import (
     get_all_shoes,
     get_shoe_by_brand_model,
     create_shoe,
-    ensure_shoe_exists,
     create_curated_source,
     create_external_review,
     get_curated_sources_for_shoe,
@@ -83,6 +105,12 @@ def cmd_shoes_add(args):
         print(f'⚠️ 既に存在します (ID: {existing["id"]})')
         return
 
+    # 表記ゆれ（'Pegasus41' / 'ナイキ ペガサス 41' など）の重複登録を防ぐ
+    variant_id = load_shoe_index_from_db().resolve(brand, model_name)
+    if variant_id:
+        print(f'⚠️ 表記違いで既に存在します (ID: {variant_id})')
+        return
+
     shoe_id = create_shoe(brand, model_name, category)
     if shoe_id:
         print(f'✅ 追加完了 (ID: {shoe_id})')
@@ -95,25 +123,46 @@ def cmd_shoes_import(args):
     print('=== シューズインポート ===\n')
     
     shoes = get_shoes_from_predefined_list()
+    # 既存シューズは索引で判定し、1件ごとのDB照会をなくす
+    index = load_shoe_index_from_db()
     added = 0
     skipped = 0
 
     for shoe in shoes:
-        shoe_id = ensure_shoe_exists(shoe.brand, shoe.model_name)
+        if index.resolve(shoe.brand, shoe.model_name):
+            print(f'⏭️ {shoe.brand} {shoe.model_name} (既存)')
+            skipped += 1
+            continue
+
+        shoe_id = create_shoe(shoe.brand, shoe.model_name)
         if shoe_id:
-            existing = get_shoe_by_brand_model(shoe.brand, shoe.model_name)
-            if existing and existing['id'] == shoe_id:
-                print(f'✅ {shoe.brand} {shoe.model_name}')
-                added += 1
-            else:
-                print(f'⏭️ {shoe.brand} {shoe.model_name} (既存)')
-                skipped += 1
+            index.add(shoe_id, shoe.brand, shoe.model_name)
+            print(f'✅ {shoe.brand} {shoe.model_name}')
+            added += 1
         else:
             print(f'❌ {shoe.brand} {shoe.model_name}')
 
     print(f'\n完了: 追加 {added} 件, スキップ {skipped} 件')
 
 
+def cmd_shoes_match(args):
+    """表記ゆれのあるモデル名をカタログのシューズに照合"""
+    print(f'🔎 照合: {args.brand} {args.model}\n')
+    candidates = find_shoe_candidates(args.brand, args.model, k=args.top)
+
+    if not candidates:
+        print('候補が見つかりませんでした')
+        return
+
+    for candidate in candidates:
+        print(f'  {candidate.score:.3f}  {candidate.brand} {candidate.model_name} (ID: {candidate.shoe_id})')
+
+
+def cmd_shoes_trending(args):
+    """言及数が伸びているシューズを表示"""
+    trending.print_trending(args.window, args.top)
+
+
 def cmd_collect(args):
     """特定のシューズのレビューを収集"""
     shoe_id = args.shoe_id
@@ -126,17 +175,24 @@ def cmd_collect(args):
     if not shoe:
         print(f'❌ シューズが見つかりません: {shoe_id}')
         return
+    # 抽出（トレンド記録）はDBのカタログを含むマッチャーで行う
+    load_catalog_from_db(shoes)
 
     brand = shoe['brand']
     model_name = shoe['modelName']
     print(f'=== レビュー収集: {brand} {model_name} ===\n')
 
     total_collected = 0
+    # トレンド検出用に収集したタイトル・本文を集める
+    texts = []
+    registry = start_run()
 
     # YouTube
     if 'youtube' in sources:
         print('🎬 YouTube検索中...')
         videos = search_shoe_reviews(brand, model_name, max_results=10)
+        texts.extend(f'{video.title} {video.description}' for video in videos)
+        discover_channels(videos)
         for video in videos:
             source_id = create_curated_source(
                 shoe_id=shoe_id,
@@ -171,9 +227,19 @@ def cmd_collect(args):
             'note': {'source_type': 'ARTICLE', 'platform': 'note.com', 'reliability': 0.7, 'emoji': '📗'},
         }
 
+        # 既存のレビューと実行中に書き込んだ投稿のほぼ重複（別URLの同じスレッド・リポスト等）はまとめる
+        near_duplicates = get_near_duplicate_index()
         for plat_key, config in platform_config.items():
             posts = social_results.get(plat_key, [])
+            texts.extend(f'{post.title} {post.snippet}' for post in posts)
             for post in posts:
+                # 同じ投稿は実行内で1回だけ書き込む
+                if not registry.claim_write(shoe_id, post):
+                    continue
+                match = near_duplicates.check_and_add(shoe_id, post.title, post.snippet, post.url)
+                if match:
+                    print(f'   🔁 ほぼ重複のためスキップ: {post.url[:50]}（≈ {match.ref[:50]}）')
+                    continue
                 # CuratedSource に保存
                 source_id = create_curated_source(
                     shoe_id=shoe_id,
@@ -203,6 +269,7 @@ def cmd_collect(args):
     elif 'social' in sources:
         print('⚠️ SERPER_API_KEYが未設定のためソーシャル検索をスキップ\n')
 
+    trending.record_texts(texts)
     print(f'=== 完了: 合計 {total_collected} 件登録 ===')
 
 
@@ -211,15 +278,47 @@ def cmd_collect_all(args):
     limit = args.limit or 5
     sources = args.sources.split(',') if args.sources else ['youtube']
 
+    interval = getattr(args, 'interval', None)
+    if not interval:
+        run_collect_all(limit, sources)
+        return
+
+    # デーモンモード: 一定間隔で収集を繰り返す
+    print(f'🔁 {interval} 分ごとに収集を実行します（Ctrl+C で終了）\n')
+    try:
+        while True:
+            run_collect_all(limit, sources)
+            metrics_exporter.flush()
+            time.sleep(interval * 60)
+    except KeyboardInterrupt:
+        print('\n⏹️ 停止しました')
+
+
+def run_collect_all(limit: int, sources: List[str]):
+    """全シューズの収集を1回実行"""
     print('=== 全シューズのレビュー収集 ===\n')
     
     shoes = get_all_shoes()
     if not shoes:
         print('シューズが登録されていません。先に shoes import を実行してください。')
         return
+    # 抽出（トレンド記録）はDBのカタログを含むマッチャーで行う（実行ごとに取り直す）
+    load_catalog_from_db(shoes)
 
     shoes_to_process = shoes[:limit]
     print(f'{len(shoes_to_process)} 件のシューズを処理します\n')
+    # トレンド検出用に収集したタイトル・本文を集める
+    texts = []
+    registry = start_run()
+    near_duplicates = get_near_duplicate_index() if 'social' in sources and SERPER_API_KEY else None
+    near_duplicate_count = 0
+    # 巡回と検索でのチャンネル発見は同じ登録簿を使う（別々に読み込むと後の保存が巡回の既読位置を戻す）
+    channel_registry = ChannelRegistry.load() if {'youtube', 'channels'} & set(sources) else None
+
+    # 登録済みチャンネルの新着（全シューズが対象、1チャンネル1ユニット程度）
+    if 'channels' in sources:
+        collect_from_channels(shoes, channel_registry)
+        print()
 
     for i, shoe in enumerate(shoes_to_process, 1):
         print(f'[{i}/{len(shoes_to_process)}] {shoe["brand"]} {shoe["modelName"]}')
@@ -227,6 +326,8 @@ def cmd_collect_all(args):
         # YouTube
         if 'youtube' in sources:
             videos = search_shoe_reviews(shoe['brand'], shoe['modelName'], max_results=5)
+            texts.extend(f'{video.title} {video.description}' for video in videos)
+            discover_channels(videos, channel_registry)
             for video in videos:
                 create_curated_source(
                     shoe_id=shoe['id'],
@@ -255,7 +356,14 @@ def cmd_collect_all(args):
 
             for plat_key, config in platform_config.items():
                 count = 0
+                texts.extend(f'{post.title} {post.snippet}' for post in social_results.get(plat_key, []))
                 for post in social_results.get(plat_key, []):
+                    # 同じ投稿は実行内で1回だけ書き込む
+                    if not registry.claim_write(shoe['id'], post):
+                        continue
+                    if near_duplicates.check_and_add(shoe['id'], post.title, post.snippet, post.url):
+                        near_duplicate_count += 1
+                        continue
                     created = create_curated_source(
                         shoe_id=shoe['id'],
                         source_type=config['source_type'],
@@ -280,9 +388,152 @@ def cmd_collect_all(args):
 
         print()
 
+    trending.record_texts(texts)
+    if channel_registry:
+        save_channel_registry(channel_registry)
+    if registry.duplicates:
+        print(f'🔁 クエリ間の重複: {registry.duplicates} 件を統合')
+    if near_duplicate_count:
+        print(f'🔁 ほぼ重複: {near_duplicate_count} 件をスキップ')
     print('=== 完了 ===')
 
 
+# ===== レビューチャンネルの巡回 =====
+
+def discover_channels(videos: List[YouTubeVideo], channel_registry: Optional[ChannelRegistry] = None):
+    """search.list で見つかったレビュー動画のチャンネルを登録簿に数える（registry 未指定なら読み込んで保存）"""
+    registry = channel_registry or ChannelRegistry.load()
+    for channel in registry.record_search_hits(videos):
+        print(f'   📡 巡回対象に追加: {channel.name or channel.channel_id}')
+    if channel_registry is None:
+        save_channel_registry(registry)
+
+
+def save_channel_registry(channel_registry: ChannelRegistry):
+    try:
+        channel_registry.save()
+    except Exception as e:
+        print(f'⚠️ チャンネル登録簿の保存に失敗: {e}')
+
+
+def collect_from_channels(shoes: List[dict], channel_registry: Optional[ChannelRegistry] = None) -> int:
+    """
+    巡回対象チャンネルの新着動画をシューズに照合して登録し、登録件数を返す
+
+    既読位置は登録が終わってから保存する（登録中に失敗したら保存せず、次回に取り直す）
+    """
+    channel_registry = channel_registry or ChannelRegistry.load()
+    if not channel_registry.active_channels():
+        print('⚠️ 巡回対象のチャンネルがありません（channels add で登録するか、youtube ソースの検索で自動登録されます）')
+        return 0
+
+    print('📡 チャンネル巡回中...')
+    cursors = channel_registry.cursors()
+    matches, report = poll_channels(channel_registry, shoes)
+    print(f'   {report.summary()}')
+
+    # 統計情報は照合できた動画だけまとめて取得
+    enrich_video_stats(list({video.video_id: video for _, video in matches}.values()))
+
+    try:
+        created = _create_channel_sources(matches)
+    except Exception as e:
+        # 既読位置を巡回前に戻す（登録済みの動画は次回の重複チェックで飛ばされる）
+        channel_registry.restore_cursors(cursors)
+        print(f'❌ チャンネル巡回の登録に失敗（既読位置は進めません）: {e}')
+        return 0
+    save_channel_registry(channel_registry)
+    print(f'   チャンネル巡回: {created} 件登録')
+    return created
+
+
+def _create_channel_sources(matches: List[tuple]) -> int:
+    created = 0
+    for shoe, video in matches:
+        source_id = create_curated_source(
+            shoe_id=shoe['id'],
+            source_type='VIDEO',
+            platform='youtube.com',
+            title=video.title,
+            url=video.url,
+            author=video.channel_name,
+            excerpt=video.description[:200] if video.description else None,
+            thumbnail_url=video.thumbnail_url,
+            reliability=0.8,
+            metadata={
+                'video_id': video.video_id,
+                'view_count': video.view_count,
+                'like_count': video.like_count,
+                'published_at': video.published_at,
+            },
+            raise_on_error=True,
+        )
+        if source_id:
+            print(f'   ✅ {shoe["brand"]} {shoe["modelName"]}: {video.title[:40]}...')
+            created += 1
+    return created
+
+
+def cmd_channels_list(args):
+    """チャンネル登録簿を表示"""
+    channel_registry = ChannelRegistry.load()
+    channels = sorted(channel_registry.channels.values(), key=lambda c: (not c.active, -c.review_hits))
+    if not channels:
+        print('チャンネルが登録されていません')
+        return
+
+    print(f'=== レビューチャンネル（巡回対象 {len(channel_registry.active_channels())} / {len(channels)} 件）===\n')
+    for channel in channels:
+        status = '📡' if channel.active else '⏸️'
+        print(f'{status} {channel.name or "(名前未取得)"} ({channel.channel_id})')
+        print(f'   検索での発見: {channel.review_hits} 回, 最終巡回: {channel.polled_at or "-"}, 既読: {channel.last_published_at or "-"}')
+
+
+def cmd_channels_add(args):
+    """チャンネルを巡回対象に追加"""
+    if not args.channel_id.startswith('UC'):
+        print(f'❌ チャンネルIDは UC で始まるIDで指定してください: {args.channel_id}')
+        return
+    channel_registry = ChannelRegistry.load()
+    channel_registry.add(args.channel_id, args.name or '')
+    save_channel_registry(channel_registry)
+    print(f'✅ 巡回対象に追加: {args.name or args.channel_id}')
+
+
+def cmd_channels_remove(args):
+    """チャンネルを登録簿から削除"""
+    channel_registry = ChannelRegistry.load()
+    if channel_registry.remove(args.channel_id):
+        save_channel_registry(channel_registry)
+        print(f'🗑️ 削除しました: {args.channel_id}')
+    else:
+        print(f'⚠️ 登録されていません: {args.channel_id}')
+
+
+def cmd_channels_poll(args):
+    """巡回対象チャンネルの新着動画を収集"""
+    print('=== チャンネル巡回 ===\n')
+    shoes = get_all_shoes()
+    if not shoes:
+        print('シューズが登録されていません。先に shoes import を実行してください。')
+        return
+    collect_from_channels(shoes)
+
+
+def cmd_refresh_stats(args):
+    """保存済みYouTube動画の統計を更新"""
+    print('=== 動画統計の更新 ===\n')
+    if args.dry_run:
+        print('（dry-run: DBは更新しません）')
+    report = refresh_video_stats(
+        concurrency=args.concurrency,
+        limit=args.limit,
+        max_units=args.max_units,
+        dry_run=args.dry_run,
+    )
+    print(f'📊 {report.summary()}')
+
+
 def cmd_sources(args):
     """シューズのソースを表示"""
     shoe_id = args.shoe_id
@@ -322,6 +573,18 @@ def cmd_sources(args):
 
 def main():
     parser = argparse.ArgumentParser(description='レビュー収集ツール')
+    parser.add_argument('--report', choices=['json', 'text'], help='ステージ別の計測レポートを出力')
+    parser.add_argument('--report-file', help='計測レポートの出力先（未指定時は標準出力）')
+    parser.add_argument('--metrics-port', type=int, help='Prometheusメトリクスを公開するHTTPポート')
+    parser.add_argument('--metrics-addr', default='127.0.0.1', help='メトリクス公開アドレス')
+    parser.add_argument('--metrics-textfile', help='node_exporter textfile collector 用の出力先 (.prom)')
+    parser.add_argument('--profile', action='store_true', help='コマンド全体をプロファイル')
+    parser.add_argument(
+        '--profile-mode', choices=profiling.PROFILE_MODES, default='cprofile',
+        help='プロファイルの方式 (cprofile|sampling、既定 cprofile)',
+    )
+    parser.add_argument('--profile-dir', default='profiles', help='プロファイル結果の出力先ディレクトリ')
+    parser.add_argument('--record', help='外部APIのレスポンスを記録するアーカイブ (.jsonl.gz)')
     subparsers = parser.add_subparsers(dest='command', help='コマンド')
 
     # config コマンド
@@ -347,6 +610,19 @@ def main():
     parser_shoes_import = shoes_subparsers.add_parser('import', help='事前定義リストからインポート')
     parser_shoes_import.set_defaults(func=cmd_shoes_import)
 
+    # shoes match
+    parser_shoes_match = shoes_subparsers.add_parser('match', help='表記ゆれのあるモデル名をカタログに照合')
+    parser_shoes_match.add_argument('brand', help='ブランド名（空文字で全ブランド）')
+    parser_shoes_match.add_argument('model', help='モデル名')
+    parser_shoes_match.add_argument('--top', '-k', type=int, default=5, help='表示する候補数')
+    parser_shoes_match.set_defaults(func=cmd_shoes_match)
+
+    # shoes trending
+    parser_shoes_trending = shoes_subparsers.add_parser('trending', help='言及数が伸びているシューズを表示')
+    parser_shoes_trending.add_argument('--window', '-w', default='7d', help='比較する期間（例: 7d, 2w）')
+    parser_shoes_trending.add_argument('--top', '-k', type=int, default=20, help='表示件数')
+    parser_shoes_trending.set_defaults(func=cmd_shoes_trending)
+
     # collect コマンド
     parser_collect = subparsers.add_parser('collect', help='特定シューズのレビュー収集')
     parser_collect.add_argument('shoe_id', help='シューズID')
@@ -356,9 +632,37 @@ def main():
     # collect-all コマンド
     parser_collect_all = subparsers.add_parser('collect-all', help='全シューズのレビュー収集')
     parser_collect_all.add_argument('--limit', '-l', type=int, help='処理するシューズ数', default=5)
-    parser_collect_all.add_argument('--sources', '-s', help='ソース (youtube,social)', default='youtube')
+    parser_collect_all.add_argument('--sources', '-s', help='ソース (youtube,social,channels)', default='youtube')
+    parser_collect_all.add_argument('--interval', type=int, help='指定分ごとに収集を繰り返す（デーモンモード）')
     parser_collect_all.set_defaults(func=cmd_collect_all)
 
+    # channels コマンド
+    parser_channels = subparsers.add_parser('channels', help='YouTubeレビューチャンネルの巡回')
+    channels_subparsers = parser_channels.add_subparsers(dest='channels_command')
+
+    parser_channels_list = channels_subparsers.add_parser('list', help='登録簿を表示')
+    parser_channels_list.set_defaults(func=cmd_channels_list)
+
+    parser_channels_add = channels_subparsers.add_parser('add', help='巡回対象に追加')
+    parser_channels_add.add_argument('channel_id', help='チャンネルID（UC...）')
+    parser_channels_add.add_argument('--name', help='表示名')
+    parser_channels_add.set_defaults(func=cmd_channels_add)
+
+    parser_channels_remove = channels_subparsers.add_parser('remove', help='登録簿から削除')
+    parser_channels_remove.add_argument('channel_id', help='チャンネルID')
+    parser_channels_remove.set_defaults(func=cmd_channels_remove)
+
+    parser_channels_poll = channels_subparsers.add_parser('poll', help='新着動画を取得してシューズに照合・登録')
+    parser_channels_poll.set_defaults(func=cmd_channels_poll)
+
+    # refresh-stats コマンド
+    parser_refresh_stats = subparsers.add_parser('refresh-stats', help='保存済みYouTube動画の統計を更新')
+    parser_refresh_stats.add_argument('--concurrency', type=int, default=REFRESH_STATS_CONCURRENCY, help='同時に実行するリクエスト数')
+    parser_refresh_stats.add_argument('--limit', type=int, help='更新する動画数の上限')
+    parser_refresh_stats.add_argument('--max-units', type=int, default=REFRESH_STATS_MAX_UNITS, help='使用するYouTube APIユニットの上限（0で上限なし）')
+    parser_refresh_stats.add_argument('--dry-run', action='store_true', help='DBを更新せず更新対象の件数だけ表示')
+    parser_refresh_stats.set_defaults(func=cmd_refresh_stats)
+
     # sources コマンド
     parser_sources = subparsers.add_parser('sources', help='シューズのソースを表示')
     parser_sources.add_argument('shoe_id', help='シューズID')
@@ -366,10 +670,45 @@ def main():
 
     args = parser.parse_args()
 
-    if hasattr(args, 'func'):
-        args.func(args)
-    else:
+    if not hasattr(args, 'func'):
         parser.print_help()
+        return
+
+    if args.record:
+        http_client.start_recording(args.record)
+    metrics_enabled = bool(args.metrics_port or args.metrics_textfile)
+    if args.report or metrics_enabled:
+        instrumentation.enable()
+    if args.metrics_textfile:
+        metrics_exporter.configure(textfile=args.metrics_textfile)
+    if args.metrics_port:
+        metrics_exporter.start_http_server(args.metrics_port, args.metrics_addr)
+    started_at = time.perf_counter()
+
+    try:
+        if args.profile:
+            run_dir = profiling.make_run_dir(args.profile_dir, args.command)
+            with profiling.profile_run(args.profile_mode, run_dir):
+                args.func(args)
+        else:
+            args.func(args)
+    finally:
+        if metrics_enabled:
+            metrics_exporter.flush()
+        if args.report:
+            write_report(args, instrumentation.build_report(started_at))
+
+
+def write_report(args, report):
+    """計測レポートを出力"""
+    report['command'] = args.command
+    text = instrumentation.format_report(report, args.report)
+    if args.report_file:
+        with open(args.report_file, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f'📊 計測レポートを {args.report_file} に保存しました')
+    else:
+        print(text)
 
 
 if __name__ == '__main__':
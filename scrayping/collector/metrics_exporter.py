@@ -0,0 +1,255 @@
+"""
+Prometheusメトリクス出力モジュール
+instrumentation の集計値を Prometheus テキスト形式で公開
+
+公開方法:
+    - HTTP: start_http_server(9464) → http://localhost:9464/metrics
+    - node_exporter textfile collector: write_textfile('/var/lib/node_exporter/collector.prom')
+
+主なメトリクス:
+    collector_api_requests_total{provider}
+    collector_api_errors_total{provider}
+    collector_api_bytes_total{provider}
+    collector_db_rows_written_total{table}
+    collector_stage_seconds{stage}            (histogram)
+    collector_quota_units_used{provider}      (gauge)
+    collector_quota_used_ratio{provider}      (gauge)
+    collector_cache_hit_ratio{cache}          (gauge)
+"""
+
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import instrumentation
+from config import YOUTUBE_DAILY_QUOTA, GOOGLE_SEARCH_DAILY_QUOTA, SERPER_MONTHLY_QUOTA
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+try:
+    from zoneinfo import ZoneInfo
+    # YouTube Data API のクォータは太平洋時間の0時にリセットされる
+    _PACIFIC = ZoneInfo('America/Los_Angeles')
+except Exception:
+    _PACIFIC = timezone.utc
+
+# プロバイダ別のクォータ上限と集計期間
+QUOTA_LIMITS = {
+    'youtube': (YOUTUBE_DAILY_QUOTA, 'day'),
+    'google_cse': (GOOGLE_SEARCH_DAILY_QUOTA, 'day'),
+    'serper': (SERPER_MONTHLY_QUOTA, 'month'),
+}
+
+_textfile_path: Optional[str] = None
+_started_at = time.time()
+_last_flush_at: Optional[float] = None
+# プロバイダ → (期間キー, 期間開始時点の累計消費量)
+_quota_baselines: Dict[str, Tuple[str, int]] = {}
+
+
+def configure(textfile: Optional[str] = None):
+    """textfile出力先を設定（flush() で書き出される）"""
+    global _textfile_path
+    _textfile_path = textfile
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    inner = ','.join(f'{k}="{_escape(str(v))}"' for k, v in sorted(labels.items()))
+    return '{' + inner + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _quota_period_key(period: str) -> str:
+    now = datetime.now(_PACIFIC)
+    return now.strftime('%Y-%m') if period == 'month' else now.strftime('%Y-%m-%d')
+
+
+def _quota_usage() -> Dict[str, int]:
+    """現在のクォータ期間内の消費量（期間が変わったら起点をリセット）"""
+    totals = instrumentation.quota_units_used()
+    usage = {}
+    for provider, total in totals.items():
+        period = QUOTA_LIMITS.get(provider, (0, 'day'))[1]
+        key = _quota_period_key(period)
+        baseline_key, baseline = _quota_baselines.get(provider, (key, 0))
+        if baseline_key != key:
+            baseline_key, baseline = key, total
+        _quota_baselines[provider] = (baseline_key, baseline)
+        usage[provider] = total - baseline
+    return usage
+
+
+class _MetricWriter:
+    """HELP/TYPE ヘッダを1回だけ出しながらサンプル行を組み立てる"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self._declared = set()
+
+    def declare(self, name: str, metric_type: str, help_text: str):
+        if name in self._declared:
+            return
+        self._declared.add(name)
+        self.lines.append(f'# HELP {name} {help_text}')
+        self.lines.append(f'# TYPE {name} {metric_type}')
+
+    def sample(self, name: str, labels: Dict[str, str], value: float):
+        self.lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+    def render(self) -> str:
+        return '\n'.join(self.lines) + '\n'
+
+
+def render_prometheus() -> str:
+    """現在のメトリクスを Prometheus テキスト形式で返す"""
+    writer = _MetricWriter()
+    stages = instrumentation.stage_items()
+
+    # --- APIプロバイダ別カウンタ ---
+    requests_by_provider: Dict[str, int] = {}
+    errors_by_provider: Dict[str, int] = {}
+    bytes_by_provider: Dict[str, int] = {}
+    for _, provider, stats in stages:
+        if not provider:
+            continue
+        requests_by_provider[provider] = requests_by_provider.get(provider, 0) + stats.calls
+        errors_by_provider[provider] = errors_by_provider.get(provider, 0) + stats.errors
+        bytes_by_provider[provider] = bytes_by_provider.get(provider, 0) + stats.bytes
+
+    writer.declare('collector_api_requests_total', 'counter', 'External API requests by provider')
+    for provider, value in sorted(requests_by_provider.items()):
+        writer.sample('collector_api_requests_total', {'provider': provider}, value)
+    writer.declare('collector_api_errors_total', 'counter', 'Failed external API requests by provider')
+    for provider, value in sorted(errors_by_provider.items()):
+        writer.sample('collector_api_errors_total', {'provider': provider}, value)
+    writer.declare('collector_api_bytes_total', 'counter', 'Response bytes received by provider')
+    for provider, value in sorted(bytes_by_provider.items()):
+        writer.sample('collector_api_bytes_total', {'provider': provider}, value)
+
+    # --- ステージ別ヒストグラム ---
+    writer.declare('collector_stage_seconds', 'histogram', 'Stage latency in seconds')
+    for name, _, stats in stages:
+        cumulative = 0
+        counts = stats.latency.bucket_counts
+        for bound, count in zip(instrumentation.BUCKET_BOUNDS, counts):
+            cumulative += count
+            writer.sample('collector_stage_seconds_bucket', {'stage': name, 'le': f'{bound:.6g}'}, cumulative)
+        writer.sample('collector_stage_seconds_bucket', {'stage': name, 'le': '+Inf'}, stats.latency.count)
+        writer.sample('collector_stage_seconds_sum', {'stage': name}, stats.latency.total)
+        writer.sample('collector_stage_seconds_count', {'stage': name}, stats.latency.count)
+    writer.declare('collector_stage_errors_total', 'counter', 'Stage errors')
+    for name, _, stats in stages:
+        writer.sample('collector_stage_errors_total', {'stage': name}, stats.errors)
+
+    # --- ラベル付きカウンタ（DB書き込み行数など） ---
+    cache_hits: Dict[str, float] = {}
+    cache_misses: Dict[str, float] = {}
+    for name, labels, value in instrumentation.counter_items():
+        if name == 'cache_hits_total':
+            cache_hits[labels.get('cache', '')] = value
+        elif name == 'cache_misses_total':
+            cache_misses[labels.get('cache', '')] = value
+        metric = f'collector_{name}'
+        writer.declare(metric, 'counter', name.replace('_', ' '))
+        writer.sample(metric, labels, value)
+
+    # --- ゲージ ---
+    quota_usage = sorted(_quota_usage().items())
+    writer.declare('collector_quota_units_used', 'gauge', 'API quota units used in the current quota period')
+    for provider, used in quota_usage:
+        writer.sample('collector_quota_units_used', {'provider': provider}, used)
+    writer.declare('collector_quota_used_ratio', 'gauge', 'Fraction of the API quota used in the current period')
+    for provider, used in quota_usage:
+        limit = QUOTA_LIMITS.get(provider, (0, 'day'))[0]
+        if limit:
+            writer.sample('collector_quota_used_ratio', {'provider': provider}, used / limit)
+
+    writer.declare('collector_cache_hit_ratio', 'gauge', 'Cache hit ratio by cache')
+    for cache in sorted(set(cache_hits) | set(cache_misses)):
+        hits = cache_hits.get(cache, 0)
+        total = hits + cache_misses.get(cache, 0)
+        if total:
+            writer.sample('collector_cache_hit_ratio', {'cache': cache}, hits / total)
+
+    writer.declare('collector_start_time_seconds', 'gauge', 'Process start time (unix seconds)')
+    writer.sample('collector_start_time_seconds', {}, _started_at)
+    if _last_flush_at is not None:
+        writer.declare('collector_last_run_timestamp_seconds', 'gauge', 'Time the last collection run finished')
+        writer.sample('collector_last_run_timestamp_seconds', {}, _last_flush_at)
+
+    return writer.render()
+
+
+def write_textfile(path: str):
+    """node_exporter textfile collector 用にアトミックに書き出す"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.collector-', suffix='.prom.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(render_prometheus())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def flush():
+    """収集ランの区切りで呼び出し、textfile が設定されていれば書き出す"""
+    global _last_flush_at
+    _last_flush_at = time.time()
+    if not _textfile_path:
+        return
+    try:
+        write_textfile(_textfile_path)
+    except Exception as e:
+        print(f'⚠️ メトリクスの書き出しに失敗: {e}')
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # スクレイプごとのアクセスログは出さない
+        pass
+
+
+def start_http_server(port: int, addr: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """/metrics をバックグラウンドスレッドで公開"""
+    server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name='metrics-exporter', daemon=True)
+    thread.start()
+    print(f'📈 メトリクス公開中: http://{addr}:{port}/metrics')
+    return server
+
+
+if __name__ == '__main__':
+    instrumentation.enable()
+    print(render_prometheus())
@@ -0,0 +1,220 @@
+"""
+ほぼ重複（near-duplicate）の検出モジュール
+タイトル + スニペットの SimHash（64ビット）で、URL やタイトルが少し違うだけの同じ投稿
+（Reddit のスレッドの別URL・note 記事の転載・引用リツイートやリポストなど）をまとめる
+
+- テキストは NFKC 正規化・小文字化し、URL・メンション・記号を除いた文字4-gram を特徴にする
+  （分かち書きのない日本語もそのまま扱える）
+- ハミング距離 NEAR_DUP_MAX_DISTANCE 以下を重複とみなす。指紋を (距離 + 1) 個のブロックに分けると
+  重複の組は少なくとも1つのブロックが完全一致する（鳩の巣原理）ため、ブロックごとの辞書で候補を引く
+- 索引は ExternalReview テーブルの既存行と実行中に書き込んだ投稿の両方を持つ。
+  比較範囲は NEAR_DUP_SCOPE で選ぶ（shoe: 同じシューズ内のみ / table: テーブル全体）
+
+使用方法:
+    index = get_near_duplicate_index()          # 初回はDBから全件、以降は差分のみ取り込む
+    match = index.check_and_add(shoe_id, post.title, post.snippet, post.url)
+    if match:
+        continue                                # match.ref は先に登録された投稿のURL
+"""
+
+import re
+import unicodedata
+import zlib
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from config import NEAR_DUP_MAX_DISTANCE, NEAR_DUP_MIN_CHARS, NEAR_DUP_SCOPE
+
+FINGERPRINT_BITS = 64
+# 上位32ビット用の CRC32 の初期値
+_CRC_SEED = 0x5BD1E995
+_SHINGLE_SIZE = 4
+# 16ビットの区画で数えるため、1テキストあたりの特徴数の上限
+_MAX_FEATURES = 0x7FFF
+# ExternalReview.snippet の保存長（DBの既存行と収集直後の投稿を同じ範囲で比べる）
+_SNIPPET_CHARS = 200
+
+_URL_PATTERN = re.compile(r'https?://\S+|www\.\S+')
+# 引用・リポストの定型句とメンション
+_REPOST_PATTERN = re.compile(r'^(?:rt|qt)\s+@\w+:?|@\w+')
+_SYMBOL_PATTERN = re.compile(r'[\W_]+')
+
+
+class NearDuplicate(NamedTuple):
+    """索引内の一致した項目"""
+    shoe_id: str
+    ref: str
+    distance: int
+
+
+def normalize_for_hash(text: str) -> str:
+    """比較用の正規化（NFKC・小文字化・URL/メンション/記号の除去）"""
+    text = unicodedata.normalize('NFKC', text).lower()
+    text = _URL_PATTERN.sub(' ', text)
+    text = _REPOST_PATTERN.sub(' ', text)
+    return ' '.join(_SYMBOL_PATTERN.sub(' ', text).split())
+
+
+def _feature_hashes(text: str) -> List[int]:
+    """
+    文字4-gram ごとの64ビットハッシュ
+
+    4文字分の UTF-32 に初期値の異なる CRC32 を2回かけて上下32ビットにする。blake2b の約3倍速く、
+    組み込みの hash() と違って実行ごとに値が変わらない（同じ投稿の判定結果が実行間で揺れない）
+    """
+    data = text.encode('utf-32-le')
+    width = 4 * _SHINGLE_SIZE
+    hashes = []
+    for i in range(0, min(len(data) - width + 4, 4 * _MAX_FEATURES), 4):
+        shingle = data[i:i + width]
+        hashes.append(zlib.crc32(shingle) | zlib.crc32(shingle, _CRC_SEED) << 32)
+    return hashes
+
+
+def _lane_table() -> List[int]:
+    # バイト値 → そのバイトの各ビットを16ビットずつの区画に1つずつ置いた整数
+    return [sum(1 << (16 * bit) for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+_SPREAD = _lane_table().__getitem__
+_LANE_ONES = sum(1 << (16 * lane) for lane in range(FINGERPRINT_BITS))
+# 区画の最上位ビットが立っているバイト → '1'
+_HIGH_BIT_DIGITS = bytes(ord('1') if value & 0x80 else ord('0') for value in range(256))
+
+
+def _majority_bits(hashes: List[int]) -> int:
+    """
+    各ビット位置で1が過半数のビットを立てた値（= 特徴ごとに ±1 を足して符号を取る SimHash）
+
+    64個のカウンタを Python のループで数える代わりに、ハッシュ列のバイトごとに
+    16ビット区画の整数へ展開して sum(map(...)) で合計する（ループはC側で回る）
+    """
+    data = array('Q', hashes).tobytes()
+    counts = 0
+    for offset in range(8):
+        counts |= sum(map(_SPREAD, data[offset::8])) << (128 * offset)
+    # 過半数（> 件数 // 2）の区画だけ最上位ビットが立つように底上げし、そのビットを集める
+    counts += (0x7FFF - len(hashes) // 2) * _LANE_ONES
+    digits = counts.to_bytes(FINGERPRINT_BITS * 2, 'little')[1::2].translate(_HIGH_BIT_DIGITS)
+    return int(digits[::-1], 2)
+
+
+def simhash(text: str) -> Optional[int]:
+    """テキストの64ビット指紋（比較に足る長さがなければ None）"""
+    normalized = normalize_for_hash(text)
+    if len(normalized) < NEAR_DUP_MIN_CHARS:
+        return None
+    return _majority_bits(_feature_hashes(normalized))
+
+
+def fingerprint_post(title: Optional[str], snippet: Optional[str]) -> Optional[int]:
+    """タイトル + スニペットの指紋"""
+    return simhash(f'{title or ""} {(snippet or "")[:_SNIPPET_CHARS]}')
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class NearDuplicateIndex:
+    """SimHash の指紋をブロック単位の辞書で引けるようにした索引"""
+
+    def __init__(self, max_distance: int = NEAR_DUP_MAX_DISTANCE, scope: str = NEAR_DUP_SCOPE):
+        if scope not in ('shoe', 'table'):
+            raise ValueError(f'NEAR_DUP_SCOPE は shoe または table を指定してください: {scope}')
+        self.max_distance = max_distance
+        self.scope = scope
+        # 指紋を max_distance + 1 個のブロックに分ける（余りのビットは最後のブロックへ）
+        blocks = max_distance + 1
+        width = FINGERPRINT_BITS // blocks
+        self._blocks: List[Tuple[int, int]] = [
+            (i * width, (1 << (width if i < blocks - 1 else FINGERPRINT_BITS - i * width)) - 1)
+            for i in range(blocks)
+        ]
+        # ブロックごとに ブロックの値 → 項目番号のリスト
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self._blocks]
+        # 項目番号 → (指紋, shoe_id, ref)
+        self._entries: List[Tuple[int, str, str]] = []
+        # refresh_from_db で差分取得する基準時刻
+        self.last_collected: Optional[datetime] = None
+        self._refs = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, fingerprint: int, shoe_id: str, ref: str):
+        """登録（同じシューズ・同じ ref は1回だけ）"""
+        if (shoe_id, ref) in self._refs:
+            return
+        self._refs.add((shoe_id, ref))
+        row = len(self._entries)
+        self._entries.append((fingerprint, shoe_id, ref))
+        for table, (shift, mask) in zip(self._tables, self._blocks):
+            table.setdefault((fingerprint >> shift) & mask, []).append(row)
+
+    def find(self, fingerprint: int, shoe_id: str = '') -> Optional[NearDuplicate]:
+        """ハミング距離が最小の一致を返す（scope=shoe なら同じシューズの項目のみ）"""
+        best: Optional[NearDuplicate] = None
+        checked = set()
+        for table, (shift, mask) in zip(self._tables, self._blocks):
+            for row in table.get((fingerprint >> shift) & mask, ()):
+                if row in checked:
+                    continue
+                checked.add(row)
+                other, other_shoe, ref = self._entries[row]
+                if self.scope == 'shoe' and other_shoe != shoe_id:
+                    continue
+                distance = hamming(fingerprint, other)
+                if distance <= self.max_distance and (best is None or distance < best.distance):
+                    best = NearDuplicate(other_shoe, ref, distance)
+                    if distance == 0:
+                        return best
+        return best
+
+    def check_and_add(self, shoe_id: str, title: str, snippet: str, ref: str) -> Optional[NearDuplicate]:
+        """
+        ほぼ重複があれば一致した項目を返し、なければ索引に登録して None を返す
+
+        短すぎて指紋の比較に向かないテキストは常に None（登録もしない）
+        """
+        fingerprint = fingerprint_post(title, snippet)
+        if fingerprint is None:
+            return None
+        match = self.find(fingerprint, shoe_id)
+        if match:
+            return match
+        self.add(fingerprint, shoe_id, ref)
+        return None
+
+    def refresh(self, rows: Iterable[Dict]) -> int:
+        """ExternalReview の行（shoeId, sourceUrl, sourceTitle, snippet, collectedAt）を取り込む"""
+        count = 0
+        for row in rows:
+            fingerprint = fingerprint_post(row.get('sourceTitle'), row.get('snippet'))
+            collected = row.get('collectedAt')
+            if collected and (self.last_collected is None or collected > self.last_collected):
+                self.last_collected = collected
+            if fingerprint is None:
+                continue
+            self.add(fingerprint, row['shoeId'], row['sourceUrl'])
+            count += 1
+        return count
+
+    def refresh_from_db(self) -> int:
+        """前回以降に登録された ExternalReview をDBから取り込み、件数を返す"""
+        from db_handler import iter_external_reviews_since
+
+        return self.refresh(iter_external_reviews_since(self.last_collected))
+
+
+_default_index: Optional[NearDuplicateIndex] = None
+
+
+def get_near_duplicate_index() -> NearDuplicateIndex:
+    """共有索引を返す（初回はDBから全件、以降は差分のみ取り込む）"""
+    global _default_index
+    if _default_index is None:
+        _default_index = NearDuplicateIndex()
+    _default_index.refresh_from_db()
+    return _default_index
@@ -0,0 +1,61 @@
+"""
+検索結果のページ送り
+各プロバイダ（Serper / Google CSE / YouTube）の検索結果を遅延イテレータとして扱い、
+呼び出し側が必要な件数を取り終えた時点で次のページの取得をやめる
+
+    for result in paginate(fetch_page):   # 1ページ目だけ取得
+        ...
+        if len(valid) >= target:
+            break                         # 2ページ目以降は取得しない
+
+これまでの max_results * 2 のような多めの要求（フィルタ後の不足を見込んだ水増し）は不要になる
+"""
+
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from config import SEARCH_MAX_PAGES
+
+# fetch_page(cursor) -> (このページの結果, 次のページのカーソル or None)
+PageFetcher = Callable[[Any], Tuple[List, Any]]
+
+
+def paginate(fetch_page: PageFetcher, first_cursor: Any = None, max_pages: int = SEARCH_MAX_PAGES) -> Iterator:
+    """ページを必要になった時点で1つずつ取得し、結果を1件ずつ返す"""
+    cursor = first_cursor
+    for _ in range(max_pages):
+        items, cursor = fetch_page(cursor)
+        yield from items
+        if not items or cursor is None:
+            return
+
+
+def take(
+    items: Iterable,
+    count: int,
+    accept: Optional[Callable[[Any], bool]] = None,
+    key: Optional[Callable[[Any], Any]] = None,
+    seen: Optional[set] = None,
+) -> List:
+    """
+    条件を満たす要素を count 件取り出す（満たした時点でイテレータの消費をやめる）
+
+    Args:
+        accept: 採用する要素の条件
+        key: 重複判定のキー（seen を渡すと呼び出し間で共有できる）
+    """
+    taken = []
+    if count <= 0:
+        return taken
+    seen = seen if seen is not None else set()
+    for item in items:
+        if accept and not accept(item):
+            continue
+        if key:
+            item_key = key(item)
+            if item_key in seen:
+                continue
+            seen.add(item_key)
+        taken.append(item)
+        if len(taken) >= count:
+            break
+    return taken
@@ -0,0 +1,274 @@
+"""
+プロファイリングモジュール
+CLIコマンド全体をプロファイルし、実行ディレクトリに結果を書き出す
+
+モード:
+    cprofile: cProfile で全関数呼び出しを計測（正確だがオーバーヘッド大）
+    sampling: 別スレッドで一定間隔ごとにスタックを採取（オーバーヘッド小）
+
+出力ファイル（run_dir 以下）:
+    profile.pstats       cProfile の生データ（cprofile モードのみ / snakeviz 等で閲覧）
+    profile.txt          上位関数のサマリ
+    flamegraph.collapsed collapsed-stack 形式（flamegraph.pl / speedscope で可視化）
+    memory.txt           tracemalloc によるピークメモリと確保箇所の上位
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+PROFILE_MODES = ('cprofile', 'sampling')
+
+# サンプリング間隔（秒）
+SAMPLING_INTERVAL = 0.005
+# tracemalloc のピーク監視間隔（秒）
+MEMORY_POLL_INTERVAL = 0.25
+# collapsed 出力でのスタックの最大深さ
+MAX_STACK_DEPTH = 128
+
+
+def make_run_dir(base_dir: str, label: str) -> str:
+    """profiles/<label>-<timestamp> 形式の実行ディレクトリを作成"""
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    run_dir = os.path.join(base_dir, f'{label}-{stamp}')
+    suffix = 1
+    while os.path.exists(run_dir):
+        suffix += 1
+        run_dir = os.path.join(base_dir, f'{label}-{stamp}-{suffix}')
+    os.makedirs(run_dir)
+    return run_dir
+
+
+def _frame_label(filename: str, lineno: int, funcname: str) -> str:
+    """collapsed 形式のフレーム名（区切り文字 ; と空白を含めない）"""
+    name = f'{funcname}@{os.path.basename(filename)}:{lineno}'
+    return name.replace(';', ':').replace(' ', '_')
+
+
+# ===== collapsed stack =====
+
+def pstats_to_collapsed(stats: pstats.Stats) -> Dict[str, float]:
+    """
+    cProfile の呼び出しグラフから collapsed stack を近似的に復元
+
+    各関数の累積時間を呼び出し元ごとの比率で子に配分し、
+    自己時間 (tottime) をそのスタックの重みとする
+    """
+    raw = stats.stats
+    callees = defaultdict(dict)
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, caller_stats in callers.items():
+            callees[caller][func] = caller_stats[3]
+
+    collapsed: Dict[str, float] = defaultdict(float)
+    roots = [func for func, entry in raw.items() if not entry[4]]
+    total = sum(raw[func][3] for func in roots) or 1.0
+    min_budget = total * 1e-4
+
+    def walk(func, budget: float, path: tuple, labels: tuple):
+        _, _, tottime, cumtime, _ = raw[func]
+        labels = labels + (_frame_label(*func),)
+        if cumtime <= 0:
+            return
+        self_time = budget * min(tottime / cumtime, 1.0)
+        if self_time > 0:
+            collapsed[';'.join(labels)] += self_time
+        if len(labels) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_time in callees.get(func, {}).items():
+            if callee in path:
+                continue
+            child_budget = budget * min(edge_time / cumtime, 1.0)
+            if child_budget >= min_budget:
+                walk(callee, child_budget, path + (callee,), labels)
+
+    for root in roots:
+        walk(root, raw[root][3], (root,), ())
+    return collapsed
+
+
+class StackSampler:
+    """メインスレッドのスタックを一定間隔で採取するサンプリングプロファイラ"""
+
+    def __init__(self, interval: float = SAMPLING_INTERVAL, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples: Dict[str, int] = defaultdict(int)
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        labels = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            labels.append(_frame_label(code.co_filename, frame.f_lineno, code.co_name))
+            frame = frame.f_back
+        labels.reverse()
+        self.samples[';'.join(labels)] += 1
+        self.sample_count += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+
+class PeakMemoryMonitor:
+    """tracemalloc の使用量を監視し、ピーク付近のスナップショットを保持"""
+
+    def __init__(self, interval: float = MEMORY_POLL_INTERVAL):
+        self.interval = interval
+        self.peak_snapshot = None
+        self._snapshot_size = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _check(self):
+        current, _ = tracemalloc.get_traced_memory()
+        # 前回スナップショットより10%以上増えたときだけ取り直す
+        if current > self._snapshot_size * 1.1:
+            self.peak_snapshot = tracemalloc.take_snapshot()
+            self._snapshot_size = current
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._check()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='memory-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._check()
+
+
+# ===== 出力 =====
+
+def _write_collapsed(path: str, collapsed: Dict[str, float], scale: float = 1.0):
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, weight in sorted(collapsed.items()):
+            value = int(round(weight * scale))
+            if value > 0:
+                f.write(f'{stack} {value}\n')
+
+
+def _write_memory_report(path: str, monitor: PeakMemoryMonitor, peak_bytes: int, top: int = 30):
+    lines = [
+        '=== tracemalloc ピークメモリ ===',
+        f'ピーク: {peak_bytes / 1024 / 1024:.2f} MiB',
+        '',
+        f'--- ピーク付近の確保箇所 上位{top}件 ---',
+    ]
+    snapshot = monitor.peak_snapshot
+    if snapshot is not None:
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ))
+        for stat in snapshot.statistics('lineno')[:top]:
+            frame = stat.traceback[0]
+            lines.append(
+                f'{stat.size / 1024:10.1f} KiB  {stat.count:8d} blocks  '
+                f'{frame.filename}:{frame.lineno}'
+            )
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+@contextmanager
+def profile_run(mode: str, run_dir: str):
+    """
+    with ブロック全体をプロファイルし、結果を run_dir に書き出す
+
+    Args:
+        mode: 'cprofile' または 'sampling'
+        run_dir: 出力ディレクトリ
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f'未対応のプロファイルモード: {mode}')
+
+    os.makedirs(run_dir, exist_ok=True)
+    tracemalloc_started = not tracemalloc.is_tracing()
+    if tracemalloc_started:
+        tracemalloc.start()
+    memory_monitor = PeakMemoryMonitor()
+    memory_monitor.start()
+
+    profiler = cProfile.Profile() if mode == 'cprofile' else None
+    sampler = StackSampler() if mode == 'sampling' else None
+    started_at = time.perf_counter()
+
+    if profiler:
+        profiler.enable()
+    else:
+        sampler.start()
+
+    try:
+        yield run_dir
+    finally:
+        if profiler:
+            profiler.disable()
+        else:
+            sampler.stop()
+        elapsed = time.perf_counter() - started_at
+        memory_monitor.stop()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        if tracemalloc_started:
+            tracemalloc.stop()
+
+        summary = io.StringIO()
+        summary.write(f'mode: {mode}\nwall: {elapsed:.3f}s\n\n')
+
+        if profiler:
+            pstats_path = os.path.join(run_dir, 'profile.pstats')
+            profiler.dump_stats(pstats_path)
+            stats = pstats.Stats(profiler, stream=summary)
+            stats.sort_stats('cumulative').print_stats(50)
+            stats.sort_stats('tottime').print_stats(30)
+            # 秒 → マイクロ秒
+            _write_collapsed(
+                os.path.join(run_dir, 'flamegraph.collapsed'),
+                pstats_to_collapsed(stats),
+                scale=1e6,
+            )
+        else:
+            summary.write(f'samples: {sampler.sample_count} (interval {sampler.interval * 1000:.1f}ms)\n\n')
+            self_counts: Dict[str, int] = defaultdict(int)
+            for stack, count in sampler.samples.items():
+                self_counts[stack.rsplit(';', 1)[-1]] += count
+            summary.write('--- self samples 上位30件 ---\n')
+            for frame, count in sorted(self_counts.items(), key=lambda x: -x[1])[:30]:
+                share = count / max(sampler.sample_count, 1) * 100
+                summary.write(f'{count:8d} {share:6.2f}%  {frame}\n')
+            _write_collapsed(os.path.join(run_dir, 'flamegraph.collapsed'), sampler.samples)
+
+        with open(os.path.join(run_dir, 'profile.txt'), 'w', encoding='utf-8') as f:
+            f.write(summary.getvalue())
+        _write_memory_report(os.path.join(run_dir, 'memory.txt'), memory_monitor, peak_bytes)
+
+        print(f'🔬 プロファイル結果を {run_dir} に保存しました（ピークメモリ {peak_bytes / 1024 / 1024:.1f} MiB）')
@@ -0,0 +1,203 @@
+"""
+ソーシャル検索のクエリプランナー
+シューズ1足あたりの Serper 呼び出しを減らす
+
+従来はプラットフォーム（X / Reddit / note）× 言語（日本語 / 英語）ごとに1回ずつ、
+各 max_results * 2 件を検索していた（1足あたり6クエリ）。プランナーは:
+
+- 対象プラットフォームの site: 演算子を1つのクエリにまとめ、結果をドメインで振り分ける
+- 1ページの件数は未充足のプラットフォームの残り件数 × QUERY_PLANNER_OVERFETCH とし、
+  不足すれば次のページを取得する（全プラットフォームが埋まった時点で打ち切り）
+- 全プラットフォームの件数を満たした時点で残りの言語のクエリを打ち切る
+- 前回結果が0件だった言語は QUERY_LANGUAGE_SKIP_RUNS 回までスキップする（状態は QUERY_STATS_PATH）
+
+使用方法:
+    results, report = run_social_plan('Nike', 'Pegasus 41', ['twitter', 'reddit', 'note'], max_results=10)
+    print(report.summary())
+"""
+
+import json
+import math
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from config import QUERY_PLANNER_OVERFETCH, QUERY_LANGUAGE_SKIP_RUNS, QUERY_STATS_PATH
+from instrumentation import increment
+from pagination import paginate
+from social_urls import classify_url
+from shoe_identity import canonical_key
+
+# プラットフォーム → site: 演算子
+PLATFORM_SITES = {
+    'twitter': ['site:twitter.com', 'site:x.com'],
+    'reddit': [f'site:reddit.com/r/{s}' for s in ('running', 'RunningShoeGeeks', 'AdvancedRunning')],
+    'note': ['site:note.com'],
+}
+
+# 言語 → クエリの接尾語
+LANGUAGE_SUFFIXES = {
+    'ja': 'レビュー',
+    'en': 'review',
+}
+
+# Serper の1リクエストあたりの最大件数
+SERPER_MAX_NUM = 100
+
+
+@dataclass
+class PlanReport:
+    """プランの実行結果"""
+    shoe: str
+    # 従来方式（プラットフォーム × 言語）のクエリ数
+    baseline_queries: int
+    # 実際に発行したリクエスト数（ページ送りを含む）
+    executed_queries: int = 0
+    skipped_languages: List[str] = field(default_factory=list)
+    stopped_early: bool = False
+    yields: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def saved_queries(self) -> int:
+        return max(0, self.baseline_queries - self.executed_queries)
+
+    def summary(self) -> str:
+        text = f'Serper {self.executed_queries} クエリ（従来 {self.baseline_queries}、{self.saved_queries} 件削減）'
+        if self.skipped_languages:
+            text += f' スキップ: {",".join(self.skipped_languages)}'
+        if self.stopped_early:
+            text += ' 早期終了'
+        return text
+
+
+def build_query(brand: str, model_name: str, language: str, platforms: List[str]) -> str:
+    """対象プラットフォームの site: 演算子をまとめた1つのクエリ"""
+    sites = ' OR '.join(site for platform in platforms for site in PLATFORM_SITES[platform])
+    return f'{brand} {model_name} {LANGUAGE_SUFFIXES[language]} ({sites})'
+
+
+# ===== 言語ごとの前回の結果 =====
+
+def load_query_stats(path: str = QUERY_STATS_PATH) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f'⚠️ クエリ統計の読み込みに失敗: {e}')
+        return {}
+
+
+def save_query_stats(stats: Dict, path: str = QUERY_STATS_PATH):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.query-stats-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _languages_to_run(stats: Dict, shoe_key: str, report: PlanReport) -> List[str]:
+    """前回0件だった言語はスキップ（連続スキップが上限に達したら再試行）"""
+    languages = []
+    for language in LANGUAGE_SUFFIXES:
+        entry = stats.get(shoe_key, {}).get(language)
+        if entry and entry['last_yield'] == 0 and entry['skipped'] < QUERY_LANGUAGE_SKIP_RUNS:
+            entry['skipped'] += 1
+            report.skipped_languages.append(language)
+            continue
+        languages.append(language)
+    # 全言語がスキップ対象なら最初の言語だけは実行する
+    if not languages:
+        languages.append(report.skipped_languages.pop(0))
+    return languages
+
+
+# ===== 実行 =====
+
+def run_social_plan(
+    brand: str,
+    model_name: str,
+    platforms: List[str],
+    max_results: int = 10,
+    stats_path: Optional[str] = QUERY_STATS_PATH,
+) -> Tuple[Dict[str, List[List]], PlanReport]:
+    """
+    まとめたクエリで検索し、プラットフォームごとのクエリ別結果（順位順）を返す
+
+    Returns:
+        ({platform: [言語ごとの SocialPost のリスト]}, 実行レポート)
+    """
+    from web_collector import search_serper, post_from_result
+
+    shoe_key = canonical_key(brand, model_name)
+    report = PlanReport(
+        shoe=f'{brand} {model_name}',
+        baseline_queries=len(platforms) * len(LANGUAGE_SUFFIXES),
+    )
+    stats = load_query_stats(stats_path) if stats_path else {}
+    batches: Dict[str, List[List]] = {platform: [] for platform in platforms}
+    found: Dict[str, set] = {platform: set() for platform in platforms}
+
+    languages = _languages_to_run(stats, shoe_key, report)
+    for language in languages:
+        remaining = {p: max_results - len(found[p]) for p in platforms if len(found[p]) < max_results}
+        if not remaining:
+            report.stopped_early = True
+            break
+
+        active = list(remaining)
+        page_size = min(SERPER_MAX_NUM, math.ceil(sum(remaining.values()) * QUERY_PLANNER_OVERFETCH))
+        language_posts: Dict[str, List] = {platform: [] for platform in active}
+        language_keys = set()
+
+        query = build_query(brand, model_name, language, active)
+
+        def fetch_page(page):
+            results = search_serper(query, page_size, page)
+            report.executed_queries += 1
+            return results, page + 1 if len(results) >= page_size else None
+
+        # 結果はページ単位で遅延取得し、全プラットフォームが埋まった時点で次のページを取得しない
+        for result in paginate(fetch_page, 1):
+            info = classify_url(result.get('link', ''))
+            platform = info.platform
+            if platform not in language_posts or not info.is_post:
+                continue
+            if info.key in language_keys:
+                continue
+            # 前の言語で見つかった投稿も順位の統合のために残す（件数には数えない）
+            if info.key not in found[platform]:
+                if len(found[platform]) >= max_results:
+                    continue
+                found[platform].add(info.key)
+            language_keys.add(info.key)
+            language_posts[platform].append(post_from_result(result, info))
+            if all(len(found[p]) >= max_results for p in active):
+                break
+
+        language_yield = 0
+        for platform in active:
+            batches[platform].append(language_posts[platform])
+            language_yield += len(language_posts[platform])
+        report.yields[language] = language_yield
+
+        entry = stats.setdefault(shoe_key, {}).setdefault(language, {'last_yield': 0, 'skipped': 0})
+        entry['last_yield'] = language_yield
+        entry['skipped'] = 0
+
+    if stats_path:
+        try:
+            save_query_stats(stats, stats_path)
+        except Exception as e:
+            print(f'⚠️ クエリ統計の保存に失敗: {e}')
+
+    increment('serper_queries_saved_total', report.saved_queries)
+    return batches, report
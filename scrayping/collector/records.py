@@ -0,0 +1,57 @@
+"""
+収集結果のレコード型の共通処理
+YouTubeVideo / SocialPost / RedditPost / Tweet / ShoeInfo は @dataclass(slots=True) で定義し、
+インスタンスごとの __dict__ を持たない（1件あたりのメモリと確保回数が減る）。
+変更しないもの（RedditPost / Tweet / ShoeInfo）は frozen にしている
+
+- as_row / to_rows: 宣言順のフィールド値のタプル。値はコピーせず参照をそのまま並べるため、
+  一括書き込み（execute_values）や JSON / Parquet への書き出しは row_fields(cls) を列名にして
+  行をそのまま渡せる
+- to_dict: dataclasses.asdict と違い値を deep copy しない（フィールドはすべて不変の値のため結果は同じ）
+
+使用方法:
+    columns = row_fields(YouTubeVideo)          # ('video_id', 'title', ...)
+    rows = to_rows(videos)                      # [(video_id, title, ...), ...] を順に返す
+"""
+
+from dataclasses import fields
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, Tuple
+
+
+@lru_cache(maxsize=None)
+def row_fields(cls: type) -> Tuple[str, ...]:
+    """レコード型の列名（フィールドの宣言順）"""
+    return tuple(f.name for f in fields(cls))
+
+
+@lru_cache(maxsize=None)
+def row_getter(cls: type) -> Callable[[Any], tuple]:
+    """レコード → 行タプルの関数（attrgetter のため1件ごとの確保はタプル1つだけ）"""
+    names = row_fields(cls)
+    if len(names) == 1:
+        getter = attrgetter(names[0])
+        return lambda record: (getter(record),)
+    return attrgetter(*names)
+
+
+def as_row(record: Any) -> tuple:
+    """1件を行タプルにする"""
+    return row_getter(type(record))(record)
+
+
+def to_rows(records: Iterable[Any]) -> Iterator[tuple]:
+    """同じ型のレコード列を行タプルの列にする（型は先頭のレコードで決める）"""
+    iterator = iter(records)
+    for first in iterator:
+        getter = row_getter(type(first))
+        yield getter(first)
+        yield from map(getter, iterator)
+        return
+
+
+def to_dict(record: Any) -> Dict[str, Any]:
+    """フィールド名 → 値の辞書（値はコピーしない）"""
+    cls = type(record)
+    return dict(zip(row_fields(cls), row_getter(cls)(record)))
@@ -10,13 +10,14 @@ Reddit APIを使用してランニングシューズのレビューを検索
 
 import json
 from typing import List, Dict, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from datetime import datetime
 import praw
 from config import REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT
+from records import as_row, to_dict
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class RedditPost:
     post_id: str
     title: str
@@ -40,11 +41,14 @@ class RedditPost:
         return datetime.fromtimestamp(self.created_utc)
 
     def to_dict(self):
-        d = asdict(self)
+        d = to_dict(self)
         d['full_url'] = self.full_url
         d['created_at'] = self.created_at.isoformat()
         return d
 
+    def as_row(self) -> tuple:
+        return as_row(self)
+
 
 def get_reddit_client() -> Optional[praw.Reddit]:
     """Reddit APIクライアントを取得"""
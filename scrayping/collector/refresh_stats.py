@@ -0,0 +1,216 @@
+"""
+保存済み YouTube 動画の統計更新
+CuratedSource に登録した時点の視聴数・高評価数は metadata に固定されたままになるため、
+curatedSources の YouTube 動画を video_id 順に読み出し、videos.list（1回50本・1ユニット）で
+取り直して、変わった行だけを1回の一括 UPDATE で書き戻す
+
+- 行はサーバーサイドカーソルで流し読みし、50本ずつのバッチに区切る（全件をメモリに載せない）
+- videos.list は REFRESH_STATS_CONCURRENCY 本まで並行に実行する（未処理のバッチも同数まで）
+- 統計キャッシュ（video_stats_cache）が新しい動画はリクエストしない。期限切れは ETag の
+  条件付きリクエストで取得し、304 ならキャッシュの値を使う
+- 1回の実行で使うユニットは REFRESH_STATS_MAX_UNITS まで（2万本で約400ユニット）
+- 応答に含まれない動画（削除・非公開）は更新せず件数だけ数える
+
+使用方法:
+    python main.py refresh-stats
+    python main.py refresh-stats --concurrency 8 --limit 5000 --dry-run
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import REFRESH_STATS_CONCURRENCY, REFRESH_STATS_MAX_UNITS
+from instrumentation import increment, record_error
+from video_stats_cache import VideoStatsCache, get_stats_cache
+from youtube_collector import YOUTUBE_PAGE_SIZE, fetch_video_stats
+
+_STAT_KEYS = ('view_count', 'like_count', 'comment_count')
+
+
+@dataclass
+class RefreshReport:
+    """統計更新の実行結果"""
+    videos: int = 0
+    # videos.list の呼び出し回数（= 消費ユニット）
+    requests: int = 0
+    not_modified: int = 0
+    # キャッシュが新しくリクエストしなかった動画
+    cached: int = 0
+    # 応答に含まれなかった動画（削除・非公開）
+    missing: int = 0
+    failed_batches: int = 0
+    updated_rows: int = 0
+    # ユニットの上限に達して途中で打ち切ったか
+    quota_reached: bool = False
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        text = (
+            f'動画 {self.videos} 本: {self.updated_rows} 行を更新'
+            f'（{self.requests} ユニット, 304 {self.not_modified} 本, キャッシュ {self.cached} 本, '
+            f'取得不可 {self.missing} 本）{self.elapsed:.1f}秒'
+        )
+        if self.failed_batches:
+            text += f' 失敗 {self.failed_batches} バッチ'
+        if self.quota_reached:
+            text += ' ユニット上限で打ち切り'
+        return text
+
+
+def iter_video_batches(rows: Iterable[Dict], size: int = YOUTUBE_PAGE_SIZE) -> Iterator[Dict[str, List[Dict]]]:
+    """
+    video_id 順の行を {video_id: [行]} のバッチに区切る（1バッチ size 本）
+
+    同じ動画を登録したシューズが複数あっても1本と数え、行はすべて同じバッチに入れる
+    """
+    batch: Dict[str, List[Dict]] = {}
+    for video_id, group in groupby(rows, key=lambda row: row['video_id']):
+        batch.setdefault(video_id, []).extend(group)
+        if len(batch) >= size:
+            yield batch
+            batch = {}
+    if batch:
+        yield batch
+
+
+def _changed(row: Dict, stats: Dict[str, int]) -> bool:
+    return any(row.get(key) != stats[key] for key in _STAT_KEYS)
+
+
+class StatsRefresher:
+    """バッチ単位の取得と書き戻し（バッチはスレッドプールから並行に呼ばれる）"""
+
+    def __init__(self, cache: VideoStatsCache, report: RefreshReport, dry_run: bool = False):
+        self.cache = cache
+        self.report = report
+        self.dry_run = dry_run
+        # 投入済みで fetch に達していないバッチ数（それぞれ1ユニットを予約している）
+        self.reserved = 0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """バッチの投入時に1ユニットを予約（fetch でリクエストに変わるか、キャッシュで済めば解放）"""
+        with self._lock:
+            self.reserved += 1
+
+    def units_committed(self) -> int:
+        """使ったユニットと予約中のユニットの合計"""
+        with self._lock:
+            return self.report.requests + self.reserved
+
+    def fetch(self, video_ids: List[str]) -> Dict[str, Dict[str, int]]:
+        """バッチの統計（キャッシュが新しければリクエストしない）"""
+        now = time.time()
+        with self._lock:
+            self.reserved = max(0, self.reserved - 1)
+            if all(self.cache.is_fresh(video_id, now) for video_id in video_ids):
+                self.report.cached += len(video_ids)
+                return {video_id: self.cache.get(video_id) for video_id in video_ids}
+            etag = self.cache.etag_for(video_ids)
+            self.report.requests += 1
+
+        stats_map, etag = fetch_video_stats(video_ids, etag)
+
+        with self._lock:
+            if stats_map is None:
+                self.report.not_modified += len(video_ids)
+                increment('youtube_stats_not_modified_total', len(video_ids))
+                self.cache.touch(video_ids, now)
+                return {video_id: self.cache.get(video_id) for video_id in video_ids}
+            for video_id, stats in stats_map.items():
+                self.cache.put(video_id, stats, now)
+            self.cache.set_etag(video_ids, etag, now)
+            self.report.missing += len(video_ids) - len(stats_map)
+            return stats_map
+
+    def process(self, batch: Dict[str, List[Dict]]) -> int:
+        """1バッチを取得し、変わった行を1回の UPDATE で書き戻す"""
+        from db_handler import bulk_update_video_stats
+
+        try:
+            stats_map = self.fetch(sorted(batch))
+        except Exception as e:
+            record_error('youtube.refresh_stats')
+            with self._lock:
+                self.report.failed_batches += 1
+            print(f'⚠️ 統計の取得に失敗（{len(batch)} 本）: {e}')
+            return 0
+
+        updated_at = datetime.now().isoformat(timespec='seconds')
+        updates: List[Tuple[str, Dict]] = []
+        for video_id, rows in batch.items():
+            stats = stats_map.get(video_id)
+            if not stats:
+                continue
+            for row in rows:
+                if _changed(row, stats):
+                    updates.append((row['id'], {**stats, 'stats_updated_at': updated_at}))
+
+        if self.dry_run:
+            written = len(updates)
+        else:
+            written = bulk_update_video_stats(updates)
+        with self._lock:
+            self.report.updated_rows += written
+        return written
+
+
+def refresh_video_stats(
+    rows: Optional[Iterable[Dict]] = None,
+    concurrency: int = REFRESH_STATS_CONCURRENCY,
+    limit: Optional[int] = None,
+    max_units: int = REFRESH_STATS_MAX_UNITS,
+    dry_run: bool = False,
+    cache: Optional[VideoStatsCache] = None,
+) -> RefreshReport:
+    """
+    保存済み YouTube 動画の統計を取り直して書き戻す
+
+    Args:
+        rows: iter_youtube_video_sources の行（省略時はDBから流し読み）
+        limit: 処理する動画数の上限
+        max_units: videos.list の呼び出し上限（0 なら上限なし）
+        dry_run: DBを更新せず、更新対象の行数だけ数える
+    """
+    if rows is None:
+        from db_handler import iter_youtube_video_sources
+        rows = iter_youtube_video_sources()
+
+    report = RefreshReport()
+    refresher = StatsRefresher(cache if cache is not None else get_stats_cache(), report, dry_run)
+    started = time.perf_counter()
+    concurrency = max(1, concurrency)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='refresh-stats') as pool:
+        pending = set()
+        for batch in iter_video_batches(rows):
+            if limit is not None and report.videos >= limit:
+                break
+            if limit is not None and report.videos + len(batch) > limit:
+                batch = dict(list(batch.items())[:limit - report.videos])
+            # 未処理のバッチを同時実行数までに抑え、カーソルの読み出しを取得の速さに合わせる
+            if len(pending) >= concurrency:
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # fetch に達していないバッチは1ユニットを予約済みとして数える（実際の消費は上限以下）。
+            # キャッシュで済むバッチは予約を解放するため、上限に達したら実行中のバッチを待って確かめる
+            while max_units and refresher.units_committed() >= max_units and pending:
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            if max_units and refresher.units_committed() >= max_units:
+                report.quota_reached = True
+                break
+            report.videos += len(batch)
+            refresher.reserve()
+            pending.add(pool.submit(refresher.process, batch))
+        wait(pending)
+
+    try:
+        refresher.cache.save()
+    except Exception as e:
+        print(f'⚠️ 統計キャッシュの保存に失敗: {e}')
+    report.elapsed = time.perf_counter() - started
+    return report
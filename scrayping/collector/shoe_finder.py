@@ -3,21 +3,31 @@
 競合サイトや検索結果からシューズ名を抽出
 """
 
+import os
 import re
 import json
-from typing import List, Dict, Optional
-from dataclasses import dataclass, asdict
-import requests
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence
+from dataclasses import dataclass
+import http_client
 from config import (
     SERPER_API_KEY, 
+    SERPER_API_BASE,
     GOOGLE_SEARCH_API_KEY, 
     GOOGLE_SEARCH_ENGINE_ID,
-    POPULAR_BRANDS,
+    GOOGLE_SEARCH_API_BASE,
+    SEARCH_MAX_PAGES,
+    JAPANESE_BRAND_NAMES,
     POPULAR_MODELS
 )
+from shoe_identity import canonical_key
+from shoe_matcher import ShoeMatcher, get_matcher
+from instrumentation import timed, stage, record_error
+from records import as_row, to_dict
+from pagination import paginate, take
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ShoeInfo:
     brand: str
     model_name: str
@@ -27,27 +37,33 @@ class ShoeInfo:
     source_url: str = ''
 
     def to_dict(self):
-        return asdict(self)
+        return to_dict(self)
 
+    def as_row(self) -> tuple:
+        return as_row(self)
 
-def search_with_serper(query: str, num_results: int = 10) -> List[Dict]:
-    """Serper APIで検索"""
+
+@timed('serper', provider='serper', quota_cost=1)
+def search_with_serper(query: str, num_results: int = 10, page: int = 1) -> List[Dict]:
+    """Serper APIで検索（page は1始まり）"""
     if not SERPER_API_KEY:
         print('⚠️ SERPER_API_KEYが設定されていません')
         return []
 
     try:
-        response = requests.post(
-            'https://google.serper.dev/search',
+        response = http_client.post(
+            'serper',
+            f'{SERPER_API_BASE}/search',
             headers={
                 'Content-Type': 'application/json',
                 'X-API-KEY': SERPER_API_KEY,
             },
-            json={
+            json_body={
                 'q': query,
                 'num': num_results,
                 'gl': 'jp',
                 'hl': 'ja',
+                **({'page': page} if page > 1 else {}),
             },
             timeout=30
         )
@@ -55,24 +71,28 @@ def search_with_serper(query: str, num_results: int = 10) -> List[Dict]:
         data = response.json()
         return data.get('organic', [])
     except Exception as e:
+        record_error('serper')
         print(f'❌ Serper検索エラー: {e}')
         return []
 
 
-def search_with_google(query: str, num_results: int = 10) -> List[Dict]:
-    """Google Custom Search APIで検索"""
+@timed('google_cse', provider='google_cse', quota_cost=1)
+def search_with_google(query: str, num_results: int = 10, start: int = 1) -> List[Dict]:
+    """Google Custom Search APIで検索（1リクエスト最大10件、start は1始まりの開始位置）"""
     if not GOOGLE_SEARCH_API_KEY or not GOOGLE_SEARCH_ENGINE_ID:
         print('⚠️ Google Search APIが設定されていません')
         return []
 
     try:
-        response = requests.get(
-            'https://www.googleapis.com/customsearch/v1',
+        response = http_client.get(
+            'google_cse',
+            f'{GOOGLE_SEARCH_API_BASE}/v1',
             params={
                 'key': GOOGLE_SEARCH_API_KEY,
                 'cx': GOOGLE_SEARCH_ENGINE_ID,
                 'q': query,
-                'num': min(num_results, 10),
+                'num': min(num_results, GOOGLE_PAGE_SIZE),
+                **({'start': start} if start > 1 else {}),
             },
             timeout=30
         )
@@ -87,77 +107,176 @@ def search_with_google(query: str, num_results: int = 10) -> List[Dict]:
             for item in data.get('items', [])
         ]
     except Exception as e:
+        record_error('google_cse')
         print(f'❌ Google検索エラー: {e}')
         return []
 
 
-def extract_shoe_names_from_text(text: str, source: str = '', source_url: str = '') -> List[ShoeInfo]:
-    """テキストからシューズ名を抽出"""
+# Custom Search API の1ページの最大件数と、取得できる最後の開始位置（100件目まで）
+GOOGLE_PAGE_SIZE = 10
+GOOGLE_MAX_START = 91
+
+
+def iter_serper(query: str, page_size: int = 10, max_pages: int = SEARCH_MAX_PAGES) -> Iterator[Dict]:
+    """Serperの検索結果を遅延取得（消費された分だけページを取得）"""
+    def fetch_page(page):
+        results = search_with_serper(query, page_size, page)
+        return results, page + 1 if len(results) >= page_size else None
+
+    return paginate(fetch_page, 1, max_pages)
+
+
+def iter_google(query: str, max_pages: int = SEARCH_MAX_PAGES) -> Iterator[Dict]:
+    """Google Custom Searchの検索結果を10件ずつ遅延取得"""
+    def fetch_page(start):
+        results = search_with_google(query, GOOGLE_PAGE_SIZE, start)
+        next_start = start + GOOGLE_PAGE_SIZE
+        more = len(results) >= GOOGLE_PAGE_SIZE and next_start <= GOOGLE_MAX_START
+        return results, next_start if more else None
+
+    return paginate(fetch_page, 1, max_pages)
+
+
+# ブランド名の直後に続くモデル名（Nike Pegasus 41 / ナイキ ペガサス 41）
+_ENGLISH_MODEL_TAIL = re.compile(r'\s+([A-Za-z]+(?:\s+[A-Za-z]+)?)\s*(\d+)?')
+_JAPANESE_MODEL_TAIL = re.compile(r'\s*([ァ-ヶー]+(?:\s*[ァ-ヶー]+)?)\s*(\d+)?')
+
+
+@timed('extract')
+def extract_shoe_names_from_text(
+    text: str,
+    source: str = '',
+    source_url: str = '',
+    matcher: Optional[ShoeMatcher] = None,
+) -> List[ShoeInfo]:
+    """
+    テキストからシューズ名を抽出
+
+    ブランド・モデルの言及はマッチャーで1回の走査で検出し、
+    ブランド名の直後に続く語をモデル名候補として取り出す
+    """
+    matcher = matcher or get_matcher()
+    mentions = matcher.find_mentions(text)
+    if not mentions:
+        return []
+
     shoes = []
-    text_lower = text.lower()
-
-    for brand in POPULAR_BRANDS:
-        brand_lower = brand.lower()
-        if brand_lower in text_lower:
-            # ブランド名に続くモデル名を抽出
-            patterns = [
-                # Nike Pegasus 41 などのパターン
-                rf'{re.escape(brand)}\s+([A-Za-z]+(?:\s+[A-Za-z]+)?)\s*(\d+)?',
-                # ナイキ ペガサス などの日本語パターン
-                rf'{get_japanese_brand(brand)}\s*([ァ-ヶー]+(?:\s*[ァ-ヶー]+)?)\s*(\d+)?',
-            ]
-            
-            for pattern in patterns:
-                matches = re.finditer(pattern, text, re.IGNORECASE)
-                for match in matches:
-                    model_name = match.group(1).strip()
-                    version = match.group(2) if len(match.groups()) > 1 else None
-                    
-                    if model_name and len(model_name) > 2:
-                        full_model = f'{model_name} {version}' if version else model_name
-                        shoes.append(ShoeInfo(
-                            brand=brand,
-                            model_name=full_model,
-                            source=source,
-                            source_url=source_url,
-                        ))
-
-    # 既知のモデルを直接検索
-    for brand, model in POPULAR_MODELS:
-        if brand.lower() in text_lower and model.lower() in text_lower:
-            # 重複チェック
-            exists = any(
-                s.brand == brand and s.model_name.lower() == model.lower() 
-                for s in shoes
-            )
-            if not exists:
-                shoes.append(ShoeInfo(
-                    brand=brand,
-                    model_name=model,
-                    source=source,
-                    source_url=source_url,
-                ))
+    seen = set()
+
+    def add(brand: str, model_name: str):
+        key = (brand, model_name.lower())
+        if key not in seen:
+            seen.add(key)
+            shoes.append(ShoeInfo(
+                brand=brand,
+                model_name=model_name,
+                source=source,
+                source_url=source_url,
+            ))
+
+    mentioned_brands = set()
+    for mention in mentions:
+        if mention.kind != 'brand':
+            continue
+        mentioned_brands.add(mention.brand)
+        # 日本語表記の後はカタカナのモデル名、英語表記の後は英字のモデル名
+        tail = _ENGLISH_MODEL_TAIL if mention.alias.isascii() else _JAPANESE_MODEL_TAIL
+        match = tail.match(text, mention.end)
+        if not match:
+            continue
+        model_name = match.group(1).strip()
+        version = match.group(2)
+        if model_name and len(model_name) > 2:
+            add(mention.brand, f'{model_name} {version}' if version else model_name)
+
+    # 既知のモデル（ブランドも言及されている場合のみ）
+    for mention in mentions:
+        if mention.kind == 'model' and mention.brand in mentioned_brands:
+            add(mention.brand, mention.model_name)
 
     return shoes
 
 
 def get_japanese_brand(english_brand: str) -> str:
     """英語ブランド名を日本語に変換"""
-    mapping = {
-        'Nike': 'ナイキ',
-        'Adidas': 'アディダス',
-        'ASICS': 'アシックス',
-        'New Balance': 'ニューバランス',
-        'Hoka': 'ホカ',
-        'On': 'オン',
-        'Saucony': 'サッカニー',
-        'Brooks': 'ブルックス',
-        'Mizuno': 'ミズノ',
-        'Puma': 'プーマ',
-        'Under Armour': 'アンダーアーマー',
-        'Reebok': 'リーボック',
-    }
-    return mapping.get(english_brand, english_brand)
+    return JAPANESE_BRAND_NAMES.get(english_brand, english_brand)
+
+
+# extract_many: この件数以下はプロセスプールを使わずその場で処理（起動コストの方が大きいため）
+EXTRACT_INLINE_MAX = 5000
+# プロセスプールに渡す1チャンクあたりのテキスト数
+EXTRACT_CHUNK_SIZE = 2000
+
+# ワーカープロセス内で共有するマッチャー
+_worker_matcher: Optional[ShoeMatcher] = None
+
+
+def _init_extract_worker(matcher: ShoeMatcher):
+    global _worker_matcher
+    _worker_matcher = matcher
+
+
+def _extract_chunk(texts: List[str]) -> List[List[tuple]]:
+    # プロセス間の受け渡しを軽くするため (brand, model_name) のタプルで返す
+    return [
+        [(shoe.brand, shoe.model_name) for shoe in extract_shoe_names_from_text(text, matcher=_worker_matcher)]
+        for text in texts
+    ]
+
+
+@timed('extract_many')
+def extract_many(
+    texts: Sequence[str],
+    source: str = '',
+    source_urls: Optional[Sequence[str]] = None,
+    matcher: Optional[ShoeMatcher] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = EXTRACT_CHUNK_SIZE,
+) -> List[List[ShoeInfo]]:
+    """
+    複数テキストからシューズ名を一括抽出（結果は入力と同じ順序）
+
+    件数が EXTRACT_INLINE_MAX 以下、またはワーカー数が1なら同一プロセスで処理し、
+    それ以上はチャンクに分けてプロセスプールで並列に処理する
+    （マッチャーは各ワーカーの起動時に一度だけ受け渡す）
+
+    Args:
+        source_urls: texts と同じ長さの出典URL（省略時は空）
+        matcher: 使用するマッチャー（省略時は共有マッチャー）
+        workers: ワーカープロセス数（省略時はCPU数）
+    """
+    if source_urls is not None and len(source_urls) != len(texts):
+        raise ValueError('source_urls は texts と同じ長さで指定してください')
+
+    matcher = matcher or get_matcher()
+    urls = source_urls if source_urls is not None else [''] * len(texts)
+    workers = workers or os.cpu_count() or 1
+
+    if len(texts) <= EXTRACT_INLINE_MAX or workers <= 1:
+        return [
+            extract_shoe_names_from_text(text, source, url, matcher=matcher)
+            for text, url in zip(texts, urls)
+        ]
+
+    chunks = [list(texts[i:i + chunk_size]) for i in range(0, len(texts), chunk_size)]
+    workers = min(workers, len(chunks))
+
+    results: List[List[ShoeInfo]] = []
+    url_iter = iter(urls)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_extract_worker,
+        initargs=(matcher,),
+    ) as executor:
+        # map は投入順に結果を返すため、順に連結すれば入力順になる
+        for chunk_result in executor.map(_extract_chunk, chunks):
+            for pairs in chunk_result:
+                url = next(url_iter)
+                results.append([
+                    ShoeInfo(brand=brand, model_name=model_name, source=source, source_url=url)
+                    for brand, model_name in pairs
+                ])
+    return results
 
 
 def find_trending_shoes(num_results: int = 30) -> List[ShoeInfo]:
@@ -172,33 +291,35 @@ def find_trending_shoes(num_results: int = 30) -> List[ShoeInfo]:
         'best running shoes 2024 review',
     ]
 
+    texts = []
+    urls = []
     for query in queries:
         print(f'🔍 検索中: {query}')
         
-        # Serper APIを試す
-        results = search_with_serper(query, 10)
-        
-        # フォールバック
+        # Serper APIを試す（1ページ目で結果がなければ Google にフォールバック）
+        results = take(iter_serper(query, 10), 10)
         if not results:
-            results = search_with_google(query, 10)
+            results = take(iter_google(query), 10)
         
         for result in results:
             title = result.get('title', '')
             snippet = result.get('snippet', '')
-            url = result.get('link', '')
-            
-            text = f'{title} {snippet}'
-            shoes = extract_shoe_names_from_text(text, 'web_search', url)
-            all_shoes.extend(shoes)
+            texts.append(f'{title} {snippet}')
+            urls.append(result.get('link', ''))
+
+    for shoes in extract_many(texts, 'web_search', urls):
+        all_shoes.extend(shoes)
 
     # 重複を除去
     unique_shoes = []
     seen = set()
-    for shoe in all_shoes:
-        key = (shoe.brand.lower(), shoe.model_name.lower())
-        if key not in seen:
-            seen.add(key)
-            unique_shoes.append(shoe)
+    with stage('dedup'):
+        for shoe in all_shoes:
+            # 'Pegasus 41' と 'ペガサス 41' などの表記ゆれは同じシューズとして扱う
+            key = canonical_key(shoe.brand, shoe.model_name)
+            if key not in seen:
+                seen.add(key)
+                unique_shoes.append(shoe)
 
     return unique_shoes[:num_results]
 
@@ -0,0 +1,174 @@
+"""
+シューズの正規化・同一性判定モジュール
+表記ゆれ（'ナイキ ペガサス 41' / 'Nike Pegasus 41' / 'Pegasus41'）を同じ正規キーにまとめ、
+正規キー → DBのシューズID のハッシュ索引で O(1) に解決する
+
+正規化の手順:
+    1. NFKC（全角英数字・半角カナを統一）、ひらがな → カタカナ、小文字化
+    2. 記号（- ・ / など）を区切りとして英字・数字・カタカナのトークンに分割
+       （'Pegasus41' → pegasus 41、'1080v13' → 1080 v 13）
+    3. ブランド・カタカナのモデル名を別表記表（config.py）で英語表記に変換
+    4. 末尾の数字をバージョンとして分離（'v13' の v は落とす）
+
+使用方法:
+    index = load_shoe_index_from_db()
+    shoe_id = index.resolve('ナイキ', 'ペガサス41')
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import BRAND_ALIASES, JAPANESE_BRAND_NAMES, MODEL_NAME_ALIASES, POPULAR_BRANDS
+
+_TOKEN_PATTERN = re.compile(r'[a-z]+|\d+(?:\.\d+)?|[ァ-ヶー]+|\+')
+_HIRAGANA_TO_KATAKANA = {code: code + 0x60 for code in range(ord('ぁ'), ord('ゖ') + 1)}
+
+
+def normalize_text(text: str) -> str:
+    """NFKC・ひらがな→カタカナ・小文字化し、記号を空白にまとめる"""
+    text = unicodedata.normalize('NFKC', text or '').translate(_HIRAGANA_TO_KATAKANA).lower()
+    return ' '.join(_TOKEN_PATTERN.findall(text))
+
+
+def _build_brand_aliases() -> Dict[str, str]:
+    aliases = {}
+    for brand in POPULAR_BRANDS:
+        aliases[normalize_text(brand)] = brand
+    for brand, japanese in JAPANESE_BRAND_NAMES.items():
+        aliases[normalize_text(japanese)] = brand
+    for alias, brand in BRAND_ALIASES.items():
+        aliases[normalize_text(alias)] = brand
+    return aliases
+
+
+def _build_model_aliases() -> Dict[str, List[str]]:
+    return {
+        normalize_text(alias): normalize_text(english).split()
+        for alias, english in MODEL_NAME_ALIASES.items()
+    }
+
+
+_BRAND_ALIASES = _build_brand_aliases()
+_MODEL_ALIASES = _build_model_aliases()
+
+
+@dataclass(frozen=True)
+class ShoeIdentity:
+    """正規化したシューズの同一性（brand はDBと同じ英語表記を小文字化したもの）"""
+    brand: str
+    model: str
+    version: str = ''
+
+    @property
+    def key(self) -> str:
+        return f'{self.brand}|{self.model}|{self.version}'
+
+
+def canonical_brand(brand: str) -> str:
+    """ブランド表記を英語ブランド名に揃える（未知のブランドは正規化した表記のまま）"""
+    normalized = normalize_text(brand)
+    return _BRAND_ALIASES.get(normalized, normalized)
+
+
+def model_tokens(model_name: str) -> List[str]:
+    """モデル名をトークン化し、カタカナ表記を英語表記に置き換える"""
+    tokens = []
+    for token in normalize_text(model_name).split():
+        tokens.extend(_MODEL_ALIASES.get(token, [token]))
+    return tokens
+
+
+def split_version(tokens: List[str]) -> Tuple[List[str], str]:
+    """
+    末尾の数字をバージョンとして分離
+
+    ['pegasus', '41'] → (['pegasus'], '41')
+    ['fresh', 'foam', '1080', 'v', '13'] → (['fresh', 'foam', '1080'], '13')
+    ['superblast'] → (['superblast'], '')
+    """
+    if len(tokens) < 2 or not tokens[-1][0].isdigit():
+        return tokens, ''
+    base = tokens[:-1]
+    if base[-1] == 'v' and len(base) > 1:
+        base = base[:-1]
+    return base, tokens[-1]
+
+
+def identify(brand: str, model_name: str) -> ShoeIdentity:
+    """ブランドとモデル名から正規化した同一性を求める"""
+    tokens = model_tokens(model_name)
+    # モデル名の先頭にブランド名が含まれている場合は取り除く（'Nike Pegasus 41'）
+    brand_name = canonical_brand(brand)
+    brand_tokens = normalize_text(brand_name).split()
+    if tokens[:len(brand_tokens)] == brand_tokens and len(tokens) > len(brand_tokens):
+        tokens = tokens[len(brand_tokens):]
+    base, version = split_version(tokens)
+    return ShoeIdentity(brand=brand_name.lower(), model=' '.join(base), version=version)
+
+
+def canonical_key(brand: str, model_name: str) -> str:
+    """表記ゆれを吸収したシューズの正規キー"""
+    return identify(brand, model_name).key
+
+
+class ShoeIndex:
+    """正規キー → シューズID の索引"""
+
+    def __init__(self):
+        self._ids: Dict[str, str] = {}
+        # 正規キーが衝突した（同じシューズが別表記で重複登録されている）件数
+        self.conflicts = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, shoe_id: str, brand: str, model_name: str) -> str:
+        """シューズを登録して正規キーを返す（既存のキーは上書きしない）"""
+        key = canonical_key(brand, model_name)
+        existing = self._ids.setdefault(key, shoe_id)
+        if existing != shoe_id:
+            self.conflicts += 1
+        return key
+
+    def resolve(self, brand: str, model_name: str) -> Optional[str]:
+        """表記ゆれを吸収してシューズIDを返す（未登録なら None）"""
+        return self._ids.get(canonical_key(brand, model_name))
+
+    def resolve_key(self, key: str) -> Optional[str]:
+        return self._ids.get(key)
+
+
+def build_shoe_index(shoes: Iterable[Dict]) -> ShoeIndex:
+    """get_all_shoes() 形式の行から索引を構築"""
+    index = ShoeIndex()
+    for shoe in shoes:
+        index.add(shoe['id'], shoe['brand'], shoe['modelName'])
+    return index
+
+
+def load_shoe_index_from_db() -> ShoeIndex:
+    """DBの shoes テーブルから索引を構築"""
+    from db_handler import get_all_shoes
+
+    index = build_shoe_index(get_all_shoes())
+    print(f'🗂️ シューズ索引: {len(index)} 件')
+    if index.conflicts:
+        print(f'⚠️ 表記ゆれによる重複登録: {index.conflicts} 件')
+    return index
+
+
+if __name__ == '__main__':
+    samples = [
+        ('Nike', 'Pegasus 41'),
+        ('ナイキ', 'ペガサス41'),
+        ('NIKE', 'Pegasus41'),
+        ('Ｎｉｋｅ', 'Ｐｅｇａｓｕｓ　４１'),
+        ('ASICS', 'Gel-Kayano 30'),
+        ('アシックス', 'ゲルカヤノ 30'),
+        ('New Balance', 'Fresh Foam 1080v13'),
+        ('ニューバランス', 'Fresh Foam 1080 v13'),
+    ]
+    for brand, model_name in samples:
+        print(f'{brand} {model_name} → {canonical_key(brand, model_name)}')
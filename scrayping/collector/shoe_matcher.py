@@ -0,0 +1,190 @@
+"""
+シューズ名マッチャー
+ブランド名・日本語ブランド名・モデル名を1つのトライ正規表現にまとめ、
+テキストを1回走査するだけで全ての言及位置を検出する
+
+- パターンは構築時に一度だけコンパイル（呼び出しごとの正規表現生成をなくす）
+- 走査コストはカタログ件数にほぼ依存しない（先頭文字で候補位置を絞り、以降はトライを辿るだけ）
+- 英数字で始まる/終わるパターンは単語境界でのみ一致（'x' が 'box' に一致しない）
+
+使用方法:
+    matcher = build_matcher(catalog=[('Nike', 'Pegasus 41'), ...])
+    for mention in matcher.find_mentions(text):
+        print(mention.kind, mention.brand, mention.model_name, mention.start, mention.end)
+"""
+
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from config import POPULAR_BRANDS, POPULAR_MODELS, JAPANESE_BRAND_NAMES
+
+# この長さ以下のブランド名（On など）は一般語と紛らわしいため大文字小文字を区別する
+CASE_SENSITIVE_MAX_LEN = 2
+
+_WORD_CHARS = 'a-z0-9'
+
+
+class Mention(NamedTuple):
+    """テキスト中の言及（1テキストあたり数十件生成されるため軽量な NamedTuple）"""
+    kind: str  # brand, model
+    brand: str
+    model_name: str
+    start: int
+    end: int
+    # ブランドの表記（英語名 or 日本語名）
+    alias: str = ''
+
+
+def fold_text(text: str) -> str:
+    """照合用の正規化（長さを変えない小文字化）"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # 一部の文字（İ 等）は小文字化で長さが変わるため、位置がずれないよう1文字ずつ処理
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+def _build_trie(patterns: Iterable[str]) -> Dict:
+    trie: Dict = {}
+    for pattern in patterns:
+        node = trie
+        for ch in pattern:
+            node = node.setdefault(ch, {})
+        node[''] = True
+    return trie
+
+
+def _node_regex(node: Dict, prev: str) -> str:
+    """トライのノード以下を正規表現に変換（長い一致を優先、末尾の単語境界つき）"""
+    alternatives = [re.escape(ch) + _node_regex(node[ch], ch) for ch in sorted(k for k in node if k)]
+    if '' in node:
+        alternatives.append(f'(?![{_WORD_CHARS}])' if _is_word_char(prev) else '')
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return '(?:' + '|'.join(alternatives) + ')'
+
+
+def compile_trie_regex(patterns: Iterable[str]) -> Optional[re.Pattern]:
+    """
+    パターン集合を、重なりを含む全開始位置で一致するトライ正規表現にコンパイル
+
+    一致は group(1) に入る（ゼロ幅の先読みで走査するため、重なった言及も検出できる）
+    """
+    trie = _build_trie(p for p in patterns if p)
+    if not trie:
+        return None
+
+    first_word = ''.join(re.escape(ch) for ch in sorted(trie) if _is_word_char(ch))
+    first_other = ''.join(re.escape(ch) for ch in sorted(trie) if not _is_word_char(ch))
+    gates = []
+    if first_word:
+        gates.append(f'(?<![{_WORD_CHARS}])(?=[{first_word}])')
+    if first_other:
+        gates.append(f'(?=[{first_other}])')
+    body = '|'.join(re.escape(ch) + _node_regex(trie[ch], ch) for ch in sorted(trie))
+    return re.compile(f'(?:{"|".join(gates)})(?=({body}))')
+
+
+class ShoeMatcher:
+    """ブランド・モデルの言及を一括検出するマッチャー"""
+
+    def __init__(
+        self,
+        brand_aliases: Dict[str, str],
+        models: Iterable[Tuple[str, str]],
+    ):
+        """
+        Args:
+            brand_aliases: 表記 → 英語ブランド名（'Nike' → 'Nike', 'ナイキ' → 'Nike'）
+            models: (ブランド, モデル名) の一覧
+        """
+        # 照合用表記 → [(kind, brand, model_name, alias)]
+        self._values: Dict[str, List[Tuple[str, str, str, str]]] = {}
+        for alias, brand in brand_aliases.items():
+            self._add(alias, ('brand', brand, '', alias))
+        self.model_count = 0
+        for brand, model_name in models:
+            if brand and model_name:
+                self._add(model_name, ('model', brand, model_name, ''))
+                self.model_count += 1
+        self.brand_count = len(set(brand_aliases.values()))
+        self._pattern = compile_trie_regex(self._values)
+
+    def _add(self, text: str, value: Tuple[str, str, str, str]):
+        values = self._values.setdefault(fold_text(text.strip()), [])
+        if value not in values:
+            values.append(value)
+
+    def find_mentions(self, text: str) -> List[Mention]:
+        """テキスト中のブランド・モデルの言及を出現順に返す"""
+        if not self._pattern or not text:
+            return []
+
+        values = self._values
+        mentions = []
+        for match in self._pattern.finditer(fold_text(text)):
+            matched = match.group(1)
+            start = match.start()
+            end = start + len(matched)
+            for kind, brand, model_name, alias in values[matched]:
+                if kind == 'brand' and len(alias) <= CASE_SENSITIVE_MAX_LEN and text[start:end] != alias:
+                    continue
+                mentions.append(Mention(kind, brand, model_name, start, end, alias))
+        return mentions
+
+
+def build_matcher(catalog: Optional[Iterable[Tuple[str, str]]] = None) -> ShoeMatcher:
+    """
+    設定（POPULAR_BRANDS / POPULAR_MODELS / 日本語ブランド名）と任意のカタログからマッチャーを構築
+
+    Args:
+        catalog: 追加する (ブランド, モデル名) の一覧（DBの shoes テーブル等）
+    """
+    catalog = list(catalog or [])
+    aliases: Dict[str, str] = {}
+    for brand in list(POPULAR_BRANDS) + [brand for brand, _ in catalog]:
+        if brand:
+            aliases.setdefault(brand, brand)
+    for brand, japanese in JAPANESE_BRAND_NAMES.items():
+        aliases.setdefault(japanese, brand)
+
+    return ShoeMatcher(aliases, list(POPULAR_MODELS) + catalog)
+
+
+_default_matcher: Optional[ShoeMatcher] = None
+
+
+def get_matcher() -> ShoeMatcher:
+    """共有マッチャーを返す（初回呼び出し時に設定から構築）"""
+    global _default_matcher
+    if _default_matcher is None:
+        _default_matcher = build_matcher()
+    return _default_matcher
+
+
+def set_catalog(catalog: Iterable[Tuple[str, str]]) -> ShoeMatcher:
+    """カタログを指定して共有マッチャーを作り直す"""
+    global _default_matcher
+    _default_matcher = build_matcher(catalog)
+    return _default_matcher
+
+
+def load_catalog_from_db(shoes: Optional[List[Dict]] = None) -> ShoeMatcher:
+    """
+    DBの shoes テーブルを共有マッチャーに取り込む（DBが空なら設定の一覧だけで構築）
+
+    Args:
+        shoes: 取得済みの get_all_shoes() の結果（省略時はDBから取得）
+    """
+    if shoes is None:
+        from db_handler import get_all_shoes
+        shoes = get_all_shoes()
+    if not shoes:
+        print('⚠️ DBにシューズがないため、設定の一覧だけでマッチャーを構築します')
+    matcher = set_catalog((shoe['brand'], shoe['modelName']) for shoe in shoes)
+    print(f'🔤 マッチャー構築: ブランド {matcher.brand_count} 件, モデル {matcher.model_count} 件')
+    return matcher
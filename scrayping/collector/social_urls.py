@@ -0,0 +1,148 @@
+"""
+ソーシャルURLの分類・正規化モジュール
+検索結果のURLを1回の解析でプラットフォーム・投稿種別・投稿者・正規URLに分解する
+
+- URLは文字列操作で1回だけ分解し、ホストは完全一致の表で判定
+  （'x.com' in url のような部分一致で box.com / netflix.com を誤判定しない）
+- twitter.com / x.com / mobile.twitter.com、old.reddit.com / www.reddit.com などの違いと
+  クエリ文字列・末尾スラッシュ・スラッグを吸収した正規URLと重複判定キーを返す
+
+使用方法:
+    info = classify_url('https://mobile.twitter.com/Runner/status/123?s=20')
+    info.platform      # 'twitter'
+    info.post_type     # 'tweet'
+    info.author        # 'Runner'
+    info.canonical_url # 'https://x.com/runner/status/123'（ユーザー名は小文字）
+    info.key           # 'twitter:123'
+"""
+
+from functools import lru_cache
+from typing import NamedTuple
+
+# ホスト（小文字・ポートなし）→ プラットフォーム
+PLATFORM_HOSTS = {
+    'twitter.com': 'twitter',
+    'www.twitter.com': 'twitter',
+    'mobile.twitter.com': 'twitter',
+    'm.twitter.com': 'twitter',
+    'x.com': 'twitter',
+    'www.x.com': 'twitter',
+    'mobile.x.com': 'twitter',
+    'reddit.com': 'reddit',
+    'www.reddit.com': 'reddit',
+    'old.reddit.com': 'reddit',
+    'new.reddit.com': 'reddit',
+    'np.reddit.com': 'reddit',
+    'm.reddit.com': 'reddit',
+    'i.reddit.com': 'reddit',
+    'note.com': 'note',
+    'www.note.com': 'note',
+    'note.mu': 'note',
+}
+
+# ユーザー名として扱わないパスの先頭要素
+_TWITTER_RESERVED = {'search', 'hashtag', 'i', 'intent', 'home', 'explore', 'share', 'settings'}
+_NOTE_RESERVED = {'search', 'hashtag', 'explore', 'ranking', 'topics', 'categories', 'notifications'}
+
+
+class SocialUrl(NamedTuple):
+    """分類済みのURL（検索結果1件ごとに生成されるため軽量な NamedTuple）"""
+    platform: str  # twitter, reddit, note（対象外は ''）
+    post_type: str  # tweet, reddit_post, note_article（投稿ページ以外は profile / subreddit / ''）
+    author: str
+    canonical_url: str
+    # 重複判定キー（投稿ページはプラットフォーム + 投稿ID、それ以外は正規URL）
+    key: str
+
+    @property
+    def is_post(self) -> bool:
+        return self.post_type in ('tweet', 'reddit_post', 'note_article')
+
+
+def _unclassified(url: str) -> SocialUrl:
+    return SocialUrl('', '', '', url, url)
+
+
+def _classify_twitter(parts: list) -> SocialUrl:
+    # /{user}/status/{id}[/photo/1]
+    if len(parts) >= 3 and parts[1] in ('status', 'statuses') and parts[2].isdigit():
+        user, tweet_id = parts[0], parts[2]
+        author = '' if user.lower() in _TWITTER_RESERVED else user
+        # ユーザー名は大文字小文字を区別しないため、正規URLは小文字（表示用の author は元の表記）
+        return SocialUrl(
+            'twitter', 'tweet', author,
+            f'https://x.com/{user.lower()}/status/{tweet_id}', f'twitter:{tweet_id}',
+        )
+    if parts and parts[0].lower() not in _TWITTER_RESERVED:
+        url = f'https://x.com/{parts[0].lower()}'
+        return SocialUrl('twitter', 'profile', parts[0], url, url)
+    return SocialUrl('twitter', '', '', 'https://x.com/', 'twitter:')
+
+
+def _classify_reddit(parts: list) -> SocialUrl:
+    # /r/{subreddit}/comments/{id}/{slug}/（サブレディット名も大文字小文字を区別しない）
+    if len(parts) >= 2 and parts[0].lower() == 'r':
+        subreddit = parts[1]
+        if len(parts) >= 4 and parts[2] == 'comments':
+            post_id = parts[3].lower()
+            return SocialUrl(
+                'reddit', 'reddit_post', f'r/{subreddit}',
+                f'https://www.reddit.com/r/{subreddit.lower()}/comments/{post_id}/', f'reddit:{post_id}',
+            )
+        url = f'https://www.reddit.com/r/{subreddit.lower()}/'
+        return SocialUrl('reddit', 'subreddit', f'r/{subreddit}', url, url)
+    # /comments/{id}（サブレディット省略の短縮形）
+    if len(parts) >= 2 and parts[0] == 'comments':
+        post_id = parts[1].lower()
+        return SocialUrl(
+            'reddit', 'reddit_post', '',
+            f'https://www.reddit.com/comments/{post_id}/', f'reddit:{post_id}',
+        )
+    return SocialUrl('reddit', '', '', 'https://www.reddit.com/', 'reddit:')
+
+
+def _classify_note(parts: list) -> SocialUrl:
+    # /{user}/n/{id}
+    user = parts[0] if parts and parts[0].lower() not in _NOTE_RESERVED else ''
+    if user and len(parts) >= 3 and parts[1] == 'n':
+        note_id = parts[2]
+        return SocialUrl(
+            'note', 'note_article', user,
+            f'https://note.com/{user}/n/{note_id}', f'note:{note_id}',
+        )
+    if user:
+        url = f'https://note.com/{user}'
+        return SocialUrl('note', 'profile', user, url, url.lower())
+    return SocialUrl('note', '', '', 'https://note.com/', 'note:')
+
+
+_CLASSIFIERS = {
+    'twitter': _classify_twitter,
+    'reddit': _classify_reddit,
+    'note': _classify_note,
+}
+
+
+def _split_host_path(url: str):
+    """scheme://[userinfo@]host[:port]/path?query#fragment からホストとパスを取り出す"""
+    scheme_end = url.find('://')
+    rest = url[scheme_end + 3:] if scheme_end >= 0 else url
+    for delimiter in '?#':
+        cut = rest.find(delimiter)
+        if cut >= 0:
+            rest = rest[:cut]
+    slash = rest.find('/')
+    authority, path = (rest, '') if slash < 0 else (rest[:slash], rest[slash:])
+    host = authority.rpartition('@')[2].partition(':')[0].rstrip('.').lower()
+    return host, path
+
+
+# 同じURLは複数のクエリ・プラットフォームのフィルタで繰り返し現れるためキャッシュする（1件約300バイト）
+@lru_cache(maxsize=32768)
+def classify_url(url: str) -> SocialUrl:
+    """URLを分類・正規化する（対象外のドメインは platform='' で返す）"""
+    host, path = _split_host_path(url.strip())
+    platform = PLATFORM_HOSTS.get(host)
+    if not platform:
+        return _unclassified(url)
+    return _CLASSIFIERS[platform]([part for part in path.split('/') if part])
@@ -0,0 +1,275 @@
+"""
+トレンド検出モジュール
+収集実行ごとのシューズ言及を日別の Count-Min スケッチに蓄積し、
+直近の期間とその前の同じ長さの期間の言及数を比べて「伸びている」シューズを求める
+
+- 言及数はシューズの正規キー（shoe_identity.canonical_key）ごとに数える
+- 日別スケッチは保持日数分のリングバッファ（古い日は上書き）
+- 列挙用の候補キーは Space-Saving 方式で上限件数だけ保持
+- 処理した言及数に関わらずメモリ・ファイルサイズは一定
+  （既定: 4行 × 2048列 × 56日 × 4バイト ≒ 1.8MB）
+
+使用方法:
+    python main.py shoes trending --window 7d
+    python trending.py --window 14d --top 30
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import struct
+import tempfile
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import (
+    TRENDING_STATE_PATH,
+    TRENDING_RETENTION_DAYS,
+    TRENDING_SKETCH_WIDTH,
+    TRENDING_SKETCH_DEPTH,
+    TRENDING_MAX_CANDIDATES,
+)
+from shoe_identity import canonical_key
+
+_MAGIC = b'SHOETRND1'
+_DAY_SECONDS = 86400
+
+
+@dataclass
+class TrendingShoe:
+    """トレンドの集計結果"""
+    key: str
+    label: str
+    current: int
+    previous: int
+    score: float
+
+
+def parse_window(window: str) -> int:
+    """'7d' / '2w' / '7' を日数に変換"""
+    window = window.strip().lower()
+    if window.endswith('w'):
+        return int(window[:-1]) * 7
+    if window.endswith('d'):
+        return int(window[:-1])
+    return int(window)
+
+
+def _day_number(timestamp: float) -> int:
+    return int(timestamp // _DAY_SECONDS)
+
+
+class TrendSketch:
+    """日別 Count-Min スケッチのリングバッファと候補キー"""
+
+    def __init__(
+        self,
+        days: int = TRENDING_RETENTION_DAYS,
+        width: int = TRENDING_SKETCH_WIDTH,
+        depth: int = TRENDING_SKETCH_DEPTH,
+        max_candidates: int = TRENDING_MAX_CANDIDATES,
+    ):
+        self.days = days
+        self.width = width
+        self.depth = depth
+        self.max_candidates = max_candidates
+        # スロットごとの日番号（-1 は未使用）
+        self.slot_days = [-1] * days
+        self.counts = array('I', bytes(4 * days * depth * width))
+        # 候補キー → [表示名, 推定言及数]
+        self.candidates: Dict[str, list] = {}
+        self.total_mentions = 0
+
+    # ===== スケッチ =====
+
+    def _columns(self, key: str) -> List[int]:
+        # 2つのハッシュの線形結合で depth 個の列を決める（実行間で安定）
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+        h1, h2 = struct.unpack('<II', digest)
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def _slot_offset(self, day: int) -> int:
+        """日のスロット先頭位置（古い日のスロットは使い回す前にゼロクリア）"""
+        slot = day % self.days
+        if self.slot_days[slot] != day:
+            start = slot * self.depth * self.width
+            self.counts[start:start + self.depth * self.width] = array('I', bytes(4 * self.depth * self.width))
+            self.slot_days[slot] = day
+        return slot * self.depth * self.width
+
+    def add(self, key: str, label: str = '', count: int = 1, timestamp: Optional[float] = None):
+        """言及を加算"""
+        day = _day_number(timestamp if timestamp is not None else time.time())
+        newest = max(self.slot_days)
+        if day <= newest - self.days:
+            # 保持期間より古い言及は数えない
+            return
+        offset = self._slot_offset(day)
+        for row, column in enumerate(self._columns(key)):
+            self.counts[offset + row * self.width + column] += count
+        self.total_mentions += count
+        self._track_candidate(key, label, count)
+
+    def estimate(self, key: str, first_day: int, last_day: int) -> int:
+        """first_day〜last_day（両端含む）の言及数の推定値（過大推定のみ）"""
+        columns = self._columns(key)
+        total = 0
+        for slot, day in enumerate(self.slot_days):
+            if first_day <= day <= last_day:
+                offset = slot * self.depth * self.width
+                total += min(self.counts[offset + row * self.width + column] for row, column in enumerate(columns))
+        return total
+
+    def _track_candidate(self, key: str, label: str, count: int):
+        entry = self.candidates.get(key)
+        if entry is not None:
+            entry[1] += count
+            return
+        if len(self.candidates) < self.max_candidates:
+            self.candidates[key] = [label or key, count]
+            return
+        # Space-Saving: 最小の候補を置き換え、その件数を引き継ぐ
+        smallest = min(self.candidates, key=lambda k: self.candidates[k][1])
+        inherited = self.candidates.pop(smallest)[1]
+        self.candidates[key] = [label or key, inherited + count]
+
+    # ===== 集計 =====
+
+    def trending(self, window_days: int, top: int = 20, now: Optional[float] = None) -> List[TrendingShoe]:
+        """
+        直近 window_days 日とその前の window_days 日の言及数を比べ、伸びの大きい順に返す
+
+        スコアは (今期 - 前期) / sqrt(前期 + 1)。言及の少ないシューズのわずかな増加より、
+        普段から言及されるシューズの大きな増加を上位にする
+        """
+        if window_days * 2 > self.days:
+            raise ValueError(f'期間は保持日数の半分（{self.days // 2}日）以下で指定してください')
+
+        today = _day_number(now if now is not None else time.time())
+        current_first = today - window_days + 1
+        previous_first = current_first - window_days
+
+        results = []
+        for key, (label, _) in self.candidates.items():
+            current = self.estimate(key, current_first, today)
+            if current == 0:
+                continue
+            previous = self.estimate(key, previous_first, current_first - 1)
+            score = (current - previous) / math.sqrt(previous + 1)
+            results.append(TrendingShoe(key, label, current, previous, round(score, 3)))
+        results.sort(key=lambda t: (-t.score, -t.current))
+        return results[:top]
+
+    # ===== 永続化 =====
+
+    def save(self, path: str):
+        """アトミックに保存（ヘッダJSON + スケッチの生バイト列）"""
+        header = json.dumps({
+            'days': self.days,
+            'width': self.width,
+            'depth': self.depth,
+            'max_candidates': self.max_candidates,
+            'slot_days': self.slot_days,
+            'candidates': self.candidates,
+            'total_mentions': self.total_mentions,
+        }, ensure_ascii=False).encode('utf-8')
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.trending-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_MAGIC)
+                f.write(struct.pack('<I', len(header)))
+                f.write(header)
+                f.write(self.counts.tobytes())
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> 'TrendSketch':
+        """保存済みの状態を読み込む（ファイルがなければ空の状態）"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'rb') as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f'トレンドの状態ファイルではありません: {path}')
+            (header_len,) = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_len).decode('utf-8'))
+            sketch = cls(header['days'], header['width'], header['depth'], header['max_candidates'])
+            sketch.counts = array('I')
+            sketch.counts.frombytes(f.read())
+        sketch.slot_days = header['slot_days']
+        sketch.candidates = header['candidates']
+        sketch.total_mentions = header['total_mentions']
+        return sketch
+
+
+def record_mentions(
+    mentions: Iterable[Tuple[str, str]],
+    timestamp: Optional[float] = None,
+    path: str = TRENDING_STATE_PATH,
+) -> int:
+    """(ブランド, モデル名) の言及を状態ファイルに加算し、件数を返す"""
+    sketch = TrendSketch.load(path)
+    count = 0
+    for brand, model_name in mentions:
+        sketch.add(canonical_key(brand, model_name), f'{brand} {model_name}', timestamp=timestamp)
+        count += 1
+    if count:
+        sketch.save(path)
+    return count
+
+
+def record_texts(texts: Sequence[str], timestamp: Optional[float] = None, path: str = TRENDING_STATE_PATH) -> int:
+    """収集したテキスト（タイトル・スニペット等）からシューズの言及を抽出して加算"""
+    from shoe_finder import extract_many
+
+    mentions = [
+        (shoe.brand, shoe.model_name)
+        for shoes in extract_many(list(texts), 'trending')
+        for shoe in shoes
+    ]
+    count = record_mentions(mentions, timestamp, path)
+    if count:
+        print(f'📈 トレンド: {count} 件の言及を記録')
+    return count
+
+
+def get_trending(window: str = '7d', top: int = 20, path: str = TRENDING_STATE_PATH) -> List[TrendingShoe]:
+    """保存済みの状態からトレンドを求める"""
+    return TrendSketch.load(path).trending(parse_window(window), top)
+
+
+def print_trending(window: str = '7d', top: int = 20, path: str = TRENDING_STATE_PATH):
+    """トレンドを表示"""
+    try:
+        results = get_trending(window, top, path)
+    except ValueError as e:
+        print(f'❌ {e}')
+        return
+
+    print(f'=== トレンド（直近 {parse_window(window)} 日 vs その前の {parse_window(window)} 日）===\n')
+    if not results:
+        print('言及がまだ記録されていません（collect / collect-all の実行時に記録されます）')
+        return
+
+    print(f'{"score":>8} {"今期":>6} {"前期":>6}  シューズ')
+    for item in results:
+        print(f'{item.score:>8.2f} {item.current:>6} {item.previous:>6}  {item.label}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='シューズのトレンドを表示')
+    parser.add_argument('--window', default='7d', help='比較する期間（例: 7d, 2w）')
+    parser.add_argument('--top', type=int, default=20, help='表示件数')
+    parser.add_argument('--state', default=TRENDING_STATE_PATH, help='状態ファイル')
+    args = parser.parse_args()
+    print_trending(args.window, args.top, args.state)
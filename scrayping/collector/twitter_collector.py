@@ -10,7 +10,7 @@ Twitter API v2を使用してランニングシューズのレビューを検索
 
 import json
 from typing import List, Dict, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from datetime import datetime
 import requests
 try:
@@ -25,9 +25,10 @@ from config import (
     TWITTER_ACCESS_TOKEN_SECRET,
     TWITTER_BEARER_TOKEN,
 )
+from records import as_row, to_dict
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Tweet:
     tweet_id: str
     text_preview: str  # 最初の100文字のみ
@@ -45,10 +46,13 @@ class Tweet:
         return f'https://twitter.com/{self.author_username}/status/{self.tweet_id}'
 
     def to_dict(self):
-        d = asdict(self)
+        d = to_dict(self)
         d['url'] = self.url
         return d
 
+    def as_row(self) -> tuple:
+        return as_row(self)
+
 
 def get_twitter_client_v2():
     """Twitter API v2 クライアントを取得"""
@@ -0,0 +1,166 @@
+"""
+YouTube 動画統計のローカルキャッシュ
+enrich_video_stats が同じ動画の統計を毎回取り直さないよう、video_id ごとに
+統計（視聴・高評価・コメント数）と取得時刻を保存する
+
+- 取得から YOUTUBE_STATS_FRESH_SECONDS 以内の動画はリクエストしない
+- 期限切れの動画は条件付きリクエスト（If-None-Match）で取得し、304 ならキャッシュを使う。
+  videos.list の ETag はレスポンス（ID の組）単位のため、ETag は ID の組ごとに保存する
+- 件数が YOUTUBE_STATS_CACHE_MAX を超えたら取得時刻の古いものから捨てる
+- 保存はアトミック（一時ファイル + rename）。更新があれば一定間隔とプロセス終了時に書き出す
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Dict, Iterable, Optional
+
+from config import YOUTUBE_STATS_CACHE_PATH, YOUTUBE_STATS_FRESH_SECONDS, YOUTUBE_STATS_CACHE_MAX
+
+# 更新後、この秒数が経てば次の呼び出しで書き出す
+_SAVE_INTERVAL_SECONDS = 60
+
+
+def _batch_key(video_ids: Iterable[str]) -> str:
+    return hashlib.sha1(','.join(sorted(video_ids)).encode('utf-8')).hexdigest()[:20]
+
+
+class VideoStatsCache:
+    """video_id → 統計のキャッシュと、ID の組 → ETag"""
+
+    def __init__(
+        self,
+        path: Optional[str] = YOUTUBE_STATS_CACHE_PATH,
+        fresh_seconds: float = YOUTUBE_STATS_FRESH_SECONDS,
+        max_entries: int = YOUTUBE_STATS_CACHE_MAX,
+    ):
+        self.path = path
+        self.fresh_seconds = fresh_seconds
+        self.max_entries = max_entries
+        # video_id → [view_count, like_count, comment_count, 取得時刻]
+        self._stats: Dict[str, list] = {}
+        # ID の組のキー → [ETag, 取得時刻]
+        self._etags: Dict[str, list] = {}
+        self._dirty = False
+        self._saved_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self._stats)
+
+    # ===== 統計 =====
+
+    def get(self, video_id: str) -> Optional[Dict[str, int]]:
+        entry = self._stats.get(video_id)
+        if entry is None:
+            return None
+        return {'view_count': entry[0], 'like_count': entry[1], 'comment_count': entry[2]}
+
+    def is_fresh(self, video_id: str, now: Optional[float] = None) -> bool:
+        entry = self._stats.get(video_id)
+        now = now if now is not None else time.time()
+        return entry is not None and now - entry[3] < self.fresh_seconds
+
+    def put(self, video_id: str, stats: Dict[str, int], now: Optional[float] = None):
+        self._stats[video_id] = [
+            stats['view_count'], stats['like_count'], stats['comment_count'],
+            now if now is not None else time.time(),
+        ]
+        self._dirty = True
+
+    def touch(self, video_ids: Iterable[str], now: Optional[float] = None):
+        """304 で変更がなかった動画の取得時刻を進める"""
+        now = now if now is not None else time.time()
+        for video_id in video_ids:
+            entry = self._stats.get(video_id)
+            if entry is not None:
+                entry[3] = now
+                self._dirty = True
+
+    # ===== ETag =====
+
+    def etag_for(self, video_ids: Iterable[str]) -> Optional[str]:
+        """ID の組に対する前回の ETag（組の全動画がキャッシュにある場合のみ）"""
+        video_ids = list(video_ids)
+        if not all(video_id in self._stats for video_id in video_ids):
+            return None
+        entry = self._etags.get(_batch_key(video_ids))
+        return entry[0] if entry else None
+
+    def set_etag(self, video_ids: Iterable[str], etag: Optional[str], now: Optional[float] = None):
+        if not etag:
+            return
+        self._etags[_batch_key(video_ids)] = [etag, now if now is not None else time.time()]
+        self._dirty = True
+
+    # ===== 永続化 =====
+
+    def _evict(self):
+        if len(self._stats) > self.max_entries:
+            oldest = sorted(self._stats, key=lambda video_id: self._stats[video_id][3])
+            for video_id in oldest[:len(self._stats) - self.max_entries]:
+                del self._stats[video_id]
+        # ETag は統計の件数を上限に古いものから捨てる（ID の組は動画数より少ない）
+        if len(self._etags) > self.max_entries:
+            oldest = sorted(self._etags, key=lambda key: self._etags[key][1])
+            for key in oldest[:len(self._etags) - self.max_entries]:
+                del self._etags[key]
+
+    def save(self):
+        """更新があればアトミックに保存"""
+        if not self.path or not self._dirty:
+            return
+        self._evict()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.youtube-stats-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'stats': self._stats, 'etags': self._etags}, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._dirty = False
+        self._saved_at = time.time()
+
+    def save_if_due(self):
+        if self._dirty and time.time() - self._saved_at >= _SAVE_INTERVAL_SECONDS:
+            self.save()
+
+    @classmethod
+    def load(cls, path: Optional[str] = YOUTUBE_STATS_CACHE_PATH) -> 'VideoStatsCache':
+        """保存済みのキャッシュを読み込む（ファイルがなければ空）"""
+        cache = cls(path)
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+                cache._stats = data.get('stats', {})
+                cache._etags = data.get('etags', {})
+            except Exception as e:
+                print(f'⚠️ 統計キャッシュの読み込みに失敗: {e}')
+        return cache
+
+
+_default_cache: Optional[VideoStatsCache] = None
+
+
+def _save_on_exit():
+    if _default_cache is not None:
+        try:
+            _default_cache.save()
+        except Exception as e:
+            print(f'⚠️ 統計キャッシュの保存に失敗: {e}')
+
+
+def get_stats_cache() -> VideoStatsCache:
+    """共有キャッシュを返す（初回に読み込み、プロセス終了時に保存）"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = VideoStatsCache.load()
+        atexit.register(_save_on_exit)
+    return _default_cache
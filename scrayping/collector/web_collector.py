@@ -5,14 +5,17 @@ X(Twitter), Redditの投稿をWeb検索経由で取得
 X/Twitter APIが不要で、Serper APIのみで動作
 """
 
-import re
-from typing import List, Dict, Optional
-from dataclasses import dataclass, asdict
-import requests
-from config import SERPER_API_KEY, GOOGLE_SEARCH_API_KEY, GOOGLE_SEARCH_ENGINE_ID
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from dataclasses import dataclass, field, replace
+import http_client
+from config import SERPER_API_KEY, SERPER_API_BASE, GOOGLE_SEARCH_API_KEY, GOOGLE_SEARCH_ENGINE_ID, SEARCH_MAX_PAGES
+from instrumentation import timed, stage, record_error
+from pagination import paginate
+from records import as_row, to_dict
+from social_urls import SocialUrl, classify_url
 
 
-@dataclass
+@dataclass(slots=True)
 class SocialPost:
     """ソーシャルメディア投稿"""
     platform: str  # twitter, reddit, etc.
@@ -21,29 +24,40 @@ class SocialPost:
     snippet: str
     author: str = ''
     post_type: str = ''  # tweet, reddit_post, etc.
+    # 重複判定キー（social_urls.classify_url の key、未設定なら url で判定）
+    key: str = ''
+    # 複数クエリの順位を統合したスコア（Reciprocal Rank Fusion）と一致したクエリ数
+    rank_score: float = 0.0
+    query_hits: int = 0
 
     def to_dict(self):
-        return asdict(self)
+        return to_dict(self)
+
+    def as_row(self) -> tuple:
+        return as_row(self)
 
 
-def search_serper(query: str, num_results: int = 10) -> List[Dict]:
-    """Serper APIで検索"""
+@timed('serper', provider='serper', quota_cost=1)
+def search_serper(query: str, num_results: int = 10, page: int = 1) -> List[Dict]:
+    """Serper APIで検索（page は1始まり）"""
     if not SERPER_API_KEY:
         print('⚠️ SERPER_API_KEYが設定されていません')
         return []
 
     try:
-        response = requests.post(
-            'https://google.serper.dev/search',
+        response = http_client.post(
+            'serper',
+            f'{SERPER_API_BASE}/search',
             headers={
                 'Content-Type': 'application/json',
                 'X-API-KEY': SERPER_API_KEY,
             },
-            json={
+            json_body={
                 'q': query,
                 'num': num_results,
                 'gl': 'jp',
                 'hl': 'ja',
+                **({'page': page} if page > 1 else {}),
             },
             timeout=30
         )
@@ -51,40 +65,81 @@ def search_serper(query: str, num_results: int = 10) -> List[Dict]:
         data = response.json()
         return data.get('organic', [])
     except Exception as e:
+        record_error('serper')
         print(f'❌ Serper検索エラー: {e}')
         return []
 
 
+def iter_serper(query: str, page_size: int = 10, max_pages: int = SEARCH_MAX_PAGES) -> Iterator[Dict]:
+    """Serperの検索結果を遅延取得（消費された分だけページを取得）"""
+    def fetch_page(page):
+        results = search_serper(query, page_size, page)
+        # 要求件数に満たなければ最終ページ
+        return results, page + 1 if len(results) >= page_size else None
+
+    return paginate(fetch_page, 1, max_pages)
+
+
 def extract_twitter_username(url: str) -> str:
     """URLからTwitterユーザー名を抽出"""
-    patterns = [
-        r'(?:twitter\.com|x\.com)/([^/]+)/status',
-        r'(?:twitter\.com|x\.com)/([^/]+)',
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            username = match.group(1)
-            if username not in ['search', 'hashtag', 'i', 'intent']:
-                return username
-    return ''
+    info = classify_url(url)
+    return info.author if info.platform == 'twitter' else ''
 
 
 def extract_reddit_info(url: str) -> Dict:
     """URLからReddit情報を抽出"""
-    info = {'subreddit': '', 'type': 'post'}
-    
-    # r/subreddit/comments/... パターン
-    match = re.search(r'reddit\.com/r/([^/]+)', url)
-    if match:
-        info['subreddit'] = match.group(1)
-    
-    if '/comments/' in url:
-        info['type'] = 'post'
-    elif '/r/' in url:
-        info['type'] = 'subreddit'
-    
-    return info
+    info = classify_url(url)
+    if info.platform != 'reddit':
+        return {'subreddit': '', 'type': 'post'}
+    return {
+        'subreddit': info.author[len('r/'):],
+        'type': 'subreddit' if info.post_type == 'subreddit' else 'post',
+    }
+
+
+def post_from_result(result: Dict, info: SocialUrl) -> SocialPost:
+    """分類済みの検索結果1件から投稿を作る"""
+    return SocialPost(
+        platform=info.platform,
+        title=result.get('title', ''),
+        url=info.canonical_url,
+        snippet=result.get('snippet', ''),
+        author=f'@{info.author}' if info.platform == 'twitter' and info.author else info.author,
+        post_type=info.post_type,
+        key=info.key,
+    )
+
+
+def parse_social_results(results: Iterable[Dict], platform: str, max_results: int = 10) -> List[SocialPost]:
+    """
+    検索結果から指定プラットフォームの投稿ページを抽出
+
+    results にはリストのほか iter_serper の遅延イテレータも渡せる
+    （max_results 件に達した時点で消費をやめるため、次のページは取得されない）
+
+    URLは1回だけ解析し、正規URL（twitter.com / x.com・クエリ文字列などの違いを吸収）で重複を除く
+    """
+    posts = []
+    seen_keys = set()
+
+    for result in results:
+        info = classify_url(result.get('link', ''))
+
+        # 対象プラットフォームの投稿ページのみ
+        if info.platform != platform or not info.is_post:
+            continue
+
+        # 重複チェック
+        if info.key in seen_keys:
+            continue
+        seen_keys.add(info.key)
+
+        posts.append(post_from_result(result, info))
+
+        if len(posts) >= max_results:
+            break
+
+    return posts
 
 
 def search_twitter_posts(
@@ -99,44 +154,12 @@ def search_twitter_posts(
     # site:twitter.com OR site:x.com で検索
     search_query = f'{query} (site:twitter.com OR site:x.com)'
     
-    results = search_serper(search_query, max_results * 2)
-    
-    posts = []
-    seen_urls = set()
-    
-    for result in results:
-        url = result.get('link', '')
-        
-        # Twitter/X のURLのみ
-        if not ('twitter.com' in url or 'x.com' in url):
-            continue
-        
-        # 重複チェック
-        if url in seen_urls:
-            continue
-        seen_urls.add(url)
-        
-        # ステータスページ（実際のツイート）のみ
-        if '/status/' not in url:
-            continue
-        
-        username = extract_twitter_username(url)
-        title = result.get('title', '')
-        snippet = result.get('snippet', '')
-        
-        posts.append(SocialPost(
-            platform='twitter',
-            title=title,
-            url=url,
-            snippet=snippet,
-            author=f'@{username}' if username else '',
-            post_type='tweet',
-        ))
-        
-        if len(posts) >= max_results:
-            break
-    
-    return posts
+    return parse_twitter_results(iter_serper(search_query, max_results), max_results)
+
+
+def parse_twitter_results(results: List[Dict], max_results: int = 10) -> List[SocialPost]:
+    """検索結果からX(Twitter)の投稿を抽出"""
+    return parse_social_results(results, 'twitter', max_results)
 
 
 def search_reddit_posts_via_web(
@@ -155,54 +178,18 @@ def search_reddit_posts_via_web(
     else:
         search_query = f'{query} site:reddit.com'
     
-    results = search_serper(search_query, max_results * 2)
-    
-    posts = []
-    seen_urls = set()
-    
-    for result in results:
-        url = result.get('link', '')
-        
-        # Reddit のURLのみ
-        if 'reddit.com' not in url:
-            continue
-        
-        # 重複チェック
-        if url in seen_urls:
-            continue
-        seen_urls.add(url)
-        
-        # 実際の投稿ページのみ
-        if '/comments/' not in url:
-            continue
-        
-        reddit_info = extract_reddit_info(url)
-        title = result.get('title', '')
-        snippet = result.get('snippet', '')
-        
-        posts.append(SocialPost(
-            platform='reddit',
-            title=title,
-            url=url,
-            snippet=snippet,
-            author=f'r/{reddit_info["subreddit"]}' if reddit_info['subreddit'] else '',
-            post_type='reddit_post',
-        ))
-        
-        if len(posts) >= max_results:
-            break
-    
-    return posts
+    return parse_reddit_results(iter_serper(search_query, max_results), max_results)
+
+
+def parse_reddit_results(results: List[Dict], max_results: int = 10) -> List[SocialPost]:
+    """検索結果からRedditの投稿を抽出"""
+    return parse_social_results(results, 'reddit', max_results)
 
 
 def extract_note_username(url: str) -> str:
     """URLからnote.comのユーザー名を抽出"""
-    match = re.search(r'note\.com/([^/]+)', url)
-    if match:
-        username = match.group(1)
-        if username not in ['search', 'hashtag', 'explore', 'ranking', 'topics', 'categories']:
-            return username
-    return ''
+    info = classify_url(url)
+    return info.author if info.platform == 'note' else ''
 
 
 def search_note_posts(
@@ -215,42 +202,101 @@ def search_note_posts(
     """
     search_query = f'{query} site:note.com'
 
-    results = search_serper(search_query, max_results * 2)
+    return parse_note_results(iter_serper(search_query, max_results), max_results)
 
-    posts = []
-    seen_urls = set()
 
-    for result in results:
-        url = result.get('link', '')
+def parse_note_results(results: List[Dict], max_results: int = 10) -> List[SocialPost]:
+    """検索結果からnote.comの記事を抽出"""
+    return parse_social_results(results, 'note', max_results)
 
-        if 'note.com' not in url:
-            continue
 
-        if url in seen_urls:
-            continue
-        seen_urls.add(url)
+def merge_unique_posts(
+    batches: List[List[SocialPost]],
+    max_results: Optional[int] = None,
+) -> List[SocialPost]:
+    """複数クエリの結果を正規URLのキーで重複除去して結合（先に出現した順を維持）"""
+    merged = []
+    seen = set()
+    for posts in batches:
+        for post in posts:
+            key = post.key or post.url
+            if key not in seen:
+                seen.add(key)
+                merged.append(post)
+    return merged[:max_results] if max_results is not None else merged
 
-        # 記事ページのみ（/n/ を含む）
-        if '/n/' not in url:
-            continue
 
-        username = extract_note_username(url)
-        title = result.get('title', '')
-        snippet = result.get('snippet', '')
+# Reciprocal Rank Fusion の定数（大きいほど下位の順位の差が小さくなる）
+RRF_K = 60
 
-        posts.append(SocialPost(
-            platform='note',
-            title=title,
-            url=url,
-            snippet=snippet,
-            author=username,
-            post_type='note_article',
-        ))
 
-        if len(posts) >= max_results:
-            break
+@dataclass
+class RunRegistry:
+    """
+    1回の収集実行で共有する重複除去レジストリ（正規URLのキー単位）
 
-    return posts
+    同じ投稿が日本語・英語の両クエリや、シューズ別・全般の両検索で見つかっても
+    投稿オブジェクトは1つにまとめ、DBへの書き込みも1回だけにする
+    """
+    posts: Dict[str, SocialPost] = field(default_factory=dict)
+    written: Set[Tuple[str, str]] = field(default_factory=set)
+    duplicates: int = 0
+
+    def fuse(self, batches: List[List[SocialPost]], max_results: Optional[int] = None) -> List[SocialPost]:
+        """
+        クエリごとの結果（順位順）を統合し、スコアの高い順に返す
+
+        スコアは各クエリでの順位の逆数和 1 / (RRF_K + 順位)。
+        複数のクエリで上位に出た投稿ほど上に来る
+        """
+        scores: Dict[str, float] = {}
+        hits: Dict[str, int] = {}
+        order: List[str] = []
+        for posts in batches:
+            for rank, post in enumerate(posts, 1):
+                key = post.key or post.url
+                if key not in scores:
+                    scores[key] = 0.0
+                    hits[key] = 0
+                    order.append(key)
+                    if key in self.posts:
+                        self.duplicates += 1
+                    else:
+                        self.posts[key] = post
+                else:
+                    self.duplicates += 1
+                scores[key] += 1.0 / (RRF_K + rank)
+                hits[key] += 1
+
+        # 共有の投稿は書き換えず、この統合でのスコアを持つコピーを返す
+        # （別のシューズの統合で、返し済みのリストのスコアが変わらないように）
+        fused = [
+            replace(self.posts[key], rank_score=round(scores[key], 6), query_hits=hits[key])
+            for key in sorted(order, key=lambda k: -scores[k])
+        ]
+        return fused[:max_results] if max_results is not None else fused
+
+    def claim_write(self, shoe_id: str, post: SocialPost) -> bool:
+        """このシューズへの書き込みが実行内で初めてなら True（以降は False）"""
+        key = (shoe_id, post.key or post.url)
+        if key in self.written:
+            return False
+        self.written.add(key)
+        return True
+
+
+_run_registry = RunRegistry()
+
+
+def start_run() -> RunRegistry:
+    """収集実行の開始時に呼び、レジストリを空にする"""
+    global _run_registry
+    _run_registry = RunRegistry()
+    return _run_registry
+
+
+def get_run_registry() -> RunRegistry:
+    return _run_registry
 
 
 def search_shoe_reviews_social(
@@ -261,70 +307,33 @@ def search_shoe_reviews_social(
 ) -> Dict[str, List[SocialPost]]:
     """
     シューズのレビューをソーシャルメディアから検索
+
+    クエリは query_planner でプラットフォームをまとめて発行し、結果をドメインで振り分ける
     
     Args:
         brand: ブランド名
         model_name: モデル名
         max_results: 各プラットフォームの最大結果数
-        platforms: 検索対象 ['twitter', 'reddit']
+        platforms: 検索対象 ['twitter', 'reddit', 'note']
     
     Returns:
         プラットフォームごとの投稿リスト
     """
+    from query_planner import run_social_plan
+
     if platforms is None:
         platforms = ['twitter', 'reddit', 'note']
-    
+
+    print('🔍 ソーシャル検索中...')
+    batches, report = run_social_plan(brand, model_name, platforms, max_results)
+
     results = {}
-    
-    queries = [
-        f'{brand} {model_name} レビュー',
-        f'{brand} {model_name} review',
-    ]
-    
-    if 'twitter' in platforms:
-        print('🐦 X(Twitter) 検索中...')
-        twitter_posts = []
-        seen = set()
-        for query in queries:
-            posts = search_twitter_posts(query, max_results=max_results)
-            for post in posts:
-                if post.url not in seen:
-                    seen.add(post.url)
-                    twitter_posts.append(post)
-        results['twitter'] = twitter_posts[:max_results]
-        print(f'   {len(results["twitter"])} 件取得')
-    
-    if 'reddit' in platforms:
-        print('📝 Reddit 検索中...')
-        running_subreddits = ['running', 'RunningShoeGeeks', 'AdvancedRunning']
-        reddit_posts = []
-        seen = set()
-        for query in queries:
-            posts = search_reddit_posts_via_web(
-                query, 
-                max_results=max_results,
-                subreddits=running_subreddits
-            )
-            for post in posts:
-                if post.url not in seen:
-                    seen.add(post.url)
-                    reddit_posts.append(post)
-        results['reddit'] = reddit_posts[:max_results]
-        print(f'   {len(results["reddit"])} 件取得')
-    
-    if 'note' in platforms:
-        print('📗 note.com 検索中...')
-        note_posts = []
-        seen = set()
-        for query in queries:
-            posts = search_note_posts(query, max_results=max_results)
-            for post in posts:
-                if post.url not in seen:
-                    seen.add(post.url)
-                    note_posts.append(post)
-        results['note'] = note_posts[:max_results]
-        print(f'   {len(results["note"])} 件取得')
+    with stage('dedup'):
+        for platform in platforms:
+            results[platform] = _run_registry.fuse(batches[platform], max_results)
 
+    print(f'   {" / ".join(f"{p}: {len(results[p])} 件" for p in platforms)}')
+    print(f'   {report.summary()}')
     return results
 
 
@@ -338,40 +347,21 @@ def search_general_running_social(max_results: int = 20) -> Dict[str, List[Socia
         'running shoes review',
     ]
     
-    all_twitter = []
-    all_reddit = []
-    all_note = []
-    seen_twitter = set()
-    seen_reddit = set()
-    seen_note = set()
+    twitter_batches = []
+    reddit_batches = []
+    note_batches = []
     
     for query in queries:
-        # Twitter
-        posts = search_twitter_posts(query, max_results=10)
-        for post in posts:
-            if post.url not in seen_twitter:
-                seen_twitter.add(post.url)
-                all_twitter.append(post)
-        
-        # Reddit
-        posts = search_reddit_posts_via_web(query, max_results=10)
-        for post in posts:
-            if post.url not in seen_reddit:
-                seen_reddit.add(post.url)
-                all_reddit.append(post)
-        
-        # note.com
-        posts = search_note_posts(query, max_results=10)
-        for post in posts:
-            if post.url not in seen_note:
-                seen_note.add(post.url)
-                all_note.append(post)
+        twitter_batches.append(search_twitter_posts(query, max_results=10))
+        reddit_batches.append(search_reddit_posts_via_web(query, max_results=10))
+        note_batches.append(search_note_posts(query, max_results=10))
     
-    return {
-        'twitter': all_twitter[:max_results],
-        'reddit': all_reddit[:max_results],
-        'note': all_note[:max_results],
-    }
+    with stage('dedup'):
+        return {
+            'twitter': _run_registry.fuse(twitter_batches, max_results),
+            'reddit': _run_registry.fuse(reddit_batches, max_results),
+            'note': _run_registry.fuse(note_batches, max_results),
+        }
 
 
 if __name__ == '__main__':
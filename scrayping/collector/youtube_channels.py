@@ -0,0 +1,254 @@
+"""
+YouTube レビューチャンネルの巡回
+既知のレビューチャンネルのアップロード再生リストを playlistItems.list（1ページ1ユニット）で
+前回以降の分だけ取得し、動画タイトルからカタログのシューズに照合する
+
+search.list は1回100ユニットかかり、シューズごとに3回呼ぶと1日の上限（10,000）で約30足しか
+処理できない。巡回ではチャンネル数 × 新着ページ数のユニットで済むため、search.list は
+新しいチャンネルの発見（collect / collect-all の youtube ソース）に回す
+
+- 登録簿は YOUTUBE_CHANNELS_PATH（JSON）。YOUTUBE_REVIEWER_CHANNELS の ID は初回に登録される
+- search.list の結果でレビュー動画が YOUTUBE_CHANNEL_DISCOVERY_HITS 回見つかったチャンネルは
+  自動で巡回対象になる
+- 新着は前回見た最新の動画（ID・公開日時）に達した時点で打ち切る。初回は
+  YOUTUBE_CHANNEL_FIRST_POLL_PAGES ページ分だけ遡る
+- 既読位置は新着をDBに書き込んだ後に保存する（書き込みに失敗したら次回に取り直す）
+
+使用方法:
+    python main.py channels add UCxxxxxxxxxxxxxxxxxxxxxx
+    python main.py channels list
+    python main.py channels poll
+    python main.py collect-all --sources channels
+"""
+
+import json
+import os
+import tempfile
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import (
+    YOUTUBE_CHANNELS_PATH,
+    YOUTUBE_REVIEWER_CHANNELS,
+    YOUTUBE_CHANNEL_DISCOVERY_HITS,
+    YOUTUBE_CHANNEL_FIRST_POLL_PAGES,
+    SEARCH_MAX_PAGES,
+)
+from pagination import paginate
+from shoe_finder import extract_many
+from shoe_identity import build_shoe_index
+from shoe_matcher import build_matcher
+from youtube_collector import YouTubeVideo, YOUTUBE_PAGE_SIZE, list_playlist_page, uploads_playlist_id
+
+# タイトルで照合できなかった動画は説明文の先頭だけを見る（末尾の関連動画リンクで誤照合しないため）
+_DESCRIPTION_MATCH_CHARS = 200
+
+
+@dataclass
+class ReviewerChannel:
+    """巡回対象（または候補）のチャンネル"""
+    channel_id: str
+    name: str = ''
+    # 巡回対象か（手動登録・シードは True、検索で見つかった候補は発見回数で True になる）
+    active: bool = False
+    # search.list の結果でレビュー動画が見つかった回数
+    review_hits: int = 0
+    # 前回までに取得した最新の動画
+    last_video_id: str = ''
+    last_published_at: str = ''
+    polled_at: str = ''
+
+
+@dataclass
+class PollReport:
+    """巡回の実行結果"""
+    channels: int = 0
+    # playlistItems.list の呼び出し回数（= 消費ユニット）
+    requests: int = 0
+    new_videos: int = 0
+    matched: int = 0
+    per_channel: Dict[str, int] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        return (
+            f'チャンネル {self.channels} 件を巡回: 新着 {self.new_videos} 本, '
+            f'シューズに照合 {self.matched} 件（{self.requests} ユニット）'
+        )
+
+
+class ChannelRegistry:
+    """レビューチャンネルの登録簿"""
+
+    def __init__(self, channels: Optional[Dict[str, ReviewerChannel]] = None, path: str = YOUTUBE_CHANNELS_PATH):
+        self.channels: Dict[str, ReviewerChannel] = channels or {}
+        self.path = path
+
+    @classmethod
+    def load(cls, path: str = YOUTUBE_CHANNELS_PATH) -> 'ChannelRegistry':
+        """保存済みの登録簿を読み込む（設定のシードチャンネルは未登録なら追加）"""
+        channels = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    for entry in json.load(f).get('channels', []):
+                        channels[entry['channel_id']] = ReviewerChannel(**entry)
+            except Exception as e:
+                print(f'⚠️ チャンネル登録簿の読み込みに失敗: {e}')
+        registry = cls(channels, path)
+        for channel_id in YOUTUBE_REVIEWER_CHANNELS:
+            if channel_id not in registry.channels:
+                registry.add(channel_id)
+        return registry
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.youtube-channels-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'channels': [asdict(c) for c in self.channels.values()]}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def add(self, channel_id: str, name: str = '') -> ReviewerChannel:
+        """巡回対象として登録（候補として登録済みなら有効にする）"""
+        channel = self.channels.setdefault(channel_id, ReviewerChannel(channel_id, name))
+        channel.active = True
+        if name:
+            channel.name = name
+        return channel
+
+    def remove(self, channel_id: str) -> bool:
+        return self.channels.pop(channel_id, None) is not None
+
+    def active_channels(self) -> List[ReviewerChannel]:
+        return [c for c in self.channels.values() if c.active]
+
+    def cursors(self) -> Dict[str, Tuple[str, str]]:
+        """各チャンネルの既読位置（巡回前に控えておき、登録に失敗したら restore_cursors で戻す）"""
+        return {c.channel_id: (c.last_video_id, c.last_published_at) for c in self.channels.values()}
+
+    def restore_cursors(self, cursors: Dict[str, Tuple[str, str]]):
+        for channel_id, (last_video_id, last_published_at) in cursors.items():
+            channel = self.channels.get(channel_id)
+            if channel is not None:
+                channel.last_video_id = last_video_id
+                channel.last_published_at = last_published_at
+
+    def record_search_hits(self, videos: Iterable[YouTubeVideo]) -> List[ReviewerChannel]:
+        """
+        search.list で見つかったレビュー動画のチャンネルを数え、発見回数に達したものを巡回対象にする
+        （1回の検索結果に同じチャンネルの動画が複数あっても1回と数える）
+
+        Returns:
+            新たに巡回対象になったチャンネル
+        """
+        names: Dict[str, str] = {}
+        for video in videos:
+            if video.channel_id:
+                names.setdefault(video.channel_id, video.channel_name)
+
+        activated = []
+        for channel_id, name in names.items():
+            channel = self.channels.setdefault(channel_id, ReviewerChannel(channel_id, name))
+            channel.review_hits += 1
+            if not channel.active and channel.review_hits >= YOUTUBE_CHANNEL_DISCOVERY_HITS:
+                channel.active = True
+                activated.append(channel)
+        return activated
+
+
+# ===== 巡回 =====
+
+def poll_channel(channel: ReviewerChannel, report: PollReport, max_pages: int = SEARCH_MAX_PAGES) -> List[YouTubeVideo]:
+    """前回以降にアップロードされた動画を新しい順に返し、チャンネルの既読位置を進める"""
+    playlist_id = uploads_playlist_id(channel.channel_id)
+    first_poll = not channel.last_published_at
+
+    def fetch_page(token):
+        report.requests += 1
+        return list_playlist_page(playlist_id, YOUTUBE_PAGE_SIZE, token)
+
+    new_videos = []
+    pages = YOUTUBE_CHANNEL_FIRST_POLL_PAGES if first_poll else max_pages
+    # アップロード再生リストは新しい順。既読の動画に達したら次のページは取得しない
+    for video in paginate(fetch_page, None, pages):
+        if video.video_id == channel.last_video_id:
+            break
+        if not first_poll and video.published_at <= channel.last_published_at:
+            break
+        new_videos.append(video)
+
+    if new_videos:
+        newest = max(new_videos, key=lambda v: v.published_at)
+        channel.last_video_id = newest.video_id
+        channel.last_published_at = newest.published_at
+        channel.name = channel.name or newest.channel_name
+    channel.polled_at = datetime.now().isoformat(timespec='seconds')
+    return new_videos
+
+
+def match_videos_to_shoes(videos: List[YouTubeVideo], shoes: List[Dict]) -> List[Tuple[Dict, YouTubeVideo]]:
+    """
+    動画をカタログのシューズに照合（APIは使わない）
+
+    タイトルから抽出したシューズ名を正規キーでカタログに照合し、
+    タイトルで見つからなければ説明文の先頭で照合する
+    """
+    if not videos or not shoes:
+        return []
+    matcher = build_matcher((shoe['brand'], shoe['modelName']) for shoe in shoes)
+    index = build_shoe_index(shoes)
+    shoes_by_id = {shoe['id']: shoe for shoe in shoes}
+
+    def resolve(found) -> List[str]:
+        ids = []
+        for info in found:
+            shoe_id = index.resolve(info.brand, info.model_name)
+            if shoe_id and shoe_id not in ids:
+                ids.append(shoe_id)
+        return ids
+
+    title_matches = extract_many([v.title for v in videos], 'youtube_channel', matcher=matcher)
+    unmatched = [i for i, found in enumerate(title_matches) if not resolve(found)]
+    description_matches = dict(zip(unmatched, extract_many(
+        [videos[i].description[:_DESCRIPTION_MATCH_CHARS] for i in unmatched], 'youtube_channel', matcher=matcher,
+    )))
+
+    matches = []
+    for i, video in enumerate(videos):
+        shoe_ids = resolve(title_matches[i]) or resolve(description_matches.get(i, []))
+        matches.extend((shoes_by_id[shoe_id], video) for shoe_id in shoe_ids)
+    return matches
+
+
+def poll_channels(
+    registry: ChannelRegistry,
+    shoes: List[Dict],
+    max_pages: int = SEARCH_MAX_PAGES,
+) -> Tuple[List[Tuple[Dict, YouTubeVideo]], PollReport]:
+    """
+    巡回対象の全チャンネルの新着を取得してシューズに照合する
+
+    既読位置は登録簿のオブジェクト上で進めるだけで保存しない。呼び出し側が動画を書き込んでから
+    registry.save() する（書き込みに失敗した動画を次回の巡回で取り直せるように）
+
+    Returns:
+        ([(シューズ, 動画)], 実行レポート)
+    """
+    report = PollReport()
+    new_videos: List[YouTubeVideo] = []
+    for channel in registry.active_channels():
+        videos = poll_channel(channel, report, max_pages)
+        report.channels += 1
+        report.per_channel[channel.name or channel.channel_id] = len(videos)
+        new_videos.extend(videos)
+
+    report.new_videos = len(new_videos)
+    matches = match_videos_to_shoes(new_videos, shoes)
+    report.matched = len(matches)
+    return matches, report
@@ -4,14 +4,23 @@ YouTube Data API v3を使用してレビュー動画を検索
 """
 
 import json
-from typing import List, Dict, Optional
-from dataclasses import dataclass, asdict
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+from dataclasses import dataclass
 from datetime import datetime
 import requests
-from config import YOUTUBE_API_KEY
+import http_client
+from config import YOUTUBE_API_KEY, YOUTUBE_API_BASE, SEARCH_MAX_PAGES
+from instrumentation import timed, stage, record_error, record_cache, increment
+from pagination import paginate, take
+from records import as_row, to_dict
+from video_stats_cache import get_stats_cache
 
+# search.list の1ページの最大件数
+YOUTUBE_PAGE_SIZE = 50
 
-@dataclass
+
+@dataclass(slots=True)
 class YouTubeVideo:
     video_id: str
     title: str
@@ -29,36 +38,38 @@ class YouTubeVideo:
         return f'https://www.youtube.com/watch?v={self.video_id}'
 
     def to_dict(self):
-        d = asdict(self)
+        d = to_dict(self)
         d['url'] = self.url
         return d
 
+    def as_row(self) -> tuple:
+        return as_row(self)
 
-def search_youtube_videos(
+
+@timed('youtube.search', provider='youtube', quota_cost=100)
+def search_youtube_page(
     query: str,
-    max_results: int = 10,
-    order: str = 'relevance',  # relevance, date, rating, viewCount
+    page_size: int = 50,
+    order: str = 'relevance',
     published_after: Optional[str] = None,
-) -> List[YouTubeVideo]:
+    page_token: Optional[str] = None,
+) -> Tuple[List[YouTubeVideo], Optional[str]]:
     """
-    YouTube動画を検索
-    
-    Args:
-        query: 検索クエリ
-        max_results: 最大結果数
-        order: 並び順
-        published_after: この日付以降（ISO 8601形式）
+    search.list を1ページ分呼び出す（統計情報は含まない）
+
+    Returns:
+        (動画のリスト, 次のページのトークン or None)
     """
     if not YOUTUBE_API_KEY:
         print('⚠️ YOUTUBE_API_KEYが設定されていません')
-        return []
+        return [], None
 
     try:
         params = {
             'part': 'snippet',
             'q': query,
             'type': 'video',
-            'maxResults': min(max_results, 50),
+            'maxResults': min(page_size, YOUTUBE_PAGE_SIZE),
             'order': order,
             'key': YOUTUBE_API_KEY,
             'regionCode': 'JP',
@@ -67,9 +78,12 @@ def search_youtube_videos(
 
         if published_after:
             params['publishedAfter'] = published_after
+        if page_token:
+            params['pageToken'] = page_token
 
-        response = requests.get(
-            'https://www.googleapis.com/youtube/v3/search',
+        response = http_client.get(
+            'youtube.search',
+            f'{YOUTUBE_API_BASE}/search',
             params=params,
             timeout=30
         )
@@ -90,62 +104,225 @@ def search_youtube_videos(
             )
             videos.append(video)
 
-        # 追加の統計情報を取得（オプション）
-        if videos:
-            videos = enrich_video_stats(videos)
-
-        return videos
+        return videos, data.get('nextPageToken')
 
     except requests.exceptions.HTTPError as e:
+        record_error('youtube.search')
         error_data = e.response.json() if e.response else {}
         error_message = error_data.get('error', {}).get('message', str(e))
         print(f'❌ YouTube API HTTPエラー: {error_message}')
-        return []
+        return [], None
     except Exception as e:
+        record_error('youtube.search')
         print(f'❌ YouTube検索エラー: {e}')
-        return []
+        return [], None
+
+
+def iter_youtube_videos(
+    query: str,
+    page_size: int = YOUTUBE_PAGE_SIZE,
+    order: str = 'relevance',
+    published_after: Optional[str] = None,
+    max_pages: int = SEARCH_MAX_PAGES,
+) -> Iterator[YouTubeVideo]:
+    """
+    検索結果の動画を遅延取得（消費された分だけページを取得、1ページ100ユニット）
+
+    search.list は maxResults に関係なく1回100ユニットのため、必要な件数が少なくても
+    page_size は既定の50件のままにする（重複で足りない分を同じページから取れる）
+    """
+    def fetch_page(token):
+        return search_youtube_page(query, page_size, order, published_after, token)
+
+    return paginate(fetch_page, None, max_pages)
+
+
+def search_youtube_videos(
+    query: str,
+    max_results: int = 10,
+    order: str = 'relevance',  # relevance, date, rating, viewCount
+    published_after: Optional[str] = None,
+) -> List[YouTubeVideo]:
+    """
+    YouTube動画を検索
+    
+    Args:
+        query: 検索クエリ
+        max_results: 最大結果数（50件を超える場合はページ送りで取得）
+        order: 並び順
+        published_after: この日付以降（ISO 8601形式）
+    """
+    videos = take(
+        iter_youtube_videos(query, order=order, published_after=published_after),
+        max_results,
+        key=lambda v: v.video_id,
+    )
+
+    # 追加の統計情報を取得
+    return enrich_video_stats(videos)
+
+
+@timed('youtube.enrich', provider='youtube', quota_cost=1)
+def fetch_video_stats(video_ids: List[str], etag: Optional[str] = None) -> Tuple[Optional[Dict[str, Dict[str, int]]], Optional[str]]:
+    """
+    videos.list で統計情報を取得（1回50件まで）
+
+    Args:
+        etag: 前回のレスポンスの ETag（指定すると条件付きリクエスト）
+
+    Returns:
+        ({video_id: 統計}, ETag)。304（前回から変更なし）なら (None, ETag)
+    """
+    response = http_client.get(
+        'youtube.enrich',
+        f'{YOUTUBE_API_BASE}/videos',
+        params={
+            'part': 'statistics',
+            'id': ','.join(video_ids),
+            'key': YOUTUBE_API_KEY,
+        },
+        headers={'If-None-Match': etag} if etag else None,
+        timeout=30
+    )
+    if response.status_code == 304:
+        return None, etag
+    response.raise_for_status()
+    data = response.json()
+
+    stats_map = {}
+    for item in data.get('items', []):
+        stats = item.get('statistics', {})
+        stats_map[item['id']] = {
+            'view_count': int(stats.get('viewCount', 0)),
+            'like_count': int(stats.get('likeCount', 0)),
+            'comment_count': int(stats.get('commentCount', 0)),
+        }
+    return stats_map, response.headers.get('ETag') or data.get('etag')
 
 
 def enrich_video_stats(videos: List[YouTubeVideo]) -> List[YouTubeVideo]:
-    """動画の統計情報を追加取得"""
-    if not YOUTUBE_API_KEY or not videos:
+    """
+    動画の統計情報を追加取得
+
+    統計はローカルキャッシュ（video_stats_cache）を使い、取得から
+    YOUTUBE_STATS_FRESH_SECONDS 以内の動画はリクエストしない。期限切れの動画は
+    ETag による条件付きリクエストで取得し、304 ならキャッシュの値を使う
+    """
+    if not videos:
         return videos
 
+    cache = get_stats_cache()
+    now = time.time()
+    stale_ids = sorted({v.video_id for v in videos if not cache.is_fresh(v.video_id, now)})
+    for video in videos:
+        record_cache('youtube_stats', video.video_id not in stale_ids)
+
+    if stale_ids and YOUTUBE_API_KEY:
+        try:
+            for i in range(0, len(stale_ids), YOUTUBE_PAGE_SIZE):
+                batch = stale_ids[i:i + YOUTUBE_PAGE_SIZE]
+                stats_map, etag = fetch_video_stats(batch, cache.etag_for(batch))
+                if stats_map is None:
+                    increment('youtube_stats_not_modified_total', len(batch))
+                    cache.touch(batch, now)
+                    continue
+                for video_id, stats in stats_map.items():
+                    cache.put(video_id, stats, now)
+                cache.set_etag(batch, etag, now)
+        except Exception as e:
+            record_error('youtube.enrich')
+            # 取得できなかった動画もキャッシュに古い値があればそれを使う
+            print(f'⚠️ 統計情報の取得に失敗: {e}')
+
+    for video in videos:
+        stats = cache.get(video.video_id)
+        if stats:
+            video.view_count = stats['view_count']
+            video.like_count = stats['like_count']
+            video.comment_count = stats['comment_count']
+
+    try:
+        cache.save_if_due()
+    except Exception as e:
+        print(f'⚠️ 統計キャッシュの保存に失敗: {e}')
+    return videos
+
+
+# ===== チャンネルのアップロード再生リスト =====
+
+def uploads_playlist_id(channel_id: str) -> str:
+    """
+    チャンネルのアップロード再生リストID（'UC...' → 'UU...'）
+
+    channels.list の contentDetails.relatedPlaylists.uploads と同じ値になるため、API呼び出しは不要
+    """
+    return 'UU' + channel_id[2:] if channel_id.startswith('UC') else channel_id
+
+
+@timed('youtube.playlistItems', provider='youtube', quota_cost=1)
+def list_playlist_page(
+    playlist_id: str,
+    page_size: int = YOUTUBE_PAGE_SIZE,
+    page_token: Optional[str] = None,
+) -> Tuple[List[YouTubeVideo], Optional[str]]:
+    """
+    playlistItems.list を1ページ分呼び出す（1ユニット。search.list の1/100）
+
+    Returns:
+        (動画のリスト（非公開・削除済みを除く）, 次のページのトークン or None)
+    """
+    if not YOUTUBE_API_KEY:
+        print('⚠️ YOUTUBE_API_KEYが設定されていません')
+        return [], None
+
     try:
-        video_ids = ','.join([v.video_id for v in videos])
-        response = requests.get(
-            'https://www.googleapis.com/youtube/v3/videos',
-            params={
-                'part': 'statistics',
-                'id': video_ids,
-                'key': YOUTUBE_API_KEY,
-            },
+        params = {
+            'part': 'snippet,contentDetails',
+            'playlistId': playlist_id,
+            'maxResults': min(page_size, YOUTUBE_PAGE_SIZE),
+            'key': YOUTUBE_API_KEY,
+        }
+        if page_token:
+            params['pageToken'] = page_token
+
+        response = http_client.get(
+            'youtube.playlistItems',
+            f'{YOUTUBE_API_BASE}/playlistItems',
+            params=params,
             timeout=30
         )
         response.raise_for_status()
         data = response.json()
 
-        stats_map = {}
+        videos = []
         for item in data.get('items', []):
-            stats = item.get('statistics', {})
-            stats_map[item['id']] = {
-                'view_count': int(stats.get('viewCount', 0)),
-                'like_count': int(stats.get('likeCount', 0)),
-                'comment_count': int(stats.get('commentCount', 0)),
-            }
-
-        for video in videos:
-            if video.video_id in stats_map:
-                stats = stats_map[video.video_id]
-                video.view_count = stats['view_count']
-                video.like_count = stats['like_count']
-                video.comment_count = stats['comment_count']
+            snippet = item.get('snippet', {})
+            details = item.get('contentDetails', {})
+            # 非公開・削除済みの動画は公開日時がない
+            if not details.get('videoPublishedAt'):
+                continue
+            videos.append(YouTubeVideo(
+                video_id=details.get('videoId') or snippet.get('resourceId', {}).get('videoId', ''),
+                title=snippet.get('title', ''),
+                channel_name=snippet.get('videoOwnerChannelTitle') or snippet.get('channelTitle', ''),
+                channel_id=snippet.get('videoOwnerChannelId') or snippet.get('channelId', ''),
+                description=snippet.get('description', ''),
+                published_at=details['videoPublishedAt'],
+                thumbnail_url=snippet.get('thumbnails', {}).get('high', {}).get('url', ''),
+            ))
 
-        return videos
+        return videos, data.get('nextPageToken')
 
+    except requests.exceptions.HTTPError as e:
+        record_error('youtube.playlistItems')
+        error_data = e.response.json() if e.response else {}
+        error_message = error_data.get('error', {}).get('message', str(e))
+        print(f'❌ YouTube API HTTPエラー: {error_message}')
+        return [], None
     except Exception as e:
-        print(f'⚠️ 統計情報の取得に失敗: {e}')
-        return videos
+        record_error('youtube.playlistItems')
+        print(f'❌ 再生リスト取得エラー: {e}')
+        return [], None
 
 
 def search_shoe_reviews(
@@ -167,12 +344,20 @@ def search_shoe_reviews(
         f'{brand} {model_name} 履いてみた',
     ]
 
+    # 各クエリから新規の動画を割り当て分だけ取り出す（重複で足りなければ次のページを取得）
+    per_query = max(1, max_results // 2)
     for query in queries:
-        videos = search_youtube_videos(query, max_results=max_results // 2)
-        for video in videos:
-            if video.video_id not in seen_ids:
-                seen_ids.add(video.video_id)
-                all_videos.append(video)
+        with stage('dedup'):
+            all_videos.extend(take(
+                iter_youtube_videos(query),
+                per_query,
+                key=lambda v: v.video_id,
+                seen=seen_ids,
+            ))
+
+    # 統計情報は採用した動画だけまとめて取得
+    if all_videos:
+        all_videos = enrich_video_stats(all_videos)
 
     # 視聴回数でソート
     all_videos.sort(key=lambda v: v.view_count or 0, reverse=True)
@@ -195,11 +380,18 @@ def search_running_shoe_reviews(max_results: int = 50) -> List[YouTubeVideo]:
     seen_ids = set()
 
     for query in queries:
-        videos = search_youtube_videos(query, max_results=20)
-        for video in videos:
-            if video.video_id not in seen_ids:
-                seen_ids.add(video.video_id)
-                all_videos.append(video)
+        remaining = max_results - len(all_videos)
+        if remaining <= 0:
+            break
+        all_videos.extend(take(
+            iter_youtube_videos(query),
+            min(20, remaining),
+            key=lambda v: v.video_id,
+            seen=seen_ids,
+        ))
+
+    if all_videos:
+        all_videos = enrich_video_stats(all_videos)
 
     return all_videos[:max_results]
 
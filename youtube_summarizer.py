@@ -7,21 +7,63 @@ YouTube上のレビュー動画を自動で文字起こしし、要約を生成
 
 環境変数:
     GEMINI_API_KEY: Google Gemini APIキー
+    SUMMARIZER_CAPTION_LANGS: 字幕を探す言語（カンマ区切り・優先順、既定 ja,en）
+    SUMMARIZER_VAD_MODE: --vad の判定の厳しさ（webrtcvad の 0〜3、既定 3）
+    SUMMARIZER_VAD_CHUNK_SECONDS: --vad で発話をまとめるチャンクの長さの上限（秒、既定 30）
     
     設定方法:
     1. PowerShellで一時的に設定: $env:GEMINI_API_KEY="your-api-key"
     2. .envファイルに記述: GEMINI_API_KEY=your-api-key
     3. Windowsシステム環境変数として設定
+
+文字起こしは字幕を優先する:
+    1. 動画に字幕（手動 → 自動生成の順）があれば yt-dlp で字幕だけを取得（音声のダウンロードなし）
+    2. 字幕がなければ音声をダウンロードして Whisper で文字起こし。音声は元のストリーム（m4a / webm）を
+       FFmpeg のパイプで 16kHz の PCM に直接デコードしてメモリ上で渡す（mp3 への変換・一時ファイルなし）。
+       読めなかった場合や --audio-format mp3 では従来どおり mp3 に変換して保存する
+    どちらを使ったかは transcription['source']（captions / whisper）に残る
+
+複数の動画を一括で要約する（Whisperモデルはワーカーごとに1回だけ読み込んで使い回す）:
+    python youtube_summarizer.py --batch urls.txt --workers 2
+    python youtube_summarizer.py --from-db --limit 50
+    python youtube_summarizer.py --batch urls.txt --download-workers 3 --summarize-workers 2
+    --workers 1（既定）では取得・文字起こし・要約を段ごとのスレッドで重ねて実行し、段ごとの稼働率を表示する
+    --from-db は curatedSources のうちAIソース（要約）がまだないYouTube動画を取得し、
+    結果を ai_sources にまとめて書き戻す
+    python youtube_summarizer.py --batch urls.txt --whisper-processes 4 --whisper-threads 8
+    --whisper-processes で文字起こしをワーカープロセス（各1モデル）に分散し、長い動画は区間に分ける
+    python youtube_summarizer.py --transcribe-files a.m4a b.m4a --whisper-processes 4   # 処理量の計測
+
+発話以外（前置き・BGM・無音）を除いて文字起こしする（--vad、pip install webrtcvad。なければ音量で判定）:
+    python youtube_summarizer.py --batch urls.txt --vad --whisper-processes 4
+    発話をチャンク（既定30秒まで）に分け、ワーカープールで並行に文字起こしして元の時刻でつなぐ
+    python youtube_summarizer.py --transcribe-files ~/review-audio/*.m4a --compare-vad --whisper-processes 4
+    --compare-vad は同じファイルを VAD なし・ありで文字起こしし、除いた割合と経過時間の短縮を表示する
+    （音声はリポジトリに含めないため、手元のレビュー動画の音声を yt-dlp -x などで用意して指定する）
+
+    yt-dlp の動画情報（yt-dlp -J の出力）をファイルで渡すと、字幕のURLにローカルファイルの
+    パス（情報ファイルからの相対パス）を書いた情報で確認できる:
+        python youtube_summarizer.py --info-json fixtures/video.info.json --transcript-only
+    字幕の選択・解析は fixtures/check_captions.py でまとめて確認できる
 """
 
 import os
+import sys
 import json
+import argparse
+import html
+import queue
+import re
 import tempfile
 import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Callable, Iterable, Optional, Dict, List, Tuple, Union
 import yt_dlp
-import whisper
 import google.generativeai as genai
 
 # .envファイルから環境変数を読み込む（オプション）
@@ -32,35 +74,704 @@ except ImportError:
     # python-dotenvがインストールされていない場合はスキップ
     pass
 
+# 収集ツール（scrayping/collector）の共通モジュール（profiling 等）を利用する
+COLLECTOR_DIR = Path(__file__).resolve().parent / 'scrayping' / 'collector'
+if str(COLLECTOR_DIR) not in sys.path:
+    sys.path.insert(0, str(COLLECTOR_DIR))
+
+# 字幕を探す言語（優先順）
+CAPTION_LANGUAGES = [
+    lang.strip() for lang in os.getenv('SUMMARIZER_CAPTION_LANGS', 'ja,en').split(',') if lang.strip()
+]
+# 字幕の取得形式（優先順）
+CAPTION_FORMATS = ('json3', 'vtt')
+
+_VTT_TIMING = re.compile(r'(\d+:)?(\d+):(\d+)\.(\d+)\s+-->\s+(\d+:)?(\d+):(\d+)\.(\d+)')
+_VTT_TAG = re.compile(r'<[^>]+>')
+
+
+# ===== 字幕 =====
+
+def _vtt_seconds(hours: Optional[str], minutes: str, seconds: str, millis: str) -> float:
+    return int((hours or '0:')[:-1]) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+
+
+def parse_vtt(text: str) -> List[Dict]:
+    """
+    WebVTT 字幕をセグメント（start, end, text）のリストにする
+
+    自動生成字幕は前のキューの行を繰り返しながら1行ずつ流れるため、直前と同じ行は捨てる
+    """
+    segments = []
+    last_line = None
+    # キューの区切りは空行（自動生成字幕はキュー内に空白だけの行を含むため、空白行では区切らない）
+    for block in re.split(r'\n{2,}', text.replace('\r\n', '\n')):
+        lines = block.strip().split('\n')
+        timing_index = next((i for i, line in enumerate(lines) if '-->' in line), None)
+        if timing_index is None:
+            continue
+        match = _VTT_TIMING.search(lines[timing_index])
+        if not match:
+            continue
+        start = _vtt_seconds(*match.groups()[:4])
+        end = _vtt_seconds(*match.groups()[4:])
+        new_lines = []
+        for line in lines[timing_index + 1:]:
+            line = html.unescape(_VTT_TAG.sub('', line)).strip()
+            if line and line != last_line:
+                new_lines.append(line)
+                last_line = line
+        if new_lines:
+            segments.append({'id': len(segments), 'start': start, 'end': end, 'text': ' '.join(new_lines)})
+    return segments
+
+
+def parse_json3(text: str) -> List[Dict]:
+    """YouTube の json3 字幕をセグメント（start, end, text）のリストにする"""
+    segments = []
+    for event in json.loads(text).get('events', []):
+        line = ''.join(seg.get('utf8', '') for seg in event.get('segs') or []).replace('\n', ' ').strip()
+        if not line:
+            continue
+        start = event.get('tStartMs', 0) / 1000
+        segments.append({
+            'id': len(segments),
+            'start': start,
+            'end': start + event.get('dDurationMs', 0) / 1000,
+            'text': line,
+        })
+    return segments
+
+
+def _language_matches(track_language: str, language: str) -> bool:
+    # 'en' は 'en-US' や自動生成の元言語トラック 'en-orig' にも一致させる
+    return track_language == language or track_language.startswith(f'{language}-')
+
+
+def select_caption_track(info: Dict, languages: List[str] = CAPTION_LANGUAGES) -> Optional[Dict]:
+    """
+    yt-dlp の動画情報から使う字幕を選ぶ（手動字幕 → 自動生成字幕、それぞれ言語の優先順）
+
+    自動生成字幕のうち YouTube が機械翻訳したトラック（URL に tlang=）は使わない
+
+    Returns:
+        {'language', 'kind': manual|auto, 'ext', 'url'}。字幕がなければ None
+    """
+    for kind, key in (('manual', 'subtitles'), ('auto', 'automatic_captions')):
+        tracks = info.get(key) or {}
+        for language in languages:
+            for track_language, formats in tracks.items():
+                if not _language_matches(track_language, language):
+                    continue
+                if kind == 'auto':
+                    formats = [f for f in formats if 'tlang=' not in f.get('url', '')]
+                for ext in CAPTION_FORMATS:
+                    for caption_format in formats:
+                        if caption_format.get('ext') == ext and caption_format.get('url'):
+                            return {'language': language, 'kind': kind, 'ext': ext, 'url': caption_format['url']}
+    return None
+
+
+def read_caption(url: str) -> str:
+    """字幕の本文を取得（http(s) 以外はローカルファイルのパスとして読む）"""
+    if not url.startswith(('http://', 'https://')):
+        path = url[len('file://'):] if url.startswith('file://') else url
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+    with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
+        return ydl.urlopen(url).read().decode('utf-8')
+
+
+def fetch_caption_transcript(info: Dict, languages: List[str] = CAPTION_LANGUAGES) -> Optional[Dict]:
+    """
+    字幕から文字起こし結果（transcribe_audio と同じ形）を作る
+
+    Returns:
+        文字起こし結果の辞書。使える字幕がなければ None
+    """
+    track = select_caption_track(info, languages)
+    if not track:
+        return None
+    body = read_caption(track['url'])
+    segments = parse_json3(body) if track['ext'] == 'json3' else parse_vtt(body)
+    if not segments:
+        return None
+    # 日本語は分かち書きしないため区切りなしでつなぐ
+    separator = '' if track['language'].startswith('ja') else ' '
+    return {
+        'text': separator.join(segment['text'] for segment in segments),
+        'language': track['language'],
+        'segments': segments,
+        'source': 'captions',
+        'caption_kind': track['kind'],
+    }
+
+
+def video_info_from(info: Dict, video_url: str) -> Dict:
+    """yt-dlp の動画情報から結果に残す項目を取り出す"""
+    return {
+        'title': info.get('title', ''),
+        'channel': info.get('uploader', ''),
+        'video_id': info.get('id', ''),
+        'url': video_url or info.get('webpage_url', ''),
+    }
+
+
+def load_info_json(path: str) -> Dict:
+    """
+    yt-dlp -J で保存した動画情報を読み込む
+
+    字幕の URL に書いたローカルファイルの相対パスは、情報ファイルのディレクトリからのパスとして解決する
+    """
+    with open(path, encoding='utf-8') as f:
+        info = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    for key in ('subtitles', 'automatic_captions'):
+        for formats in (info.get(key) or {}).values():
+            for caption_format in formats:
+                url = caption_format.get('url', '')
+                if url and '://' not in url and not os.path.isabs(url):
+                    caption_format['url'] = os.path.join(base, url)
+    return info
+
+
+@dataclass
+class VideoTask:
+    """一括処理する動画"""
+    url: str
+    shoe_brand: Optional[str] = None
+    shoe_model: Optional[str] = None
+    # curatedSources から取得した場合のシューズID（結果をAIソースとして書き戻す）
+    shoe_id: Optional[str] = None
+
+
+def load_url_list(path: str) -> List[VideoTask]:
+    """
+    URLリストを読み込む（1行1動画。タブ区切りでブランド名・モデル名を続けてもよい、# 以降はコメント）
+    """
+    tasks = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = [part.strip() for part in line.split('\t')]
+            tasks.append(VideoTask(parts[0], *(part or None for part in parts[1:3])))
+    return tasks
+
+
+# ===== Whisper ワーカープール =====
+
+# Whisper の入力（16kHz モノラル）
+SAMPLE_RATE = 16000
+
+
+# ネイティブの音声ストリームの優先順（FFmpeg が直接デコードするため再エンコードしない）
+AUDIO_STREAM_EXTS = ('m4a', 'webm')
+
+
+def decode_audio(
+    path: str,
+    start: float = 0.0,
+    duration: Optional[float] = None,
+    headers: Optional[Dict[str, str]] = None,
+):
+    """
+    音声ファイル（またはストリームのURL）の指定区間を FFmpeg で 16kHz モノラルの float32 配列にデコード
+    （whisper.load_audio と同じ形式。区間だけをデコードするため長い動画を分けて処理できる）
+
+    出力はパイプで受け取り、一時ファイルは作らない。headers は URL を読む場合の HTTP ヘッダー
+    """
+    import subprocess
+    import numpy as np
+
+    command = ['ffmpeg', '-nostdin', '-threads', '0']
+    if headers:
+        command += ['-headers', ''.join(f'{key}: {value}\r\n' for key, value in headers.items())]
+    if start:
+        command += ['-ss', f'{start:.3f}']
+    if duration is not None:
+        command += ['-t', f'{duration:.3f}']
+    command += ['-i', path, '-vn', '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(SAMPLE_RATE), '-']
+    try:
+        output = subprocess.run(command, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise Exception(f"音声のデコードに失敗しました: {e.stderr.decode(errors='ignore')[-200:]}")
+    return np.frombuffer(output, np.int16).astype(np.float32) / 32768.0
+
+
+def select_audio_format(info: Dict) -> Dict:
+    """
+    動画情報の formats から音声のみのストリームを選ぶ（m4a → webm の順、同じ形式ならビットレートの高いもの）
+
+    音声のみのストリームがなければ音声付きのストリームの中で一番小さいもの
+    """
+    formats = [f for f in info.get('formats') or [] if f.get('url') and f.get('acodec') not in (None, 'none')]
+    audio_only = [f for f in formats if f.get('vcodec') == 'none']
+
+    def rank(f: Dict):
+        ext = f.get('ext')
+        preference = AUDIO_STREAM_EXTS.index(ext) if ext in AUDIO_STREAM_EXTS else len(AUDIO_STREAM_EXTS)
+        return (preference, -(f.get('abr') or 0))
+
+    if audio_only:
+        return min(audio_only, key=rank)
+    if formats:
+        return min(formats, key=lambda f: f.get('filesize') or f.get('filesize_approx') or float('inf'))
+    raise Exception("音声ストリームが見つかりません")
+
+
+def probe_duration(path: str) -> float:
+    """音声ファイルの長さ（秒）"""
+    import subprocess
+
+    output = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', path],
+        capture_output=True, check=True, text=True,
+    ).stdout
+    return float(output.strip() or 0)
+
+
+def whisper_options(language: Optional[str], translate_to_japanese: bool) -> Dict:
+    """model.transcribe の引数（transcribe_audio と同じ）"""
+    if translate_to_japanese:
+        return {'language': language or "en", 'task': "translate"}
+    return {'language': language}
+
+
+def split_spans(duration: float, segment_seconds: float, audio=None) -> List[Tuple[float, Optional[float]]]:
+    """
+    長さ duration の音声を segment_seconds ごとの (開始, 長さ) に分ける（最後の区間は末尾まで）
+
+    audio（PCM 配列または音声ファイルのパス）を渡すと、各切れ目を前後の一番静かなところへずらす
+    （単語の途中で切ると両側の区間で文字起こしが欠けるため）
+    """
+    if duration <= segment_seconds * 1.5:
+        return [(0.0, None)]
+    count = int(round(duration / segment_seconds))
+    step = duration / count
+    cuts = [i * step for i in range(1, count)]
+    if audio is not None:
+        # 隣の切れ目と入れ替わらないよう、探す幅は区間の半分まで
+        radius = min(VAD_SPLIT_SEARCH_SECONDS, step / 2)
+        cuts = [snap_to_quiet(audio, mark, radius) for mark in cuts]
+    bounds = [0.0] + cuts
+    return [(start, bounds[i + 1] - start if i < count - 1 else None) for i, start in enumerate(bounds)]
+
+
+def snap_to_quiet(audio, mark: float, radius: float) -> float:
+    """mark 秒の前後 radius 秒で一番静かな時刻（ファイルはその範囲だけデコード。失敗したら mark のまま）"""
+    if not isinstance(audio, str):
+        return quietest_point(audio, mark - radius, mark + radius)
+    lo = max(0.0, mark - radius)
+    try:
+        window = decode_audio(audio, lo, mark + radius - lo)
+    except Exception as e:
+        print(f"⚠️ 切れ目の調整をスキップします: {e}")
+        return mark
+    if not len(window):
+        return mark
+    return lo + quietest_point(window, 0.0, mark + radius - lo)
+
+
+def stitch_transcripts(pieces: List[Tuple[float, Dict]]) -> Dict:
+    """区間ごとの文字起こし結果を、開始位置のずれを足して1つにまとめる"""
+    segments = []
+    for offset, piece in sorted(pieces, key=lambda p: p[0]):
+        for segment in piece.get('segments', []):
+            segments.append(dict(
+                segment,
+                id=len(segments),
+                start=segment['start'] + offset,
+                end=segment['end'] + offset,
+            ))
+    ordered = [piece for _, piece in sorted(pieces, key=lambda p: p[0])]
+    return {
+        'text': ''.join(piece['text'] for piece in ordered),
+        'language': ordered[0].get('language', 'unknown') if ordered else 'unknown',
+        'segments': segments,
+    }
+
+
+# ワーカープロセスの Whisper モデル（プロセスごとに1つ読み込んで使い回す）
+_pool_model = None
+
+
+def _init_whisper_worker(model_name: str, threads: int):
+    # torch を読み込む前にスレッド数を決める（ワーカー数 × スレッド数がコア数を超えないように）
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    os.environ['MKL_NUM_THREADS'] = str(threads)
+    import torch
+    import whisper
+
+    torch.set_num_threads(threads)
+    global _pool_model
+    _pool_model = whisper.load_model(model_name)
+
+
+def _transcribe_span(audio, start: float, duration: Optional[float], options: Dict) -> Dict:
+    # audio はファイルのパス（区間をデコードする）か、区間を切り出した PCM 配列
+    if isinstance(audio, str):
+        audio = decode_audio(audio, start, duration)
+    result = _pool_model.transcribe(audio, **options)
+    return {
+        'text': result['text'],
+        'language': result.get('language', 'unknown'),
+        'segments': result.get('segments', []),
+        'audio_seconds': len(audio) / SAMPLE_RATE,
+    }
+
+
+class WhisperPool:
+    """
+    Whisper の文字起こしをワーカープロセスに分散する（各プロセスがモデルを1つ持つ）
+
+    - 動画ごとに空いているワーカーへ渡す。segment_seconds の1.5倍より長い音声は区間に分け、
+      区間ごとに別のワーカーで文字起こしして時刻をずらしてつなぐ
+    - threads_per_worker を省略すると CPU数 / プロセス数（PyTorch のスレッドの取り合いを防ぐ）
+    - 処理量は「音声の分数 / 経過の分数」で表す（throughput）
+    """
+
+    def __init__(
+        self,
+        model_name: str = "base",
+        processes: int = 2,
+        threads_per_worker: Optional[int] = None,
+        segment_seconds: float = 300,
+    ):
+        import multiprocessing
+
+        self.processes = max(1, processes)
+        self.threads = threads_per_worker or max(1, (os.cpu_count() or 1) // self.processes)
+        self.segment_seconds = segment_seconds
+        # fork だと親の PyTorch / FFmpeg の状態を引き継ぐため spawn で起動する
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_whisper_worker,
+            initargs=(model_name, self.threads),
+        )
+        self._lock = threading.Lock()
+        self.audio_seconds = 0.0
+        self.files = 0
+        self._first_started: Optional[float] = None
+        self._last_finished: Optional[float] = None
+
+    def transcribe(self, audio, language: Optional[str] = None, translate_to_japanese: bool = True) -> Dict:
+        """音声ファイルのパスまたは 16kHz の PCM 配列を文字起こし（transcribe_audio と同じ形の結果）"""
+        in_memory = not isinstance(audio, str)
+        if self.processes == 1:
+            spans = [(0.0, None)]
+        else:
+            total = len(audio) / SAMPLE_RATE if in_memory else probe_duration(audio)
+            spans = split_spans(total, self.segment_seconds, audio)
+        sources = []
+        for start, duration in spans:
+            if in_memory:
+                # PCM はワーカーに渡す区間だけを切り出して送る
+                end = None if duration is None else int((start + duration) * SAMPLE_RATE)
+                sources.append((start, audio[int(start * SAMPLE_RATE):end], None))
+            else:
+                sources.append((start, audio, duration))
+        return self._run(sources, whisper_options(language, translate_to_japanese))
+
+    def transcribe_chunks(
+        self,
+        chunks: List[Tuple[float, 'np.ndarray']],
+        audio_seconds: float,
+        language: Optional[str] = None,
+        translate_to_japanese: bool = True,
+    ) -> Dict:
+        """
+        発話区間の PCM（trim_silence の結果）をワーカーに分けて文字起こしし、元の時刻でつなぐ
+
+        Args:
+            chunks: [(元の音声での開始秒, PCM 配列)]
+            audio_seconds: 元の音声の長さ（処理量は除いた無音も含めて数える）
+        """
+        sources = [(start, chunk, None) for start, chunk in chunks]
+        return self._run(sources, whisper_options(language, translate_to_japanese), audio_seconds)
+
+    def _run(
+        self,
+        sources: List[Tuple[float, object, Optional[float]]],
+        options: Dict,
+        audio_seconds: Optional[float] = None,
+    ) -> Dict:
+        started = time.perf_counter()
+        with self._lock:
+            if self._first_started is None:
+                self._first_started = started
+
+        futures = [
+            (start, self._pool.submit(_transcribe_span, source, start, duration, options))
+            for start, source, duration in sources
+        ]
+        try:
+            pieces = [(start, future.result()) for start, future in futures]
+        except Exception as e:
+            raise Exception(f"文字起こしに失敗しました: {str(e)}")
+
+        with self._lock:
+            if audio_seconds is None:
+                audio_seconds = sum(piece['audio_seconds'] for _, piece in pieces)
+            self.audio_seconds += audio_seconds
+            self.files += 1
+            self._last_finished = time.perf_counter()
+        result = stitch_transcripts(pieces)
+        result['source'] = 'whisper'
+        result['spans'] = len(sources)
+        return result
+
+    @property
+    def throughput(self) -> float:
+        """音声の分数 / 経過の分数"""
+        if self._first_started is None or self._last_finished is None:
+            return 0.0
+        wall = self._last_finished - self._first_started
+        return self.audio_seconds / wall if wall else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"Whisper: {self.files} 本, 音声 {self.audio_seconds / 60:.1f} 分, "
+            f"{self.throughput:.2f} 音声分/経過分（{self.processes} プロセス × {self.threads} スレッド）"
+        )
+
+    def warm_up(self):
+        """全ワーカーを起動してモデルを読み込ませる（計測にモデルの読み込み時間を含めないため）"""
+        import numpy as np
+
+        silence = np.zeros(SAMPLE_RATE, np.float32)
+        futures = [self._pool.submit(_transcribe_span, silence, 0.0, None, {}) for _ in range(self.processes)]
+        for future in futures:
+            future.result()
+
+    def close(self):
+        self._pool.shutdown()
+
+    def __enter__(self) -> 'WhisperPool':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ===== 無音の除去（VAD） =====
+
+# webrtcvad の判定の厳しさ（0〜3、大きいほど音楽・雑音を発話と判定しにくい）
+VAD_MODE = int(os.getenv('SUMMARIZER_VAD_MODE', '3'))
+# 判定の単位（webrtcvad は 10 / 20 / 30 ミリ秒のフレームのみ）
+VAD_FRAME_MS = 30
+# 発話区間の前後に残す余白と、これより短い無音は発話の続きとみなす長さ（秒）
+VAD_PADDING = 0.2
+VAD_MIN_SILENCE = 0.6
+# これより短い発話は捨てる（短い断片は Whisper が存在しない文を出しやすい）
+VAD_MIN_SPEECH = 0.3
+# 1つのチャンクの長さの上限（Whisper の入力窓と同じ30秒）
+VAD_CHUNK_SECONDS = float(os.getenv('SUMMARIZER_VAD_CHUNK_SECONDS', '30'))
+if VAD_CHUNK_SECONDS <= 0:
+    print(f"⚠️ SUMMARIZER_VAD_CHUNK_SECONDS は正の値で指定してください（{VAD_CHUNK_SECONDS} → 30）")
+    VAD_CHUNK_SECONDS = 30.0
+# チャンクより長い発話を切るとき、上限の手前この秒数の中で一番静かなフレームを切れ目にする
+VAD_SPLIT_SEARCH_SECONDS = 5.0
+
+
+def _speech_frames_webrtc(audio, mode: int) -> List[bool]:
+    import webrtcvad
+    import numpy as np
+
+    vad = webrtcvad.Vad(mode)
+    frame = SAMPLE_RATE * VAD_FRAME_MS // 1000
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+    size = frame * 2
+    return [vad.is_speech(pcm[i:i + size], SAMPLE_RATE) for i in range(0, len(pcm) - size + 1, size)]
+
+
+def _speech_frames_energy(audio) -> List[bool]:
+    """
+    webrtcvad がない場合の判定（フレームの音量が、静かなフレームの音量より 15dB 以上大きいか）
+
+    ほとんどが発話の音声では静かなフレームも発話のため、閾値は大きい側（上位10%）の音量の
+    10dB 下を超えないようにする
+    """
+    import numpy as np
+
+    frame = SAMPLE_RATE * VAD_FRAME_MS // 1000
+    count = len(audio) // frame
+    if not count:
+        return []
+    frames = audio[:count * frame].reshape(count, frame)
+    db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    threshold = max(min(np.percentile(db, 10) + 15, np.percentile(db, 90) - 10), -50)
+    return list(db > threshold)
+
+
+def detect_speech(audio, mode: int = VAD_MODE) -> List[Tuple[float, float]]:
+    """
+    PCM（16kHz）の発話区間を [(開始秒, 終了秒)] で返す
+
+    webrtcvad があればそれで判定し、なければ音量で判定する（音楽は発話と区別できない）。
+    短い無音でつながった区間はまとめ、前後に VAD_PADDING の余白を付ける
+    """
+    try:
+        flags = _speech_frames_webrtc(audio, mode)
+    except ImportError:
+        flags = _speech_frames_energy(audio)
+
+    step = VAD_FRAME_MS / 1000
+    total = len(audio) / SAMPLE_RATE
+    regions: List[List[float]] = []
+    for i, speech in enumerate(flags):
+        if not speech:
+            continue
+        start, end = i * step, (i + 1) * step
+        if regions and start - regions[-1][1] < VAD_MIN_SILENCE:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+    return [
+        (max(0.0, start - VAD_PADDING), min(total, end + VAD_PADDING))
+        for start, end in regions if end - start >= VAD_MIN_SPEECH
+    ]
+
+
+def quietest_point(audio, lo: float, hi: float) -> float:
+    """lo〜hi 秒の中で一番音量の小さいフレームの中央の時刻（単語の途中で切らないための切れ目）"""
+    import numpy as np
+
+    frame = SAMPLE_RATE * VAD_FRAME_MS // 1000
+    first = int(max(0.0, lo) * SAMPLE_RATE)
+    count = (min(int(hi * SAMPLE_RATE), len(audio)) - first) // frame
+    if count <= 0:
+        return hi
+    frames = audio[first:first + count * frame].reshape(count, frame)
+    quietest = int(np.argmin(np.mean(frames ** 2, axis=1)))
+    return (first + quietest * frame + frame // 2) / SAMPLE_RATE
+
+
+def speech_chunks(
+    regions: List[Tuple[float, float]],
+    chunk_seconds: float = VAD_CHUNK_SECONDS,
+    audio=None,
+) -> List[Tuple[float, float]]:
+    """
+    発話区間を chunk_seconds 以下のチャンクにまとめる
+
+    続く区間はチャンクに収まる限り同じチャンクに入れる（Whisper は30秒の窓ごとに処理するため、
+    窓に収まる間の無音は残しても計算量は変わらず、呼び出し回数が減る）。
+    chunk_seconds より長い区間は、上限の手前 VAD_SPLIT_SEARCH_SECONDS 秒で一番静かなフレーム
+    （話の息継ぎ）で切る。audio を省略すると上限の位置で切る
+    """
+    if chunk_seconds <= 0:
+        raise ValueError(f"chunk_seconds は正の値で指定してください: {chunk_seconds}")
+    chunks: List[List[float]] = []
+    for start, end in regions:
+        if chunks and end - chunks[-1][0] <= chunk_seconds:
+            chunks[-1][1] = end
+            continue
+        while end - start > chunk_seconds:
+            limit = start + chunk_seconds
+            cut = limit
+            if audio is not None:
+                # 探す範囲はチャンクの開始より前に出さない（切れ目が戻ると終わらない）
+                cut = quietest_point(audio, max(start, limit - VAD_SPLIT_SEARCH_SECONDS), limit)
+                if cut <= start:
+                    cut = limit
+            chunks.append([start, cut])
+            start = cut
+        chunks.append([start, end])
+    return [(start, end) for start, end in chunks]
+
+
+def trim_silence(audio, chunk_seconds: float = VAD_CHUNK_SECONDS) -> Tuple[List[Tuple[float, 'np.ndarray']], Dict]:
+    """
+    PCM から発話以外を除き、発話をチャンクに分ける
+
+    Returns:
+        ([(元の音声での開始秒, チャンクの PCM)], {'total_seconds', 'speech_seconds', 'skipped', 'chunks'})
+    """
+    chunks = speech_chunks(detect_speech(audio), chunk_seconds, audio)
+    pieces = [(start, audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]) for start, end in chunks]
+    total = len(audio) / SAMPLE_RATE
+    speech = sum(end - start for start, end in chunks)
+    return pieces, {
+        'total_seconds': round(total, 2),
+        'speech_seconds': round(speech, 2),
+        # 除いた割合（0〜1）
+        'skipped': round(1 - speech / total, 4) if total else 0.0,
+        'chunks': len(chunks),
+    }
+
 
 class YouTubeSummarizer:
     """YouTube動画を要約するクラス"""
     
-    def __init__(self, gemini_api_key: str, whisper_model: str = "base", gemini_model: str = "gemini-pro"):
+    def __init__(
+        self,
+        gemini_api_key: str,
+        whisper_model: str = "base",
+        gemini_model: str = "gemini-pro",
+        audio_format: str = "pcm",
+        vad: bool = False,
+    ):
         """
         Args:
             gemini_api_key: Google Gemini APIキー
             whisper_model: Whisperモデルサイズ (tiny, base, small, medium, large)
             gemini_model: Geminiモデル名 (gemini-pro, gemini-pro-vision等)
+            audio_format: 音声の取得方法（pcm: ストリームをメモリ上の PCM に直接デコード / mp3: mp3 に変換して保存）
+            vad: 文字起こしの前に発話以外（前置き・BGM・無音）を除き、発話をチャンクに分けて文字起こしする
         """
         genai.configure(api_key=gemini_api_key)
         self.gemini_model = genai.GenerativeModel(gemini_model)
-        self.whisper_model = whisper.load_model(whisper_model)
+        self.whisper_model_name = whisper_model
+        self._whisper_model = None
+        # 設定すると文字起こしをワーカープロセスで行う（WhisperPool）
+        self.whisper_pool: Optional[WhisperPool] = None
+        self.audio_format = audio_format
+        self.vad = vad
         self.temp_dir = None
+
+    @property
+    def whisper_model(self):
+        """Whisperモデル（字幕で済む動画では読み込まないよう、初回の文字起こしで読み込む）"""
+        if self._whisper_model is None:
+            self._whisper_model = self.load_whisper_model()
+        return self._whisper_model
+
+    def load_whisper_model(self):
+        """Whisperモデルを新しく読み込む（スレッドごとに別のモデルが必要な場合用）"""
+        import whisper
+        return whisper.load_model(self.whisper_model_name)
+
+    def extract_info(self, video_url: str) -> Dict:
+        """動画情報（字幕の一覧を含む）をダウンロードせずに取得"""
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'skip_download': True,
+        }
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                return ydl.extract_info(video_url, download=False)
+        except Exception as e:
+            raise Exception(f"動画情報の取得に失敗しました: {str(e)}")
         
-    def download_audio(self, video_url: str) -> str:
+    def download_audio(self, video_url: str, temp_dir: Optional[str] = None) -> str:
         """
         YouTube動画から音声をダウンロード
         
         Args:
             video_url: YouTube動画のURL
+            temp_dir: 保存先（省略時は一時ディレクトリを作成し cleanup で削除）
             
         Returns:
             音声ファイルのパス
         """
         # 一時ディレクトリを作成
-        self.temp_dir = tempfile.mkdtemp()
-        audio_path = os.path.join(self.temp_dir, "audio.mp3")
+        if temp_dir is None:
+            self.temp_dir = temp_dir = tempfile.mkdtemp()
+        audio_path = os.path.join(temp_dir, "audio.mp3")
         
         ydl_opts = {
             'format': 'bestaudio/best',
@@ -101,29 +812,77 @@ class YouTubeSummarizer:
         except Exception as e:
             raise Exception(f"動画のダウンロードに失敗しました: {str(e)}")
     
-    def transcribe_audio(self, audio_path: str, language: Optional[str] = None, translate_to_japanese: bool = True) -> Dict:
+    def load_pcm(self, video_url: str, info: Optional[Dict] = None) -> Tuple['np.ndarray', Dict]:
+        """
+        動画の音声ストリーム（m4a / webm）を FFmpeg のパイプで 16kHz モノラルの PCM に直接デコード
+
+        mp3 への再エンコード・一時ファイル・Whisper での2回目のデコードを省く
+
+        Args:
+            info: 取得済みの動画情報（省略時は yt-dlp で取得）
+
+        Returns:
+            (float32 の PCM 配列, 動画情報)
+        """
+        info = info or self.extract_info(video_url)
+        stream = select_audio_format(info)
+        try:
+            audio = decode_audio(stream['url'], headers=stream.get('http_headers') or info.get('http_headers'))
+        except Exception as e:
+            raise Exception(f"音声ストリームの取得に失敗しました: {str(e)}")
+        if not len(audio):
+            raise Exception("音声ストリームが空です")
+        return audio, video_info_from(info, video_url)
+
+    def fetch_audio(self, video_url: str, info: Optional[Dict] = None, temp_dir: Optional[str] = None):
+        """
+        文字起こし用の音声を取得（audio_format が pcm ならメモリ上の PCM、失敗時や mp3 なら mp3 ファイル）
+
+        Returns:
+            (PCM 配列または音声ファイルのパス, 動画情報)
+        """
+        if self.audio_format == 'pcm':
+            try:
+                return self.load_pcm(video_url, info)
+            except Exception as e:
+                print(f"音声ストリームを直接読めませんでした（mp3 でダウンロードします）: {str(e)}")
+        return self.download_audio(video_url, temp_dir)
+
+    def transcribe_audio(
+        self,
+        audio_path: Union[str, 'np.ndarray'],
+        language: Optional[str] = None,
+        translate_to_japanese: bool = True,
+        model=None,
+    ) -> Dict:
         """
         音声ファイルを文字起こし（必要に応じて日本語に翻訳）
         
         Args:
-            audio_path: 音声ファイルのパス
+            audio_path: 音声ファイルのパス、または 16kHz モノラルの PCM 配列（load_pcm）
             language: 元の言語コード（Noneの場合は自動検出）
             translate_to_japanese: Trueの場合、日本語に翻訳
+            model: 使うWhisperモデル（省略時は共有のモデル）
             
         Returns:
             文字起こし結果の辞書
         """
+        if self.vad:
+            return self.transcribe_speech(audio_path, language, translate_to_japanese, model)
+        if model is None and self.whisper_pool is not None:
+            return self.whisper_pool.transcribe(audio_path, language, translate_to_japanese)
+        model = model or self.whisper_model
         try:
             if translate_to_japanese:
                 # 英語→日本語翻訳
-                result = self.whisper_model.transcribe(
+                result = model.transcribe(
                     audio_path,
                     language=language or "en",
                     task="translate"  # 翻訳タスク
                 )
             else:
                 # 文字起こしのみ
-                result = self.whisper_model.transcribe(
+                result = model.transcribe(
                     audio_path,
                     language=language
                 )
@@ -131,11 +890,81 @@ class YouTubeSummarizer:
             return {
                 'text': result['text'],
                 'language': result.get('language', 'unknown'),
-                'segments': result.get('segments', [])
+                'segments': result.get('segments', []),
+                'source': 'whisper',
             }
         except Exception as e:
             raise Exception(f"文字起こしに失敗しました: {str(e)}")
     
+    def transcribe_speech(
+        self,
+        audio: Union[str, 'np.ndarray'],
+        language: Optional[str] = None,
+        translate_to_japanese: bool = True,
+        model=None,
+    ) -> Dict:
+        """
+        発話以外を除いてから文字起こし（vad=True の transcribe_audio）
+
+        発話のチャンクはワーカープールがあれば並行に文字起こしし、元の音声の時刻でつなぐ。
+        結果の vad に除いた割合などを残す
+        """
+        if isinstance(audio, str):
+            audio = decode_audio(audio)
+        chunks, stats = trim_silence(audio)
+        if not chunks:
+            result = {'text': '', 'language': language or 'unknown', 'segments': [], 'source': 'whisper'}
+        elif model is None and self.whisper_pool is not None:
+            result = self.whisper_pool.transcribe_chunks(chunks, stats['total_seconds'], language, translate_to_japanese)
+        else:
+            model = model or self.whisper_model
+            options = whisper_options(language, translate_to_japanese)
+            try:
+                pieces = [(start, model.transcribe(chunk, **options)) for start, chunk in chunks]
+            except Exception as e:
+                raise Exception(f"文字起こしに失敗しました: {str(e)}")
+            result = stitch_transcripts(pieces)
+            result['source'] = 'whisper'
+        result['vad'] = stats
+        return result
+
+    def get_transcript(
+        self,
+        video_url: str,
+        translate_to_japanese: bool = True,
+        use_captions: bool = True,
+        info: Optional[Dict] = None,
+    ) -> Tuple[Dict, Dict]:
+        """
+        文字起こしを取得（字幕があれば字幕、なければ音声 + Whisper）
+
+        字幕は元の言語のまま使う（translate_to_japanese は Whisper を使う場合のみ有効）
+
+        Args:
+            info: 取得済みの動画情報（省略時は yt-dlp で取得）
+
+        Returns:
+            (文字起こし結果, 動画情報)。文字起こし結果の source は captions または whisper
+        """
+        started = time.perf_counter()
+        if use_captions:
+            info = info or self.extract_info(video_url)
+            try:
+                transcription = fetch_caption_transcript(info)
+            except Exception as e:
+                print(f"字幕の取得に失敗しました（音声から文字起こしします）: {str(e)}")
+                transcription = None
+            if transcription:
+                transcription['elapsed'] = time.perf_counter() - started
+                return transcription, video_info_from(info, video_url)
+
+        print(f"動画をダウンロード中: {video_url}")
+        audio_path, video_info = self.fetch_audio(video_url, info)
+        print(f"ダウンロード完了: {video_info['title']}")
+        transcription = self.transcribe_audio(audio_path, translate_to_japanese=translate_to_japanese)
+        transcription['elapsed'] = time.perf_counter() - started
+        return transcription, video_info
+
     def summarize_text(self, text: str, shoe_brand: Optional[str] = None, shoe_model: Optional[str] = None) -> Dict:
         """
         テキストを要約（シューズレビュー用のフォーマット）
@@ -209,7 +1038,15 @@ class YouTubeSummarizer:
         except Exception as e:
             raise Exception(f"要約生成に失敗しました: {str(e)}")
     
-    def process_video(self, video_url: str, shoe_brand: Optional[str] = None, shoe_model: Optional[str] = None, translate_to_japanese: bool = True) -> Dict:
+    def process_video(
+        self,
+        video_url: str,
+        shoe_brand: Optional[str] = None,
+        shoe_model: Optional[str] = None,
+        translate_to_japanese: bool = True,
+        use_captions: bool = True,
+        info: Optional[Dict] = None,
+    ) -> Dict:
         """
         YouTube動画を処理して要約を生成（一連の処理を実行）
         
@@ -218,22 +1055,22 @@ class YouTubeSummarizer:
             shoe_brand: シューズのブランド名（オプション）
             shoe_model: シューズのモデル名（オプション）
             translate_to_japanese: Trueの場合、日本語に翻訳
+            use_captions: Falseの場合、字幕があっても音声から文字起こし
+            info: 取得済みの動画情報（オプション）
             
         Returns:
             処理結果の辞書
         """
         try:
-            # 1. 音声ダウンロード
-            print(f"動画をダウンロード中: {video_url}")
-            audio_path, video_info = self.download_audio(video_url)
-            print(f"ダウンロード完了: {video_info['title']}")
-            
-            # 2. 文字起こし
+            # 1. 文字起こし（字幕 → 音声 + Whisper）
             print("文字起こし中...")
-            transcription = self.transcribe_audio(audio_path, translate_to_japanese=translate_to_japanese)
-            print(f"文字起こし完了（言語: {transcription['language']}）")
+            transcription, video_info = self.get_transcript(video_url, translate_to_japanese, use_captions, info)
+            print(
+                f"文字起こし完了（{transcription['source']}, 言語: {transcription['language']}, "
+                f"{transcription['elapsed']:.1f}秒）"
+            )
             
-            # 3. 要約生成
+            # 2. 要約生成
             print("要約生成中...")
             summary = self.summarize_text(transcription['text'], shoe_brand, shoe_model)
             print("要約生成完了")
@@ -253,6 +1090,41 @@ class YouTubeSummarizer:
             # 一時ファイルを削除
             self.cleanup()
     
+    def process_many(
+        self,
+        tasks: Iterable[Union[str, VideoTask]],
+        translate_to_japanese: bool = True,
+        on_result: Optional[Callable[[Dict], None]] = None,
+    ) -> List[Dict]:
+        """
+        複数の動画を順に処理（Whisperモデルは最初に必要になった時に1回だけ読み込む）
+
+        1本の失敗で全体を止めず、結果に error を入れて次の動画に進む
+
+        Args:
+            tasks: URL または VideoTask
+            on_result: 1本終わるごとに呼ぶ関数（書き戻し・保存用）
+
+        Returns:
+            [{'task', 'result' または 'error', 'seconds'}]
+        """
+        items = []
+        for task in tasks:
+            task = task if isinstance(task, VideoTask) else VideoTask(task)
+            started = time.perf_counter()
+            item = {'task': asdict(task)}
+            try:
+                item['result'] = self.process_video(
+                    task.url, task.shoe_brand, task.shoe_model, translate_to_japanese=translate_to_japanese,
+                )
+            except Exception as e:
+                item['error'] = str(e)
+            item['seconds'] = time.perf_counter() - started
+            if on_result:
+                on_result(item)
+            items.append(item)
+        return items
+
     def cleanup(self):
         """一時ファイルを削除"""
         if self.temp_dir and os.path.exists(self.temp_dir):
@@ -260,8 +1132,530 @@ class YouTubeSummarizer:
             self.temp_dir = None
 
 
-def main():
+# ===== 一括処理 =====
+
+# ワーカープロセスごとの YouTubeSummarizer（Whisperモデルをプロセス内で使い回す）
+_worker_summarizer: Optional[YouTubeSummarizer] = None
+
+
+def _init_worker(gemini_api_key: str, whisper_model: str, gemini_model: str, audio_format: str, vad: bool):
+    global _worker_summarizer
+    _worker_summarizer = YouTubeSummarizer(gemini_api_key, whisper_model, gemini_model, audio_format, vad)
+
+
+def _process_in_worker(task: VideoTask, translate_to_japanese: bool) -> Dict:
+    return _worker_summarizer.process_many([task], translate_to_japanese)[0]
+
+
+def summarize_many(
+    tasks: List[VideoTask],
+    gemini_api_key: str,
+    workers: int = 1,
+    whisper_model: str = "base",
+    gemini_model: str = "gemini-pro",
+    translate_to_japanese: bool = True,
+    on_result: Optional[Callable[[Dict], None]] = None,
+    audio_format: str = "pcm",
+    vad: bool = False,
+) -> List[Dict]:
+    """
+    動画をまとめて要約する
+
+    workers が2以上ならワーカープロセスごとに YouTubeSummarizer を1つ作り、各ワーカーは
+    自分のWhisperモデルを使い回す（結果は終わった順。on_result はこのプロセスで呼ばれる）
+    """
+    if workers <= 1:
+        summarizer = YouTubeSummarizer(gemini_api_key, whisper_model, gemini_model, audio_format, vad)
+        try:
+            return summarizer.process_many(tasks, translate_to_japanese, on_result)
+        finally:
+            summarizer.cleanup()
+
+    items = []
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(gemini_api_key, whisper_model, gemini_model, audio_format, vad),
+    ) as pool:
+        futures = [pool.submit(_process_in_worker, task, translate_to_japanese) for task in tasks]
+        for future in as_completed(futures):
+            item = future.result()
+            if on_result:
+                on_result(item)
+            items.append(item)
+    return items
+
+
+def ai_source_from(item: Dict) -> Dict:
+    """要約結果を create_ai_source の引数にする（管理画面のレビュー収集と同じ形）"""
+    result = item['result']
+    video_info = result['video_info']
+    transcription = result['transcription']
+    return {
+        'source_type': 'YOUTUBE_VIDEO',
+        'source_url': video_info['url'],
+        'source_title': video_info['title'],
+        'source_author': video_info['channel'],
+        'youtube_video_id': video_info['video_id'],
+        'summary': result['summary'].get('summary'),
+        'raw_data': {
+            'videoInfo': video_info,
+            'transcription': {
+                'text': transcription['text'],
+                'language': transcription['language'],
+                'source': transcription.get('source'),
+            },
+            'summary': result['summary'],
+            'scrapedAt': datetime.now().isoformat(),
+        },
+    }
+
+
+class AISourceWriter:
+    """要約結果を batch_size 件ずつ ai_sources に書き戻す"""
+
+    def __init__(self, batch_size: int = 20):
+        self.batch_size = batch_size
+        self.written = 0
+        self._pending: List[Dict] = []
+        # shoe_id → AI要約レビューのID
+        self._reviews: Dict[str, Optional[str]] = {}
+
+    def add(self, item: Dict):
+        task = item['task']
+        if 'result' not in item or not task.get('shoe_id'):
+            return
+        shoe_id = task['shoe_id']
+        if shoe_id not in self._reviews:
+            from db_handler import get_or_create_ai_review
+            self._reviews[shoe_id] = get_or_create_ai_review(shoe_id, task['shoe_brand'], task['shoe_model'])
+        if not self._reviews[shoe_id]:
+            return
+        self._pending.append(dict(ai_source_from(item), review_id=self._reviews[shoe_id]))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        from db_handler import create_ai_sources
+        self.written += create_ai_sources(self._pending)
+        self._pending = []
+
+
+# ===== パイプライン =====
+
+@dataclass
+class StageReport:
+    """パイプラインの段ごとの実行結果"""
+    name: str
+    workers: int
+    items: int = 0
+    # 全ワーカーが処理していた時間の合計
+    busy_seconds: float = 0.0
+
+    def utilization(self, wall_seconds: float) -> float:
+        """稼働率（処理時間の合計 / (経過時間 × ワーカー数)）"""
+        return self.busy_seconds / (wall_seconds * self.workers) if wall_seconds else 0.0
+
+
+@dataclass
+class PipelineReport:
+    """パイプライン全体の実行結果"""
+    stages: List[StageReport]
+    wall_seconds: float = 0.0
+
+    def summary(self) -> str:
+        lines = [f"経過 {self.wall_seconds:.1f}秒"]
+        for stage in self.stages:
+            lines.append(
+                f"  {stage.name:<10} ワーカー {stage.workers}  {stage.items} 本  "
+                f"処理 {stage.busy_seconds:.1f}秒  稼働率 {stage.utilization(self.wall_seconds):.0%}"
+            )
+        return "\n".join(lines)
+
+
+_STOP = object()
+
+
+class SummaryPipeline:
+    """
+    取得 → 文字起こし → 要約 を段ごとのスレッドで重ねて実行する
+
+    各段は上限付きのキューでつながり、文字起こし中の動画 N と並行して動画 N+1 の音声を取得し、
+    動画 N-1 の要約を Gemini に依頼する（前の段が速すぎてもキューが埋まれば待つ）
+
+    - 取得: 字幕があれば字幕、なければ音声をダウンロード（ネットワーク待ち）
+    - 文字起こし: Whisper（CPU）。Whisper は推論中にモデルへフックを付けるため、
+      ワーカーごとに別のモデルを使う（1つ目は共有のモデル）。字幕の動画はそのまま通す
+    - 要約: Gemini API（ネットワーク待ち）
+    """
+
+    def __init__(
+        self,
+        summarizer: YouTubeSummarizer,
+        download_workers: int = 2,
+        transcribe_workers: int = 1,
+        summarize_workers: int = 2,
+        queue_size: int = 2,
+        translate_to_japanese: bool = True,
+        use_captions: bool = True,
+    ):
+        self.summarizer = summarizer
+        self.queue_size = queue_size
+        self.translate_to_japanese = translate_to_japanese
+        self.use_captions = use_captions
+        self.stages = [
+            (StageReport("download", max(1, download_workers)), self._fetch),
+            (StageReport("transcribe", max(1, transcribe_workers)), self._transcribe),
+            (StageReport("summarize", max(1, summarize_workers)), self._summarize),
+        ]
+        self._lock = threading.Lock()
+
+    # ----- 段ごとの処理（item は動画1本分の状態の辞書） -----
+
+    def _fetch(self, item: Dict, worker: int):
+        task = item['task']
+        if self.use_captions:
+            info = self.summarizer.extract_info(task.url)
+            try:
+                transcription = fetch_caption_transcript(info)
+            except Exception as e:
+                print(f"字幕の取得に失敗しました（音声から文字起こしします）: {str(e)}")
+                transcription = None
+            if transcription:
+                item['transcription'] = transcription
+                item['video_info'] = video_info_from(info, task.url)
+                return
+        else:
+            info = None
+        # PCM で取得できれば一時ディレクトリは使われず、_transcribe でそのまま削除される
+        item['temp_dir'] = tempfile.mkdtemp()
+        item['audio_path'], item['video_info'] = self.summarizer.fetch_audio(task.url, info, item['temp_dir'])
+
+    def _transcribe(self, item: Dict, worker: int):
+        if 'transcription' in item:
+            return
+        try:
+            # ワーカープールがあればプールに渡す（スレッドはプールへの投入と待ちだけ）
+            model = None if self.summarizer.whisper_pool else self._models[worker]
+            item['transcription'] = self.summarizer.transcribe_audio(
+                item.pop('audio_path'), translate_to_japanese=self.translate_to_japanese, model=model,
+            )
+        finally:
+            shutil.rmtree(item.pop('temp_dir'), ignore_errors=True)
+
+    def _summarize(self, item: Dict, worker: int):
+        task = item['task']
+        summary = self.summarizer.summarize_text(item['transcription']['text'], task.shoe_brand, task.shoe_model)
+        item['summary'] = summary
+
+    # ----- 実行 -----
+
+    def _worker(self, stage: StageReport, func, worker: int, inbox: queue.Queue, outbox: Optional[queue.Queue]):
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                return
+            if 'error' not in item:
+                started = time.perf_counter()
+                try:
+                    func(item, worker)
+                except Exception as e:
+                    item['error'] = str(e)
+                    if item.get('temp_dir'):
+                        shutil.rmtree(item.pop('temp_dir'), ignore_errors=True)
+                with self._lock:
+                    stage.items += 1
+                    stage.busy_seconds += time.perf_counter() - started
+            if outbox is not None:
+                outbox.put(item)
+            else:
+                self._finish(item)
+
+    def _finish(self, item: Dict):
+        result = {'task': asdict(item['task'])}
+        if 'error' in item:
+            result['error'] = item['error']
+        else:
+            result['result'] = {
+                'video_info': item['video_info'],
+                'transcription': item['transcription'],
+                'summary': item['summary'],
+            }
+        result['seconds'] = time.perf_counter() - item['started']
+        with self._lock:
+            self._results.append(result)
+            # on_result の失敗でスレッドが止まると前の段のキューが詰まって run が返らないため、
+            # 例外は控えて以降の呼び出しを止め、run の最後に投げ直す
+            if self._on_result and self._callback_error is None:
+                try:
+                    self._on_result(result)
+                except Exception as e:
+                    self._callback_error = e
+
+    def run(
+        self,
+        tasks: Iterable[Union[str, VideoTask]],
+        on_result: Optional[Callable[[Dict], None]] = None,
+    ) -> Tuple[List[Dict], PipelineReport]:
+        """
+        動画を流して結果（process_many と同じ形、終わった順）と段ごとの稼働率を返す
+
+        on_result はパイプラインのスレッドから1本ずつ順に呼ばれる。on_result が例外を投げたら
+        新しい動画の投入をやめ、流れている動画を処理し終えてからその例外を投げる
+        """
+        self._results: List[Dict] = []
+        self._on_result = on_result
+        self._callback_error: Optional[Exception] = None
+        # 1つ目のワーカーは共有のモデル。字幕だけで済めばどのモデルも読み込まない
+        self._models = _LazyModels(self.summarizer)
+
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = []
+        for index, (stage, func) in enumerate(self.stages):
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            threads.append([
+                threading.Thread(
+                    target=self._worker, args=(stage, func, worker, queues[index], outbox),
+                    name=f"{stage.name}-{worker}", daemon=True,
+                )
+                for worker in range(stage.workers)
+            ])
+        for stage_threads in threads:
+            for thread in stage_threads:
+                thread.start()
+
+        started = time.perf_counter()
+        for task in tasks:
+            if self._callback_error is not None:
+                break
+            task = task if isinstance(task, VideoTask) else VideoTask(task)
+            queues[0].put({'task': task, 'started': time.perf_counter()})
+        # 前の段のワーカーが全員終わってから次の段を止める
+        for index, stage_threads in enumerate(threads):
+            for _ in stage_threads:
+                queues[index].put(_STOP)
+            for thread in stage_threads:
+                thread.join()
+
+        if self._callback_error is not None:
+            raise self._callback_error
+        report = PipelineReport([stage for stage, _ in self.stages], time.perf_counter() - started)
+        return self._results, report
+
+
+class _LazyModels:
+    """文字起こしワーカーごとのWhisperモデル（初めて使う時に読み込む）"""
+
+    def __init__(self, summarizer: YouTubeSummarizer):
+        self._summarizer = summarizer
+        self._models: Dict[int, object] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, worker: int):
+        if worker == 0:
+            return self._summarizer.whisper_model
+        with self._lock:
+            if worker not in self._models:
+                self._models[worker] = self._summarizer.load_whisper_model()
+            return self._models[worker]
+
+
+def run_batch(args: argparse.Namespace):
+    """--batch / --from-db の一括要約"""
+    gemini_api_key = os.getenv("GEMINI_API_KEY")
+    if not gemini_api_key:
+        print("エラー: GEMINI_API_KEY環境変数が設定されていません")
+        return
+
+    if args.from_db:
+        from db_handler import get_unsummarized_video_sources
+        tasks = [
+            VideoTask(row['url'], row['brand'], row['modelName'], row['shoeId'])
+            for row in get_unsummarized_video_sources(args.limit)
+        ]
+    else:
+        tasks = load_url_list(args.batch)[:args.limit]
+    if not tasks:
+        print("要約する動画がありません")
+        return
+
+    print(f"{len(tasks)} 本の動画を要約します（ワーカー {args.workers}）")
+    writer = AISourceWriter(args.write_batch_size) if args.from_db else None
+    counts = {'done': 0, 'failed': 0, 'captions': 0}
+    started = time.perf_counter()
+
+    with open(args.output, "a", encoding="utf-8") as output:
+        def on_result(item: Dict):
+            if 'error' in item:
+                counts['failed'] += 1
+                print(f"❌ {item['task']['url']}: {item['error']}")
+            else:
+                counts['done'] += 1
+                counts['captions'] += item['result']['transcription'].get('source') == 'captions'
+                print(f"✅ [{counts['done'] + counts['failed']}/{len(tasks)}] {item['result']['video_info']['title']} ({item['seconds']:.1f}秒)")
+            output.write(json.dumps(item, ensure_ascii=False) + "\n")
+            output.flush()
+            if writer:
+                writer.add(item)
+
+        try:
+            if args.workers <= 1:
+                # 1プロセスでは取得・文字起こし・要約を段ごとに重ねて実行する
+                summarizer = YouTubeSummarizer(
+                    gemini_api_key, args.whisper_model, audio_format=args.audio_format, vad=args.vad,
+                )
+                transcribe_workers = args.transcribe_workers
+                if args.whisper_processes:
+                    summarizer.whisper_pool = WhisperPool(
+                        args.whisper_model, args.whisper_processes, args.whisper_threads, args.segment_seconds,
+                    )
+                    # プールの全ワーカーに動画が行き渡るよう、投入するスレッドをプロセス数以上にする
+                    transcribe_workers = max(transcribe_workers, args.whisper_processes)
+                pipeline = SummaryPipeline(
+                    summarizer,
+                    download_workers=args.download_workers,
+                    transcribe_workers=transcribe_workers,
+                    summarize_workers=args.summarize_workers,
+                    queue_size=args.queue_size,
+                )
+                try:
+                    _, report = pipeline.run(tasks, on_result)
+                finally:
+                    summarizer.cleanup()
+                    if summarizer.whisper_pool:
+                        summarizer.whisper_pool.close()
+                print(f"\n{report.summary()}")
+                if summarizer.whisper_pool:
+                    print(summarizer.whisper_pool.summary())
+            else:
+                summarize_many(
+                    tasks,
+                    gemini_api_key,
+                    workers=args.workers,
+                    whisper_model=args.whisper_model,
+                    on_result=on_result,
+                    audio_format=args.audio_format,
+                    vad=args.vad,
+                )
+        finally:
+            if writer:
+                writer.flush()
+
+    elapsed = time.perf_counter() - started
+    print(f"\n完了: {counts['done']} 本（字幕 {counts['captions']} 本）、失敗 {counts['failed']} 本、{elapsed:.0f}秒")
+    if writer:
+        print(f"AIソースを {writer.written} 件登録しました")
+    print(f"結果を {args.output} に追記しました")
+
+
+def transcribe_trimmed(pool: WhisperPool, audio: 'np.ndarray') -> Dict:
+    """発話以外を除いた PCM をワーカープールで文字起こし（結果の vad に除いた割合）"""
+    chunks, stats = trim_silence(audio)
+    if chunks:
+        result = pool.transcribe_chunks(chunks, stats['total_seconds'])
+    else:
+        result = {'text': '', 'language': 'unknown', 'segments': [], 'source': 'whisper', 'spans': 0}
+    result['vad'] = stats
+    return result
+
+
+def compare_vad(pool: WhisperPool, paths: List[str]):
+    """
+    同じファイルを、そのままと発話以外を除いた場合で文字起こしし、
+    除いた割合と経過時間の短縮を表示（デコードは計測に含めない）
+    """
+    pool.warm_up()
+    totals = {'audio': 0.0, 'speech': 0.0, 'full': 0.0, 'trimmed': 0.0}
+    for path in paths:
+        try:
+            audio = decode_audio(path)
+            started = time.perf_counter()
+            pool.transcribe(audio)
+            full = time.perf_counter() - started
+
+            started = time.perf_counter()
+            stats = transcribe_trimmed(pool, audio)['vad']
+            trimmed = time.perf_counter() - started
+        except Exception as e:
+            print(f"❌ {path}: {str(e)}")
+            continue
+        totals['audio'] += stats['total_seconds']
+        totals['speech'] += stats['speech_seconds']
+        totals['full'] += full
+        totals['trimmed'] += trimmed
+        print(
+            f"✅ {path}: 除いた割合 {stats['skipped']:.0%}（{stats['chunks']} チャンク）, "
+            f"{full:.1f}秒 → {trimmed:.1f}秒（{full / trimmed if trimmed else 0:.2f}倍）"
+        )
+
+    if totals['audio'] and totals['trimmed']:
+        print(
+            f"合計: 音声 {totals['audio'] / 60:.1f} 分のうち {1 - totals['speech'] / totals['audio']:.0%} を除外, "
+            f"{totals['full']:.1f}秒 → {totals['trimmed']:.1f}秒（{totals['full'] / totals['trimmed']:.2f}倍）"
+        )
+
+
+def transcribe_files(args: argparse.Namespace):
+    """
+    ローカルの音声ファイルをワーカープールで文字起こしし、処理量（音声分/経過分）を表示
+
+    --vad では発話以外を除いてから文字起こしし、--compare-vad では除かない場合と比べる
+    """
+    processes = args.whisper_processes or 1
+    with WhisperPool(args.whisper_model, processes, args.whisper_threads, args.segment_seconds) as pool:
+        if args.compare_vad:
+            compare_vad(pool, args.transcribe_files)
+            return
+
+        def transcribe(path: str) -> Dict:
+            return transcribe_trimmed(pool, decode_audio(path)) if args.vad else pool.transcribe(path)
+
+        # プロセス数のスレッドから投入し、動画単位と区間単位の両方でワーカーを埋める
+        with ThreadPoolExecutor(max_workers=processes) as submitter:
+            futures = {submitter.submit(transcribe, path): path for path in args.transcribe_files}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                    text = f"✅ {futures[future]}: {len(result['segments'])} セグメント（{result['spans']} 区間）"
+                    if 'vad' in result:
+                        text += f" 除いた割合 {result['vad']['skipped']:.0%}"
+                    print(text)
+                except Exception as e:
+                    print(f"❌ {futures[future]}: {str(e)}")
+        print(pool.summary())
+
+
+def print_caption_transcript(info: Dict):
+    """字幕の文字起こしだけを表示（Gemini・Whisper を使わない確認用）"""
+    track = select_caption_track(info)
+    transcription = fetch_caption_transcript(info)
+    if not transcription:
+        print("字幕がありません（通常の実行では音声から文字起こしします）")
+        return
+    print(f"字幕: {track['language']} ({track['kind']}, {track['ext']}), {len(transcription['segments'])} セグメント")
+    print(transcription['text'])
+
+
+def main(args: Optional[argparse.Namespace] = None):
     """メイン関数（使用例）"""
+    if args and args.transcribe_files:
+        transcribe_files(args)
+        return
+    if args and (args.batch or args.from_db):
+        run_batch(args)
+        return
+
+    info = load_info_json(args.info_json) if args and args.info_json else None
+    if args and args.transcript_only:
+        if info is None:
+            video_url = args.url or input("YouTube動画のURLを入力してください: ")
+            with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True, 'skip_download': True}) as ydl:
+                info = ydl.extract_info(video_url, download=False)
+        print_caption_transcript(info)
+        return
+
     # 環境変数からAPIキーを取得
     gemini_api_key = os.getenv("GEMINI_API_KEY")
     if not gemini_api_key:
@@ -269,10 +1663,15 @@ def main():
         return
     
     # YouTubeSummarizerのインスタンスを作成
-    summarizer = YouTubeSummarizer(gemini_api_key, whisper_model="base")
+    summarizer = YouTubeSummarizer(
+        gemini_api_key,
+        whisper_model=args.whisper_model if args else "base",
+        audio_format=args.audio_format if args else "pcm",
+        vad=bool(args and args.vad),
+    )
     
     # 使用例
-    video_url = input("YouTube動画のURLを入力してください: ")
+    video_url = (args and args.url) or (info and info.get('webpage_url')) or input("YouTube動画のURLを入力してください: ")
     shoe_brand = input("シューズのブランド名（オプション）: ").strip() or None
     shoe_model = input("シューズのモデル名（オプション）: ").strip() or None
     
@@ -281,7 +1680,9 @@ def main():
             video_url,
             shoe_brand=shoe_brand,
             shoe_model=shoe_model,
-            translate_to_japanese=True
+            translate_to_japanese=True,
+            use_captions=not (args and args.no_captions),
+            info=info,
         )
         
         # 結果を表示
@@ -290,6 +1691,7 @@ def main():
         print("="*50)
         print(f"\n動画タイトル: {result['video_info']['title']}")
         print(f"チャンネル: {result['video_info']['channel']}")
+        print(f"文字起こし: {result['transcription']['source']}")
         print(f"\n要約タイトル: {result['summary']['title']}")
         print(f"総合評価: {result['summary']['overall_rating']}/5")
         print(f"\n良い点:")
@@ -313,6 +1715,61 @@ def main():
         summarizer.cleanup()
 
 
+def parse_args():
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description="YouTube動画自動要約")
+    parser.add_argument("--url", help="YouTube動画のURL（省略時は入力を求める）")
+    parser.add_argument("--no-captions", action="store_true", help="字幕があっても音声から文字起こしする")
+    parser.add_argument("--info-json", help="yt-dlp -J で保存した動画情報（字幕URLはローカルファイルでも可）")
+    parser.add_argument("--transcript-only", action="store_true", help="字幕の文字起こしだけを表示（要約しない）")
+    parser.add_argument("--whisper-model", default="base", help="Whisperモデルサイズ (tiny, base, small, medium, large)")
+    batch = parser.add_mutually_exclusive_group()
+    batch.add_argument("--batch", help="URLリストのファイル（1行1URL、タブ区切りでブランド名・モデル名）")
+    batch.add_argument("--from-db", action="store_true", help="AIソースがまだないYouTube動画を curatedSources から取得して要約")
+    parser.add_argument("--limit", type=int, help="一括要約する動画数の上限")
+    parser.add_argument("--workers", type=int, default=1, help="一括要約のワーカープロセス数（各ワーカーがWhisperモデルを1つ持つ）")
+    parser.add_argument("--download-workers", type=int, default=2, help="パイプラインの取得（字幕・音声）のスレッド数")
+    parser.add_argument("--transcribe-workers", type=int, default=1, help="パイプラインの文字起こしのスレッド数（各スレッドがWhisperモデルを持つ）")
+    parser.add_argument("--summarize-workers", type=int, default=2, help="パイプラインの要約（Gemini）のスレッド数")
+    parser.add_argument("--queue-size", type=int, default=2, help="パイプラインの段の間で待たせる動画数の上限")
+    parser.add_argument("--audio-format", choices=["pcm", "mp3"], default="pcm", help="音声の取得方法（pcm: ストリームをメモリ上で直接デコード / mp3: mp3 に変換して保存）")
+    parser.add_argument("--whisper-processes", type=int, default=0, help="文字起こしのワーカープロセス数（0: パイプラインのスレッド内で実行）")
+    parser.add_argument("--whisper-threads", type=int, help="ワーカープロセスごとのPyTorchスレッド数（省略時: CPU数 / プロセス数）")
+    parser.add_argument("--segment-seconds", type=float, default=300, help="長い音声を分けてワーカーに配る区間の長さ（秒）")
+    parser.add_argument("--vad", action="store_true", help="文字起こしの前に発話以外（前置き・BGM・無音）を除き、発話をチャンクに分ける")
+    parser.add_argument("--compare-vad", action="store_true", help="--transcribe-files のファイルを VAD なし・ありで文字起こしして比べる")
+    parser.add_argument("--transcribe-files", nargs="+", metavar="AUDIO", help="ローカルの音声ファイルを文字起こしして処理量を計測（要約しない）")
+    parser.add_argument("--write-batch-size", type=int, default=20, help="--from-db の結果を ai_sources に書き戻す件数の単位")
+    parser.add_argument("--output", default="summary_results.jsonl", help="一括要約の結果（JSON Lines、追記）")
+    parser.add_argument("--profile", action="store_true", help="処理全体をプロファイル")
+    parser.add_argument(
+        "--profile-mode", choices=["cprofile", "sampling"], default="cprofile",
+        help="プロファイルの方式 (cprofile|sampling、既定 cprofile)",
+    )
+    parser.add_argument("--profile-dir", default="profiles", help="プロファイル結果の出力先ディレクトリ")
+    args = parser.parse_args()
+    if args.workers > 1:
+        # --workers > 1 は summarize_many のプロセスで動くため、パイプラインとプールの設定は効かない
+        pipeline_options = [
+            "whisper_processes", "whisper_threads", "segment_seconds",
+            "download_workers", "transcribe_workers", "summarize_workers", "queue_size",
+        ]
+        ignored = [
+            "--" + name.replace("_", "-") for name in pipeline_options
+            if getattr(args, name) != parser.get_default(name)
+        ]
+        if ignored:
+            parser.error(f"{', '.join(ignored)} は --workers 1 のときだけ使えます")
+    return args
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.profile:
+        import profiling
+        run_dir = profiling.make_run_dir(args.profile_dir, "youtube_summarizer")
+        with profiling.profile_run(args.profile_mode, run_dir):
+            main(args)
+    else:
+        main(args)
 